@@ -5,22 +5,44 @@ StupidOCR - 基于 DDDDOCR 的验证码识别服务
 
 import ddddocr
 import uvicorn
+import cv2
+import numpy as np
+import onnxruntime
 import base64
 import re
+import html
 import json
 import secrets
+import signal
+import socket
+import hashlib
+import importlib.util
 import sqlite3
 import threading
 import time
+import asyncio
+import bisect
+import glob
+import queue
+import tempfile
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from io import BytesIO
 from PIL import Image
-from fastapi import FastAPI, HTTPException, Depends, Header, Request, status
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from pydantic import BaseModel, Field, validator
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, WebSocket, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartParser, MultiPartException
+from pydantic import BaseModel, Field, StrictInt, ValidationError, validator
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from datetime import datetime
-from typing import Optional, List, Dict
+from functools import lru_cache
+from typing import Optional, List, Dict, Tuple, Union
 
 # ==================== 配置 ====================
 APP_VERSION = "1.2.0"
@@ -40,9 +62,111 @@ MAX_IMAGE_SIZE = int(os.environ.get("MAX_IMAGE_SIZE", 5 * 1024 * 1024))
 ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "yzm_admin")
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "7jnyxx54")
 
+# 服务模式：uvicorn（默认，每个进程各自加载模型）/ preload（主进程加载模型后 fork 工作进程，写时复制共享）
+SERVING_MODE = os.environ.get("SERVING_MODE", "uvicorn").lower()
+SERVER_PORT = int(os.environ.get("PORT", 6688))
+UVICORN_WORKERS = max(1, int(os.environ.get("UVICORN_WORKERS", 1)))
+
+# INT8 量化模型：列出的识别模式（image/number/compute/alphabet/detection）使用量化模型，其余模式仍使用浮点模型
+# 量化模型在首次使用时由浮点模型生成并缓存在 OCR_INT8_DIR，生成失败时退回浮点模型
+OCR_INT8_MODES = {
+    mode.strip() for mode in os.environ.get("OCR_INT8_MODES", "").lower().split(",") if mode.strip()
+}
+
+# 模型加载：列出的模型在启动时加载并预热，其余模型在首次使用时加载
+# 可选 beta（通用/数字/算术/字母/点选文字识别）、det（点选目标检测）、slide（滑块匹配），
+# 以及对应的量化模型 beta_int8、det_int8（配置了 OCR_INT8_MODES 时默认加入）
+_default_preload = ["beta", "det", "slide"]
+if OCR_INT8_MODES & {"image", "number", "compute", "alphabet", "detection"}:
+    _default_preload.append("beta_int8")
+if "detection" in OCR_INT8_MODES:
+    _default_preload.append("det_int8")
+OCR_PRELOAD_MODELS = [
+    name.strip() for name in os.environ.get("OCR_PRELOAD_MODELS", ",".join(_default_preload)).split(",")
+    if name.strip()
+]
+OCR_WARMUP = os.environ.get("OCR_WARMUP", "1").lower() in ("1", "true", "yes", "on")
+
+# ONNX Runtime 会话配置，作用于全部模型
+# ORT_INTRA_OP_THREADS：整数，0 为 ONNX Runtime 默认（每个会话使用全部核心）；auto 将物理核心平均分给各工作进程，
+# 多进程时默认 auto，避免每个进程都按全部核心开线程
+ORT_INTRA_OP_THREADS = os.environ.get("ORT_INTRA_OP_THREADS", "auto" if UVICORN_WORKERS > 1 else "0").lower()
+ORT_INTER_OP_THREADS = max(0, int(os.environ.get("ORT_INTER_OP_THREADS", 0)))
+ORT_GRAPH_OPTIMIZATION = os.environ.get("ORT_GRAPH_OPTIMIZATION", "all").lower()  # disable / basic / extended / all
+ORT_EXECUTION_MODE = os.environ.get("ORT_EXECUTION_MODE", "sequential").lower()  # sequential / parallel
+# 将每个工作进程绑定到分配给它的 CPU 核心（仅 Linux）
+ORT_CPU_AFFINITY = os.environ.get("ORT_CPU_AFFINITY", "0").lower() in ("1", "true", "yes", "on")
+
+# 推理执行器配置
+INFERENCE_EXECUTOR = os.environ.get("INFERENCE_EXECUTOR", "thread").lower()  # thread / process
+INFERENCE_WORKERS = max(1, int(os.environ.get("INFERENCE_WORKERS", os.cpu_count() or 1)))
+INFERENCE_QUEUE_SIZE = max(0, int(os.environ.get("INFERENCE_QUEUE_SIZE", INFERENCE_WORKERS * 4)))
+INFERENCE_RETRY_AFTER = max(1, int(os.environ.get("INFERENCE_RETRY_AFTER", 1)))
+
+# 动态批处理配置（默认关闭）
+OCR_BATCHING = os.environ.get("OCR_BATCHING", "0").lower() in ("1", "true", "yes", "on")
+OCR_BATCH_MAX_SIZE = max(1, int(os.environ.get("OCR_BATCH_MAX_SIZE", 8)))
+OCR_BATCH_MAX_WAIT_MS = max(0.0, float(os.environ.get("OCR_BATCH_MAX_WAIT_MS", 5)))
+
+# 放开模型 batch 维需要 onnx（已列入 requirements.txt）；未安装时多张图片只能逐张推理，批处理没有收益，直接关闭
+ONNX_AVAILABLE = importlib.util.find_spec("onnx") is not None
+if OCR_BATCHING and not ONNX_AVAILABLE:
+    print("[batch] 未安装 onnx，无法构建批量推理会话，OCR_BATCHING 已关闭（pip install onnx）")
+    OCR_BATCHING = False
+if OCR_INT8_MODES and not ONNX_AVAILABLE:
+    # 量化模型由浮点模型现场生成，缺少 onnx 时全部退回浮点模型，与配置不符，直接拒绝启动
+    raise RuntimeError(f"OCR_INT8_MODES={','.join(sorted(OCR_INT8_MODES))} 需要安装 onnx（pip install onnx）")
+if not ONNX_AVAILABLE and {"det", "det_int8"} & set(OCR_PRELOAD_MODELS):
+    print("[models] 未安装 onnx，文字点选的检测框裁剪将逐个识别，无法合并为一次批量推理（pip install onnx）")
+
+# 分类识别前的图片预处理步骤，逗号分隔，设为 none 全部关闭：
+# draft（JPEG 直接按接近模型输入的尺寸降分辨率解码）、grayscale（先转灰度再缩放）、reduce（大图先整数倍缩小再精细缩放）
+OCR_PREPROCESS = {
+    step.strip() for step in os.environ.get("OCR_PREPROCESS", "draft,grayscale,reduce").lower().split(",")
+    if step.strip() and step.strip() != "none"
+}
+# 图片头声明的像素数上限（宽 x 高），超出时不解码像素直接拒绝，0 为不限制
+OCR_MAX_PIXELS = max(0, int(os.environ.get("OCR_MAX_PIXELS", 4096 * 4096)))
+
+# 批量识别接口单次最多条目数
+BATCH_API_MAX_ITEMS = max(1, int(os.environ.get("BATCH_API_MAX_ITEMS", 100)))
+
+# WebSocket 识别通道：单个连接同时处理中的消息数上限，达到上限后暂停读取该连接的新消息
+OCR_WS_MAX_IN_FLIGHT = max(1, int(os.environ.get("OCR_WS_MAX_IN_FLIGHT", 16)))
+# 未携带 X-Token 请求头的连接需在该秒数内发送认证消息
+OCR_WS_AUTH_TIMEOUT = 10
+
+# 识别结果缓存配置
+OCR_CACHE = os.environ.get("OCR_CACHE", "1").lower() in ("1", "true", "yes", "on")
+OCR_CACHE_BACKEND = os.environ.get("OCR_CACHE_BACKEND", "memory").lower()  # memory / sqlite
+OCR_CACHE_TTL = max(1, int(os.environ.get("OCR_CACHE_TTL", 300)))
+OCR_CACHE_MAX_BYTES = max(0, int(os.environ.get("OCR_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+
+# 请求合并：模式与图片内容相同的并发请求共享一次推理（与结果缓存独立，缓存关闭时同样生效）
+OCR_SINGLE_FLIGHT = os.environ.get("OCR_SINGLE_FLIGHT", "1").lower() in ("1", "true", "yes", "on")
+
+# 限流后端：memory（进程内）/ sqlite（同一主机上的所有工作进程共享计数），多进程时默认 sqlite
+RATE_LIMIT_BACKEND = os.environ.get(
+    "RATE_LIMIT_BACKEND", "sqlite" if UVICORN_WORKERS > 1 else "memory"
+).lower()
+
+# 监控指标：多进程时各工作进程定期将指标快照写入 METRICS_DIR，/metrics 抓取时合并
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"stupidocr-metrics-{SERVER_PORT}"))
+METRICS_EXPORT_INTERVAL = max(0.5, float(os.environ.get("METRICS_EXPORT_INTERVAL", 5)))
+
+# 按 Token 与接口的用量时间序列：内存中为固定大小的分钟环形缓冲，随调用次数落库周期汇总到分钟/小时表
+USAGE_SERIES = os.environ.get("USAGE_SERIES", "1").lower() in ("1", "true", "yes", "on")
+USAGE_SERIES_MAX_KEYS = max(1, int(os.environ.get("USAGE_SERIES_MAX_KEYS", 4096)))  # 同时记录的 (Token, 接口) 组合上限
+USAGE_SERIES_MINUTES = max(2, int(os.environ.get("USAGE_SERIES_MINUTES", 10)))  # 环形缓冲的分钟数
+USAGE_MINUTE_RETENTION_HOURS = max(1, int(os.environ.get("USAGE_MINUTE_RETENTION_HOURS", 48)))
+USAGE_HOUR_RETENTION_DAYS = max(1, int(os.environ.get("USAGE_HOUR_RETENTION_DAYS", 90)))
+
 # 文件路径
 BASE_DIR = os.path.dirname(__file__)
 TOKEN_DB_PATH = os.environ.get("TOKEN_DB_PATH", os.path.join(BASE_DIR, "tokens.db"))
+OCR_CACHE_PATH = os.environ.get("OCR_CACHE_PATH", os.path.join(BASE_DIR, "ocr_cache.db"))
+RATE_LIMIT_PATH = os.environ.get("RATE_LIMIT_PATH", os.path.join(BASE_DIR, "rate_limit.db"))
+OCR_INT8_DIR = os.environ.get("OCR_INT8_DIR", os.path.join(BASE_DIR, "models_int8"))
 
 # 全局对象
 app = FastAPI(
@@ -66,16 +190,518 @@ app.add_middleware(
 # 会话管理
 admin_sessions = set()
 
+# ==================== 监控指标 ====================
+
+# 耗时直方图的桶上界（秒）
+METRIC_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_METRIC = "stupidocr_stage_duration_seconds"
+METRIC_HELP = {
+    "stupidocr_http_requests_total": ("counter", "按路由、方法、状态码统计的 HTTP 请求数"),
+    "stupidocr_http_request_duration_seconds": ("histogram", "按路由统计的 HTTP 请求耗时"),
+    STAGE_METRIC: ("histogram", "各处理阶段耗时：decode、validation、queue_wait、preprocess、inference、postprocess"),
+    "stupidocr_rate_limit_rejections_total": ("counter", "被限流拒绝的请求数"),
+    "stupidocr_image_rejections_total": ("counter", "图片头声明的尺寸超过 OCR_MAX_PIXELS 被拒绝的请求数"),
+    "stupidocr_websocket_messages_total": ("counter", "WebSocket 识别消息数，按模式与状态码统计"),
+    "stupidocr_websocket_message_duration_seconds": ("histogram", "WebSocket 识别消息从收到到返回结果的耗时"),
+    "stupidocr_inference_rejections_total": ("counter", "推理队列已满被拒绝的请求数"),
+    "stupidocr_inference_completed_total": ("counter", "完成的推理任务数"),
+    "stupidocr_cache_requests_total": ("counter", "结果缓存查询次数，按模式与命中情况统计"),
+    "stupidocr_coalesced_requests_total": ("counter", "合并到进行中的相同识别、未单独推理的请求数，按模式统计"),
+    "stupidocr_inference_queue_depth": ("gauge", "推理队列中排队的任务数"),
+    "stupidocr_inference_in_flight": ("gauge", "已提交尚未完成的推理任务数"),
+    "stupidocr_model_load_seconds": ("gauge", "模型加载耗时"),
+}
+
+
+class MetricsRegistry:
+    """
+    进程内指标记录：每个线程写入自己的分片，记录时不加锁，抓取时汇总各分片
+    计数器的值为数字，直方图的值为 [各桶计数..., +Inf 桶计数, 总和]（桶计数不累加）
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        self._shards_lock = threading.Lock()  # 仅在线程首次记录时注册分片
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: Tuple = (), value: float = 1):
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name: str, labels: Tuple, seconds: float):
+        shard = self._shard()
+        key = (name, labels)
+        entry = shard.get(key)
+        if entry is None:
+            entry = shard[key] = [0] * (len(METRIC_BUCKETS) + 1) + [0.0]
+        entry[bisect.bisect_left(METRIC_BUCKETS, seconds)] += 1
+        entry[-1] += seconds
+
+    def collect(self) -> Dict:
+        """汇总全部分片，返回 {(名称, 标签): 值}"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: Dict = {}
+        for shard in shards:
+            merge_metric_values(merged, shard.copy().items())
+        return merged
+
+
+def merge_metric_values(merged: Dict, items):
+    """将 (键, 值) 累加到 merged，直方图按桶逐项相加"""
+    for key, value in items:
+        current = merged.get(key)
+        if current is None:
+            merged[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            for i, v in enumerate(value):
+                current[i] += v
+        else:
+            merged[key] = current + value
+
+
+metrics = MetricsRegistry()
+_stage_sink = threading.local()
+
+
+def observe_stage(stage: str, seconds: float):
+    """
+    记录阶段耗时；在推理执行器任务内时先暂存，随任务结果带回事件循环再记录，
+    使进程池模式下子进程中的耗时也能计入主进程
+    """
+    records = getattr(_stage_sink, "records", None)
+    if records is not None:
+        records.append((stage, seconds))
+    else:
+        metrics.observe(STAGE_METRIC, (("stage", stage),), seconds)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """统计代码块耗时，抛出异常时不记录"""
+    start = time.perf_counter()
+    yield
+    observe_stage(stage, time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """ASGI 中间件：按路由模板统计请求数、状态码与耗时，未匹配的路径统一记为 other"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "other")
+            elapsed = time.perf_counter() - start
+            metrics.inc(
+                "stupidocr_http_requests_total",
+                (("route", path), ("method", scope["method"]), ("status", str(status_code)))
+            )
+            metrics.observe("stupidocr_http_request_duration_seconds", (("route", path),), elapsed)
+            if usage_series is not None:
+                for name, value in scope["headers"]:
+                    if name == b"x-token":
+                        record_token_usage(value.decode("latin-1"), path, elapsed, status_code >= 400)
+                        break
+
+
+app.add_middleware(MetricsMiddleware)
+
+# ==================== ONNX Runtime 配置 ====================
+
+ORT_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+ORT_EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+CPU_SLOT_DIR = os.path.join(tempfile.gettempdir(), f"stupidocr-cpu-slots-{SERVER_PORT}")
+
+
+def physical_cores() -> List[List[int]]:
+    """当前进程可用的逻辑 CPU 按物理核心分组（超线程的兄弟线程同组），无法读取拓扑时每个逻辑 CPU 单独成组"""
+    try:
+        available = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return [[cpu] for cpu in range(os.cpu_count() or 1)]
+    cores: Dict[Tuple, List[int]] = {}
+    for cpu in available:
+        topology = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+        try:
+            with open(f"{topology}/physical_package_id") as f:
+                package = f.read().strip()
+            with open(f"{topology}/core_id") as f:
+                core = f.read().strip()
+            key = (package, core)
+        except OSError:
+            key = ("cpu", cpu)
+        cores.setdefault(key, []).append(cpu)
+    return list(cores.values())
+
+
+def claim_worker_slot(workers: int) -> int:
+    """
+    Uvicorn 多进程模式下工作进程没有编号，通过对 CPU_SLOT_DIR 中的编号文件加排他锁领取一个，
+    进程退出时锁自动释放，重启的进程可复用；编号全部被占用时返回 0
+    没有 fcntl 的平台（Windows）一律返回 0：各进程线程数仍按核心均分，只是不区分编号（CPU 绑定本就仅限 Linux）
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return 0
+    os.makedirs(CPU_SLOT_DIR, exist_ok=True)
+    for index in range(workers):
+        fd = os.open(os.path.join(CPU_SLOT_DIR, f"{index}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        return index  # 文件描述符在进程生命周期内保持打开以持有锁
+    return 0
+
+
+class CpuLayout:
+    """
+    当前工作进程的 ONNX Runtime 线程与 CPU 布局
+    auto 模式下物理核心按工作进程编号连续切分，工作进程多于核心时轮流共用；
+    进程池推理时每个会话的线程数再按 INFERENCE_WORKERS 均分
+    """
+
+    def __init__(self):
+        self.worker_index: Optional[int] = None
+        self.cpus: Optional[List[int]] = None
+        self.intra_op_threads = 0
+        self._lock = threading.Lock()
+
+    def assign(self, worker_index: int, pin: bool = True):
+        """
+        确定本进程的布局，首次创建会话时自动调用；
+        预加载模式下主进程以 pin=False 调用后加载模型，fork 出的工作进程再按各自编号调用以绑定 CPU
+        """
+        with self._lock:
+            self.worker_index = worker_index
+            cores = physical_cores()
+            if len(cores) >= UVICORN_WORKERS:
+                share, extra = divmod(len(cores), UVICORN_WORKERS)
+                start = worker_index * share + min(worker_index, extra)
+                mine = cores[start:start + share + (1 if worker_index < extra else 0)]
+            else:
+                mine = [cores[worker_index % len(cores)]]
+            if ORT_INTRA_OP_THREADS == "auto":
+                threads = len(mine)
+                if INFERENCE_EXECUTOR == "process":
+                    threads = max(1, threads // INFERENCE_WORKERS)
+                self.intra_op_threads = threads
+            else:
+                self.intra_op_threads = max(0, int(ORT_INTRA_OP_THREADS))
+            self.cpus = sorted(cpu for core in mine for cpu in core) if ORT_CPU_AFFINITY else None
+            if self.cpus and pin:
+                pin_process(self.cpus)
+            role = f"工作进程 {worker_index + 1}/{UVICORN_WORKERS}" if pin else "主进程"
+            print(f"[ort] {role} (pid {os.getpid()})：{self.describe()}")
+
+    def ensure(self):
+        if self.worker_index is None:
+            self.assign(claim_worker_slot(UVICORN_WORKERS) if UVICORN_WORKERS > 1 else 0)
+
+    def describe(self) -> str:
+        cpus = ",".join(map(str, self.cpus)) if self.cpus else "不绑定"
+        return (
+            f"物理核心 {len(physical_cores())}，intra_op={self.intra_op_threads or '默认'}，"
+            f"inter_op={ORT_INTER_OP_THREADS or '默认'}，图优化={ORT_GRAPH_OPTIMIZATION}，"
+            f"执行模式={ORT_EXECUTION_MODE}，CPU={cpus}"
+        )
+
+    def status(self) -> Dict:
+        return {
+            "worker_index": self.worker_index,
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": ORT_INTER_OP_THREADS,
+            "graph_optimization": ORT_GRAPH_OPTIMIZATION,
+            "execution_mode": ORT_EXECUTION_MODE,
+            "cpus": self.cpus,
+        }
+
+
+def pin_process(cpus: List[int]):
+    """将进程内已有的全部线程绑定到 cpus，之后创建的线程继承创建者的绑定"""
+    try:
+        tids = [int(tid) for tid in os.listdir("/proc/self/task")]
+    except OSError:
+        tids = [0]
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except OSError:
+            pass  # 线程已退出
+
+
+cpu_layout = CpuLayout()
+
+
+def ort_session_options() -> onnxruntime.SessionOptions:
+    """按配置与本进程的 CPU 布局构建会话选项"""
+    if ORT_GRAPH_OPTIMIZATION not in ORT_GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"不支持的 ORT_GRAPH_OPTIMIZATION: {ORT_GRAPH_OPTIMIZATION}")
+    if ORT_EXECUTION_MODE not in ORT_EXECUTION_MODES:
+        raise ValueError(f"不支持的 ORT_EXECUTION_MODE: {ORT_EXECUTION_MODE}")
+    cpu_layout.ensure()
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = cpu_layout.intra_op_threads
+    options.inter_op_num_threads = ORT_INTER_OP_THREADS
+    options.graph_optimization_level = ORT_GRAPH_OPTIMIZATION_LEVELS[ORT_GRAPH_OPTIMIZATION]
+    options.execution_mode = ORT_EXECUTION_MODES[ORT_EXECUTION_MODE]
+    return options
+
+
+def ort_session(model) -> onnxruntime.InferenceSession:
+    """以配置的会话选项加载模型文件或序列化的模型"""
+    return onnxruntime.InferenceSession(model, ort_session_options(), providers=["CPUExecutionProvider"])
+
+
+def tune_ddddocr(ocr: "ddddocr.DdddOcr") -> "ddddocr.DdddOcr":
+    """
+    ddddocr 创建会话时不接受会话选项，按配置重新创建其内部会话；
+    配置均为 ONNX Runtime 默认值或实例不含 ONNX 模型时原样返回
+    """
+    cpu_layout.ensure()
+    tuned = (
+        cpu_layout.intra_op_threads or ORT_INTER_OP_THREADS
+        or ORT_GRAPH_OPTIMIZATION != "all" or ORT_EXECUTION_MODE != "sequential"
+    )
+    if tuned and getattr(ocr, "_DdddOcr__ort_session", None) is not None:
+        ocr._DdddOcr__ort_session = ort_session(ocr._DdddOcr__graph_path)
+    return ocr
+
+# ==================== 模型量化 ====================
+
+QUANTIZATION_VERSION = 1  # 量化方式变化时递增，使已缓存的量化模型失效
+quantization_fallbacks = set()  # 量化失败、退回浮点模型的模型名
+
+
+def _quantize_beta(model, src: str, dst: str):
+    """动态量化；卷积的动态量化（ConvInteger）在 CPU 上比浮点更慢，只量化 LSTM 与全连接层"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(src, dst, weight_type=QuantType.QInt8, op_types_to_quantize=["MatMul", "Gemm", "LSTM"])
+
+
+def det_calibration_images(count: int = 16) -> List[np.ndarray]:
+    """检测模型的校准图片：浅色背景上随机位置、大小、颜色的带描边字符与干扰线，BGR 格式"""
+    from PIL import ImageDraw, ImageFont
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        size = (int(rng.integers(280, 420)), int(rng.integers(140, 220)))
+        image = Image.new("RGB", size, tuple(int(c) for c in rng.integers(190, 256, 3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(4):
+            draw.line([tuple(int(v) for v in rng.integers(0, size, 2)) for _ in range(2)],
+                      fill=tuple(int(c) for c in rng.integers(100, 220, 3)), width=2)
+        for _ in range(int(rng.integers(3, 7))):
+            font = ImageFont.load_default(size=int(rng.integers(28, 52)))
+            xy = (int(rng.integers(0, size[0] - 40)), int(rng.integers(0, size[1] - 50)))
+            draw.text(xy, chr(int(rng.integers(0x41, 0x5B))), font=font,
+                      fill=tuple(int(c) for c in rng.integers(0, 120, 3)), stroke_width=2, stroke_fill=(255, 255, 255))
+        images.append(np.asarray(image)[:, :, ::-1])
+    return images
+
+
+def _quantize_det(model, src: str, dst: str):
+    """
+    静态量化（QLinearConv）；检测模型全部由卷积构成，动态量化会比浮点慢数倍，
+    静态量化以合成的点选图片校准激活值范围
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    input_name = model._DdddOcr__ort_session.get_inputs()[0].name
+    inputs = iter([model.preproc(image, (416, 416))[0][None] for image in det_calibration_images()])
+
+    class Reader(CalibrationDataReader):
+        def get_next(self):
+            item = next(inputs, None)
+            return None if item is None else {input_name: item}
+
+    quantize_static(
+        src, dst, Reader(),
+        quant_format=QuantFormat.QOperator, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8
+    )
+
+
+QUANTIZERS = {
+    "beta": _quantize_beta,
+    "det": _quantize_det,
+}
+
+
+def quantized_model_path(name: str, model) -> str:
+    """
+    返回浮点模型对应的量化模型文件，不存在时生成
+    文件名包含浮点模型内容的哈希，ddddocr 升级后自动重新生成；先写临时文件再改名，多个进程同时生成也不会读到半个文件
+    """
+    src = model._DdddOcr__graph_path
+    with open(src, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+    path = os.path.join(OCR_INT8_DIR, f"{name}-{digest}-v{QUANTIZATION_VERSION}.int8.onnx")
+    if os.path.exists(path):
+        return path
+    os.makedirs(OCR_INT8_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    start = time.perf_counter()
+    try:
+        QUANTIZERS[name](model, src, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    print(f"[models] 已生成 {name} 的 INT8 模型 {path}，耗时 {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def load_quantized(name: str):
+    """
+    INT8 模型：新建一个 ddddocr 实例，沿用其字符表与前后处理，只将推理会话替换为量化模型；
+    量化失败时返回共享的浮点模型（未安装 onnx 的情况在启动时已拒绝）
+    """
+    try:
+        model = MODEL_FACTORIES[name]()
+        path = quantized_model_path(name, model)
+        model._DdddOcr__graph_path = path
+        model._DdddOcr__ort_session = ort_session(path)
+        return model
+    except Exception as e:
+        print(f"[models] {name} 的 INT8 模型不可用，使用浮点模型: {e}")
+        quantization_fallbacks.add(name)
+        return model_registry.get(name)
+
+
+def model_variant(name: str, mode: str) -> str:
+    """识别模式使用的模型：配置在 OCR_INT8_MODES 中的模式使用量化模型"""
+    return f"{name}_int8" if mode in OCR_INT8_MODES else name
+
 # ==================== OCR 模型初始化 ====================
-ocr = ddddocr.DdddOcr(show_ad=False, beta=True)
-number_ocr = ddddocr.DdddOcr(show_ad=False, beta=True)
-number_ocr.set_ranges(0)
-compute_ocr = ddddocr.DdddOcr(show_ad=False, beta=True)
-compute_ocr.set_ranges("0123456789+-x÷=")
-alphabet_ocr = ddddocr.DdddOcr(show_ad=False, beta=True)
-alphabet_ocr.set_ranges(3)
-det = ddddocr.DdddOcr(det=True, show_ad=False)
-shadow_slide = ddddocr.DdddOcr(det=False, ocr=False, show_ad=False)
+# 通用/数字/算术/字母识别共用同一个 beta 模型会话，字符集限定在解码阶段按请求应用
+MODEL_FACTORIES = {
+    "beta": lambda: tune_ddddocr(ddddocr.DdddOcr(show_ad=False, beta=True)),
+    "det": lambda: tune_ddddocr(ddddocr.DdddOcr(det=True, show_ad=False)),
+    # 滑块匹配仅使用 OpenCV，不加载任何 ONNX 模型
+    "slide": lambda: ddddocr.DdddOcr(det=False, ocr=False, show_ad=False),
+    "beta_int8": lambda: load_quantized("beta"),
+    "det_int8": lambda: load_quantized("det"),
+}
+
+
+class ModelRegistry:
+    """
+    模型注册表
+    - 模型在首次使用时加载，加载过程加锁，避免并发请求重复加载
+    - preload 在启动阶段加载指定模型并执行一次预热推理，完成后标记为 warm
+    - 量化模型的加载过程会取用浮点模型，因此使用可重入锁
+    """
+
+    def __init__(self, factories: Dict):
+        self._factories = factories
+        self._models: Dict[str, object] = {}
+        self._lock = threading.RLock()
+        self.load_times: Dict[str, float] = {}
+        self.warm = set()
+
+    def get(self, name: str):
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    start = time.perf_counter()
+                    model = self._factories[name]()
+                    self.load_times[name] = time.perf_counter() - start
+                    self._models[name] = model
+        return model
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def reset_lock(self):
+        """fork 出的子进程中重建锁：fork 时其它线程（如预加载线程）可能正持有该锁，子进程中永远不会释放"""
+        self._lock = threading.RLock()
+
+    def preload(self, names: List[str], warmup: bool = True):
+        """加载并预热指定模型，在后台线程或 fork 前的主进程中调用"""
+        for name in names:
+            if name not in self._factories:
+                print(f"[models] 未知模型 {name}，已跳过")
+                continue
+            if name in self.warm:
+                continue
+            try:
+                self.get(name)
+                if warmup:
+                    MODEL_WARMUPS[name]()
+                self.warm.add(name)
+            except Exception as e:
+                print(f"[models] 模型 {name} 加载/预热失败: {e}")
+
+    def status(self) -> Dict:
+        return {
+            name: {
+                "loaded": self.is_loaded(name),
+                "warm": name in self.warm,
+                "load_ms": round(self.load_times[name] * 1000, 1) if name in self.load_times else None
+            }
+            for name in self._factories
+        }
+
+
+model_registry = ModelRegistry(MODEL_FACTORIES)
+
+
+def get_beta_model():
+    return model_registry.get("beta")
+
+
+def get_det_model():
+    return model_registry.get("det")
+
+
+def get_slide_model():
+    return model_registry.get("slide")
+
+# 分类识别模式对应的字符集（取值同 ddddocr 的 set_ranges），None 表示不限定
+CLASSIFICATION_CHARSETS = {
+    "image": None,
+    "number": 0,
+    "compute": "0123456789+-x÷=",
+    "alphabet": 3,
+}
 
 # ==================== 工具函数 ====================
 
@@ -118,93 +744,1443 @@ def safe_eval_arithmetic(expression: str) -> float:
         raise ValueError(f"表达式计算错误: {str(e)}")
 
 
-def validate_image_size(img_base64: str, max_size: int = MAX_IMAGE_SIZE) -> bytes:
+class ImagePayload:
+    """
+    解码后的请求图片
+    base64 仅解码一次，图片头在接收阶段解析一次，之后校验、推理和裁剪共用同一份字节与 PIL 对象；
+    传入进程池时只序列化原始字节
+    """
+
+    __slots__ = ("data", "_image")
+
+    def __init__(self, data: bytes, image: Optional[Image.Image] = None):
+        self.data = data
+        self._image = image
+
+    @property
+    def image(self) -> Image.Image:
+        """PIL 图片对象，像素数据在首次使用时才解码"""
+        if self._image is None:
+            self._image = Image.open(BytesIO(self.data))
+        return self._image
+
+    def __getstate__(self):
+        return self.data
+
+    def __setstate__(self, state):
+        self.data = state
+        self._image = None
+
+
+def estimate_base64_size(img_base64: str) -> int:
+    """根据 base64 字符串长度估算解码后的字节数，无需实际解码"""
+    padding = len(img_base64) - len(img_base64.rstrip("="))
+    return len(img_base64) * 3 // 4 - padding
+
+
+def decode_image(img_base64: str, max_size: int = MAX_IMAGE_SIZE) -> ImagePayload:
     """
-    验证 base64 图片大小并返回解码后的图片数据
+    图片接收阶段：先按 base64 长度检查大小，再严格解码一次并解析图片头
     """
+    if estimate_base64_size(img_base64) > max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"图片大小超过限制，最大允许 {max_size / 1024 / 1024:.2f}MB"
+        )
+
     try:
-        img_data = base64.b64decode(img_base64)
-        
-        if len(img_data) > max_size:
+        with timed_stage("decode"):
+            img_data = base64.b64decode(img_base64, validate=True)
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的 base64 编码")
+
+    return open_image(img_data)
+
+
+def open_image(img_data: bytes) -> ImagePayload:
+    """解析图片头，无法识别的格式返回 400；按图片头声明的尺寸拒绝过大的图片，不解码像素"""
+    try:
+        with timed_stage("validation"):
+            image = Image.open(BytesIO(img_data))
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的图片格式")
+    width, height = image.size
+    if OCR_MAX_PIXELS and width * height > OCR_MAX_PIXELS:
+        metrics.inc("stupidocr_image_rejections_total", (("reason", "dimensions"),))
+        raise HTTPException(
+            status_code=400,
+            detail=f"图片尺寸过大（{width}x{height}），最多允许 {OCR_MAX_PIXELS} 像素"
+        )
+    return ImagePayload(img_data, image)
+
+
+def process_memory() -> Dict:
+    """
+    当前进程内存占用（MB）
+    rss 含与其它进程共享的页；pss 按共享进程数分摊，适合累加统计多进程总占用
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        import resource
+        return {"pid": os.getpid(), "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)}
+
+    def mb(*names):
+        return round(sum(fields.get(name, 0) for name in names) / 1024, 2)
+
+    return {
+        "pid": os.getpid(),
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty")
+    }
+
+
+# ==================== 分类模型推理 ====================
+
+CLASSIFICATION_INPUT_HEIGHT = 64
+# 点选验证码的单字裁剪统一缩放为 64x64，形状一致，可合并为一次批量推理
+DETECTION_CROP_SIZE = 64
+
+_LOWERCASE = "abcdefghijklmnopqrstuvwxyz"
+_UPPERCASE = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_DIGITS = "0123456789"
+# 字符集预设，编号与 ddddocr.set_ranges 一致；7 为除英文与数字外的全部字符
+CHARSET_PRESETS = {
+    0: _DIGITS,
+    1: _LOWERCASE,
+    2: _UPPERCASE,
+    3: _LOWERCASE + _UPPERCASE,
+    4: _LOWERCASE + _DIGITS,
+    5: _UPPERCASE + _DIGITS,
+    6: _LOWERCASE + _UPPERCASE + _DIGITS,
+}
+CHARSET_PRESET_OTHERS = 7
+MAX_CUSTOM_CHARSET_LENGTH = 1024
+
+_batch_sessions: Dict[str, Optional[onnxruntime.InferenceSession]] = {}
+_batch_session_lock = threading.Lock()
+
+
+def beta_charset() -> List[str]:
+    """beta 模型字符表，浮点与量化模型相同；只加载了量化模型时不为取字符表加载浮点模型"""
+    if model_registry.is_loaded("beta_int8") and not model_registry.is_loaded("beta"):
+        return model_registry.get("beta_int8")._DdddOcr__charset
+    return get_beta_model()._DdddOcr__charset
+
+
+@lru_cache(maxsize=1)
+def beta_charset_index() -> Dict[str, int]:
+    """beta 模型字符表中各字符的下标"""
+    return {c: i for i, c in enumerate(beta_charset())}
+
+
+@lru_cache(maxsize=256)
+def get_charset_mask(charset_range: Union[int, str, None]) -> Optional[Tuple[List[str], np.ndarray]]:
+    """
+    将字符集预设或自定义字符串转换为 (字符列表, 模型输出下标)，末尾固定包含空白符
+    模型字符表中不存在的字符会被忽略；None 表示不限定
+    """
+    if charset_range is None:
+        return None
+    validate_charset_range(charset_range)
+    charset_index = beta_charset_index()
+    if charset_range == CHARSET_PRESET_OTHERS:
+        excluded = set(_LOWERCASE + _UPPERCASE + _DIGITS)
+        chars = [c for c in charset_index if c and c not in excluded]
+    elif isinstance(charset_range, int):
+        chars = list(CHARSET_PRESETS[charset_range])
+    else:
+        chars = list(charset_range)
+
+    chars = [c for c in dict.fromkeys(chars) if c in charset_index] + [""]
+    indices = np.array([charset_index[c] for c in chars], dtype=np.int64)
+    return chars, indices
+
+
+def validate_charset_range(v):
+    """校验请求中的字符集参数，不依赖模型加载"""
+    if v is None:
+        return None
+    if isinstance(v, bool) or not isinstance(v, (int, str)):
+        raise ValueError("字符集必须为预设编号或字符串")
+    if isinstance(v, int) and v not in CHARSET_PRESETS and v != CHARSET_PRESET_OTHERS:
+        raise ValueError(f"不支持的字符集预设: {v}")
+    if isinstance(v, str) and not 0 < len(v) <= MAX_CUSTOM_CHARSET_LENGTH:
+        raise ValueError(f"自定义字符集长度需在 1-{MAX_CUSTOM_CHARSET_LENGTH} 之间")
+    return v
+
+
+def _get_batch_session(model: str = "beta"):
+    """
+    构建支持多张图片同时推理的 ONNX 会话，model 为 beta 或 beta_int8
+    ddddocr 自带模型的 batch 维被固定为 1，需借助 onnx 放开该维度；
+    未安装 onnx 时返回 None，多张图片逐张推理
+    """
+    if model in _batch_sessions:
+        return _batch_sessions[model]
+    with _batch_session_lock:
+        if model not in _batch_sessions:
+            try:
+                import onnx
+                graph = onnx.load(model_registry.get(model)._DdddOcr__graph_path)
+                graph.graph.input[0].type.tensor_type.shape.dim[0].dim_param = "batch"
+                _batch_sessions[model] = ort_session(graph.SerializeToString())
+            except ImportError:
+                _batch_sessions[model] = None
+    return _batch_sessions[model]
+
+
+# reduce 步骤：源图超过目标尺寸该倍数时，先用整数倍均值缩小到不低于目标尺寸的该倍数，再做 LANCZOS 缩放
+PREPROCESS_REDUCING_GAP = 3.0
+
+
+def normalize_image(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """
+    将图片缩放为模型输入尺寸 size 的灰度图，各步骤由 OCR_PREPROCESS 控制：
+    - draft：JPEG 尚未解码时按 1/2、1/4、1/8 降分辨率解码（不小于 size），并直接解码为灰度
+    - grayscale：先转灰度再缩放，只需处理单通道；调色板图片也因此按 LANCZOS 而不是最近邻缩放
+    - reduce：大图先整数倍缩小，避免 LANCZOS 在全分辨率上计算
+    全部关闭时与 ddddocr 的处理（彩色缩放后转灰度）一致
+    """
+    if "draft" in OCR_PREPROCESS and image.format == "JPEG":
+        image.draft("L" if "grayscale" in OCR_PREPROCESS else image.mode, size)
+    if "grayscale" in OCR_PREPROCESS:
+        image = image.convert("L")
+    reducing_gap = PREPROCESS_REDUCING_GAP if "reduce" in OCR_PREPROCESS else None
+    return image.resize(size, Image.LANCZOS, reducing_gap=reducing_gap).convert("L")
+
+
+def _classification_input(image: Image.Image, width: Optional[int] = None) -> np.ndarray:
+    """
+    与 ddddocr 一致的预处理：等比缩放到 64 像素高、灰度化并归一化到 [-1, 1]
+    指定 width 时直接缩放到该宽度；等比缩放后宽度超过其 1.25 倍的（多个字符的宽框）仍保持宽高比
+    """
+    natural_width = int(image.size[0] * (CLASSIFICATION_INPUT_HEIGHT / image.size[1]))
+    if width is None or natural_width > width * 1.25:
+        width = natural_width
+    image = normalize_image(image, (width, CLASSIFICATION_INPUT_HEIGHT))
+    array = np.asarray(image, dtype=np.float32) / 255.
+    return (array - 0.5) / 0.5
+
+
+def decode_logits(
+    logits: np.ndarray, mask: Optional[Tuple[List[str], np.ndarray]] = None, confidence: bool = False
+) -> Tuple[str, Optional[List[float]]]:
+    """
+    将单张图片的模型输出 (T, C) 解码为 (文本, 逐字符置信度)，全程在 NumPy 数组上完成：
+    - 限定字符集时先按下标取出字符子集的列，在子集内逐帧取最大值
+    - 按 CTC 规则把连续相同的帧合并为一段，去除空白段（完整字符表空白在首位，字符子集空白在末位）
+    - confidence 为真时对（子集内的）输出做 softmax，每个字符的置信度为所在段内各帧最大概率的最大值，
+      否则置信度返回 None
+    """
+    if mask is None:
+        chars, scores, blank = beta_charset(), logits, 0
+    else:
+        chars, indices = mask
+        scores, blank = logits[:, indices], len(indices) - 1
+    best = scores.argmax(axis=1)
+    starts = np.flatnonzero(np.concatenate(([True], best[1:] != best[:-1])))
+    labels = best[starts]
+    keep = labels != blank
+    text = "".join(chars[i] for i in labels[keep].tolist())
+    if not confidence:
+        return text, None
+    # 每帧最大概率 = 1 / sum(exp(x - max))
+    peaks = 1.0 / np.exp(scores - scores.max(axis=1, keepdims=True)).sum(axis=1)
+    return text, np.round(np.maximum.reduceat(peaks, starts)[keep].astype(np.float64), 4).tolist()
+
+
+def classify_images(
+    images: List[Image.Image], charset_ranges: List, width: Optional[int] = None, model: str = "beta"
+) -> List[str]:
+    """
+    使用共享的 beta 模型（model 为 beta_int8 时使用量化模型）识别多张图片，每张图片按各自的字符集解码
+    模型包含双向 LSTM，右侧填充会改变整条序列的输出，
+    因此按缩放后的宽度分组，宽度相同的图片合并为一次推理，结果与逐张推理完全一致；
+    指定 width 时图片缩放到同一宽度，合并为一次推理
+    """
+    return [text for text, _ in _classify(images, charset_ranges, width, model, False)]
+
+
+def classify_images_with_confidence(
+    images: List[Image.Image], charset_ranges: List, width: Optional[int] = None, model: str = "beta"
+) -> List[Tuple[str, List[float]]]:
+    """同 classify_images，每张图片返回 (文本, 逐字符置信度)"""
+    return _classify(images, charset_ranges, width, model, True)
+
+
+def _classify(
+    images: List[Image.Image], charset_ranges: List, width: Optional[int], model: str, confidence: bool
+) -> List[Tuple[str, Optional[List[float]]]]:
+    with timed_stage("preprocess"):
+        inputs = [_classification_input(image, width) for image in images]
+    session = _get_batch_session(model) if len(inputs) > 1 else None
+    logits: List[Optional[np.ndarray]] = [None] * len(inputs)
+    with timed_stage("inference"):
+        if session is None:
+            beta_session = model_registry.get(model)._DdddOcr__ort_session
+            for i, item in enumerate(inputs):
+                logits[i] = beta_session.run(None, {'input1': item[None, None, :, :]})[0][:, 0, :]
+        else:
+            groups: Dict[int, List[int]] = {}
+            for i, item in enumerate(inputs):
+                groups.setdefault(item.shape[1], []).append(i)
+            for indices in groups.values():
+                batch = np.stack([inputs[i] for i in indices])[:, None, :, :]
+                outputs = session.run(None, {'input1': batch})[0]  # (T, B, C)
+                for j, i in enumerate(indices):
+                    logits[i] = outputs[:, j, :]
+    with timed_stage("postprocess"):
+        return [
+            decode_logits(item, get_charset_mask(charset_range), confidence)
+            for item, charset_range in zip(logits, charset_ranges)
+        ]
+
+# ==================== 滑块快速匹配 ====================
+# 可选的快速模式（请求参数 fast），结果附带置信度 confidence：
+# - 缺口滑块：滑块按透明通道裁剪后，先在缩小的图像金字塔上做边缘模板匹配得到候选位置，
+#   再只在候选附近的窄带内以原分辨率精确匹配；滑块图与背景等高时只搜索滑块所在的行带
+# - 阴影滑块：逐像素扫描改为 numpy 向量化，坐标与 ddddocr 完全一致
+
+SLIDER_COARSE_WIDTH = 320   # 金字塔粗匹配层的最大背景宽度
+SLIDER_MIN_TEMPLATE = 12    # 粗匹配层滑块边长下限，低于此值不再缩小
+SLIDER_ROW_MARGIN = 8       # 行带限定时上下额外搜索的像素数
+SLIDER_TARGET_MARGIN = 3    # 滑块裁剪后四周留出的透明边
+
+
+def _slider_target(image: Image.Image) -> Tuple[np.ndarray, int, int, int]:
+    """
+    按非透明区域裁剪滑块，返回 (灰度图, 左上角x, 左上角y, 四周留边像素数)；无透明通道或全透明时使用整张图片
+    透明像素置黑并四周留边，使滑块轮廓在边缘检测中成为完整的闭合边缘，与背景上缺口的轮廓对应
+    """
+    if image.mode in ("P", "LA", "PA") or (image.mode == "RGB" and "transparency" in image.info):
+        image = image.convert("RGBA")
+    gray = np.asarray(image.convert("L"))
+    if "A" not in image.getbands():
+        return gray, 0, 0, 0
+    alpha = np.asarray(image.getchannel("A"))
+    ys, xs = np.nonzero(alpha)
+    if len(xs) == 0:
+        return gray, 0, 0, 0
+    x0, y0 = int(xs.min()), int(ys.min())
+    x1, y1 = int(xs.max()) + 1, int(ys.max()) + 1
+    piece = np.where(alpha[y0:y1, x0:x1] > 0, gray[y0:y1, x0:x1], 0).astype(np.uint8)
+    margin = SLIDER_TARGET_MARGIN
+    return cv2.copyMakeBorder(piece, margin, margin, margin, margin, cv2.BORDER_CONSTANT, value=0), x0, y0, margin
+
+
+def _edges(gray: np.ndarray) -> np.ndarray:
+    return cv2.Canny(gray, 100, 200)
+
+
+def _match_edges(background: np.ndarray, template: np.ndarray, box: Tuple[int, int, int, int]) -> Tuple[int, int, float]:
+    """
+    在背景灰度图的 box=(x0, y0, x1, y1) 区域内匹配模板边缘图，返回 (x, y, 归一化相关系数)
+    区域按图片边界裁剪，且至少与模板一样大
+    """
+    th, tw = template.shape
+    height, width = background.shape
+    x0, y0, x1, y1 = box
+    x0, y0 = max(0, min(x0, width - tw)), max(0, min(y0, height - th))
+    x1, y1 = min(width, max(x1, x0 + tw)), min(height, max(y1, y0 + th))
+    result = cv2.matchTemplate(_edges(background[y0:y1, x0:x1]), template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    return x0 + max_loc[0], y0 + max_loc[1], float(max_val)
+
+
+def fast_slide_match(target_image: Image.Image, background_image: Image.Image) -> Dict:
+    """缺口滑块的金字塔匹配，返回字段同 ddddocr slide_match，另附 confidence（0-1）"""
+    target, target_x, target_y, margin = _slider_target(target_image)
+    background = np.asarray(background_image.convert("L"))
+    th, tw = target.shape
+    height, width = background.shape
+    if th > height or tw > width:
+        raise ValueError("滑块图片大于背景图片")
+
+    # 滑块图与背景等高时，滑块在图中的纵坐标即缺口纵坐标
+    top, bottom = 0, height
+    if target_image.height == height:
+        top = max(0, target_y - margin - SLIDER_ROW_MARGIN)
+        bottom = min(height, target_y - margin + th + SLIDER_ROW_MARGIN)
+    band = background[top:bottom]
+
+    scale = 1
+    while width // scale > SLIDER_COARSE_WIDTH and min(th, tw) // (scale * 2) >= SLIDER_MIN_TEMPLATE:
+        scale *= 2
+    if scale == 1:
+        x, y, confidence = _match_edges(band, _edges(target), (0, 0, width, bottom - top))
+    else:
+        coarse_band = cv2.resize(band, (width // scale, band.shape[0] // scale), interpolation=cv2.INTER_AREA)
+        coarse_target = cv2.resize(target, (tw // scale, th // scale), interpolation=cv2.INTER_AREA)
+        x, y, _ = _match_edges(coarse_band, _edges(coarse_target), (0, 0, coarse_band.shape[1], coarse_band.shape[0]))
+        # 粗匹配层的一个像素对应原图 scale 个像素，精匹配窗口向四周各扩展两个粗像素
+        pad = 2 * scale
+        x, y, confidence = _match_edges(
+            band, _edges(target), (x * scale - pad, y * scale - pad, x * scale + tw + pad, y * scale + th + pad)
+        )
+    # 去掉留边，返回滑块本身在背景上的位置
+    x, y = x + margin, y + top + margin
+    tw, th = tw - 2 * margin, th - 2 * margin
+    return {
+        "target_x": target_x,
+        "target_y": target_y,
+        "target": [x, y, x + tw, y + th],
+        "confidence": round(max(0.0, confidence), 4),
+    }
+
+
+def fast_slide_comparison(target_image: Image.Image, background_image: Image.Image) -> Dict:
+    """
+    阴影滑块的向量化实现，坐标与 ddddocr slide_comparison 一致：
+    差异超过 80 的像素在某一列达到 5 个时，该列即为缺口左边缘
+    confidence 为缺口所在的连续列占全部差异像素的比例，差异分散在全图（噪点、压缩失真）时较低
+    """
+    target = np.asarray(target_image.convert("RGB"))
+    background = np.asarray(background_image.convert("RGB"))
+    if target.shape != background.shape:
+        raise ValueError("阴影图片与完整图片尺寸不一致")
+    mask = (cv2.absdiff(background, target) > 80).any(axis=2)
+    counts = mask.sum(axis=0)
+    columns = np.flatnonzero(counts >= 5)
+    if len(columns) == 0:
+        return {"target": [0, 0], "confidence": 0.0}
+    start = int(columns[0])
+    # ddddocr 取该列第 5 个差异像素的行号减 5；结果恰为 0 时其循环会在下一行改写为 1
+    start_y = int(np.flatnonzero(mask[:, start])[4]) - 5
+    if start_y == 0 and mask.shape[0] > 6:
+        start_y = 1
+    end = start
+    while end < len(counts) and counts[end] >= 5:
+        end += 1
+    confidence = float(counts[start:end].sum()) / float(counts.sum())
+    return {"target": [start + 2, start_y], "confidence": round(confidence, 4)}
+
+# ==================== 识别任务 ====================
+# 以下函数为同步的纯计算任务，由推理执行器在线程池/进程池中调用，不得在事件循环中直接执行
+
+def evaluate_compute_text(string: str):
+    """将识别出的算式文本计算为结果，失败时返回错误描述"""
+    string = string.split("=")[0].replace("x", "*").replace("÷", "/")
+
+    try:
+        value = safe_eval_arithmetic(string)
+        return int(value) if value.is_integer() else value
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    except Exception:
+        return "Error: 计算失败"
+
+
+def finish_classification(mode: str, text: str):
+    """分类识别的模式后处理：算术模式计算结果，其它模式直接返回文本"""
+    if mode != "compute":
+        return text
+    with timed_stage("postprocess"):
+        return evaluate_compute_text(text)
+
+
+def classification_result(mode: str, text: str, confidences: Optional[List[float]]):
+    """分类识别的最终结果：请求置信度时为 {"result": 结果, "confidence": 逐字符置信度}，否则为结果本身"""
+    result = finish_classification(mode, text)
+    if confidences is None:
+        return result
+    return {"result": result, "confidence": confidences}
+
+
+def recognize_classification(mode: str, img: ImagePayload, charset_range=None, confidence: bool = False):
+    """
+    通用/数字/算术/字母验证码识别
+    charset_range 为空时使用模式默认字符集，否则按请求指定的字符集解码；
+    confidence 为真时附带逐字符置信度（算术模式为识别出的算式各字符）
+    """
+    if charset_range is None:
+        charset_range = CLASSIFICATION_CHARSETS[mode]
+    (text, confidences), = _classify([img.image], [charset_range], None, model_variant("beta", mode), confidence)
+    return classification_result(mode, text, confidences)
+
+
+def recognize_detection(img: ImagePayload) -> Dict:
+    """
+    文字点选验证码识别，返回 {文字: [中心x, 中心y]}
+    全部检测框的裁剪缩放为同一尺寸后一次批量识别；识别出重复文字时，
+    第一个保留原文字作为键，之后的依次记为 "文字#2"、"文字#3"，不再互相覆盖
+    """
+    img_pil = img.image
+    with timed_stage("inference"):
+        boxes = model_registry.get(model_variant("det", "detection")).detection(img.data)
+    texts = classify_images(
+        [img_pil.crop(box) for box in boxes], [None] * len(boxes),
+        width=DETECTION_CROP_SIZE, model=model_variant("beta", "detection")
+    )
+    result = {}
+    for text, box in zip(texts, boxes):
+        key, index = text, 2
+        while key in result:
+            key, index = f"{text}#{index}", index + 1
+        result[key] = [
+            box[0] + (box[2] - box[0]) // 2,
+            box[1] + (box[3] - box[1]) // 2
+        ]
+    return result
+
+
+def match_slider_gap(gapimg: ImagePayload, fullimg: ImagePayload) -> Dict:
+    """缺口滑块匹配"""
+    with timed_stage("inference"):
+        return get_slide_model().slide_match(gapimg.data, fullimg.data)
+
+
+def match_slider_shadow(shadowimg: ImagePayload, fullimg: ImagePayload) -> Dict:
+    """阴影滑块匹配"""
+    with timed_stage("inference"):
+        return get_slide_model().slide_comparison(shadowimg.data, fullimg.data)
+
+
+def match_slider_gap_fast(gapimg: ImagePayload, fullimg: ImagePayload) -> Dict:
+    """缺口滑块快速匹配"""
+    with timed_stage("inference"):
+        return fast_slide_match(gapimg.image, fullimg.image)
+
+
+def match_slider_shadow_fast(shadowimg: ImagePayload, fullimg: ImagePayload) -> Dict:
+    """阴影滑块快速匹配"""
+    with timed_stage("inference"):
+        return fast_slide_comparison(shadowimg.image, fullimg.image)
+
+
+# 非分类识别模式对应的任务，参数为一张或两张图片
+OCR_TASKS = {
+    "detection": recognize_detection,
+    "slider_gap": match_slider_gap,
+    "slider_shadow": match_slider_shadow,
+    "slider_gap_fast": match_slider_gap_fast,
+    "slider_shadow_fast": match_slider_shadow_fast,
+}
+SLIDER_MODES = ("slider_gap", "slider_shadow")
+OCR_MODES = tuple(CLASSIFICATION_CHARSETS) + ("detection",) + SLIDER_MODES
+
+
+def slider_task(mode: str, fast: bool) -> str:
+    """滑块模式对应的任务名，快速模式使用 *_fast 任务（结果缓存与统计也按任务名区分）"""
+    return f"{mode}_fast" if fast else mode
+
+# ==================== 模型预热 ====================
+
+def _warmup_png(size, mode: str = "RGB", color="white", box=None, box_color="black") -> bytes:
+    """生成预热用的 PNG 图片"""
+    image = Image.new(mode, size, color)
+    if box is not None:
+        image.paste(box_color, box)
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def warm_up_beta(model: str = "beta"):
+    """执行一次分类推理；启用批处理时同时构建并预热批量会话"""
+    images = [Image.new("RGB", (128, 64), "white")]
+    classify_images(images, [None], model=model)
+    if OCR_BATCHING:
+        classify_images(images * 2, [None, 0], model=model)
+
+
+def warm_up_det(model: str = "det"):
+    model_registry.get(model).detection(_warmup_png((416, 416), box=(100, 100, 160, 160)))
+
+
+def warm_up_slide():
+    target = _warmup_png((40, 40), "RGBA", (0, 0, 0, 0), (10, 10, 30, 30), (0, 0, 0, 255))
+    background = _warmup_png((120, 40), box=(60, 10, 80, 30))
+    get_slide_model().slide_match(target, background)
+    get_slide_model().slide_comparison(background, background)
+
+
+MODEL_WARMUPS = {
+    "beta": warm_up_beta,
+    "det": warm_up_det,
+    "beta_int8": lambda: warm_up_beta("beta_int8"),
+    "det_int8": lambda: warm_up_det("det_int8"),
+    "slide": warm_up_slide,
+}
+
+# ==================== 推理执行器 ====================
+
+def _timed_call(func, args, submitted_at: float):
+    """在执行器内运行任务，返回排队等待时间、任务结果以及任务内记录的阶段耗时"""
+    wait_time = time.time() - submitted_at
+    _stage_sink.records = records = []
+    try:
+        return wait_time, func(*args), records
+    finally:
+        _stage_sink.records = None
+
+
+def _init_inference_process():
+    """
+    推理进程的初始化函数：重建 fork 时可能被其它线程持有的锁，
+    再加载并预热预加载模型（fork 出的进程已继承主进程加载的模型时直接跳过）
+    """
+    global _batch_session_lock
+    model_registry.reset_lock()
+    _batch_session_lock = threading.Lock()
+    model_registry.preload(OCR_PRELOAD_MODELS, OCR_WARMUP)
+
+
+def _inference_process_pid() -> int:
+    """就绪检查任务：在推理进程初始化完成后才会执行，短暂停留使各任务分散到不同进程"""
+    time.sleep(0.05)
+    return os.getpid()
+
+
+class InferenceExecutor:
+    """
+    有界推理执行器
+    - 将模型推理从事件循环移入线程池或进程池
+    - 排队任务数超过上限时立即返回 503，并携带 Retry-After
+    - 进程池的每个进程启动时加载并预热模型，warm_up 等待全部进程完成后 ready 才为真
+    - 计数器仅在事件循环线程中修改，无需加锁
+    """
+
+    def __init__(self, kind: str, max_workers: int, queue_size: int, retry_after: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"不支持的执行器类型: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.ready = kind == "thread"  # 线程池与主进程共用模型，无需单独预热
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers, initializer=_init_inference_process
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers,
+                            thread_name_prefix="ocr-inference"
+                        )
+        return self._executor
+
+    def warm_up(self, timeout: float = 600):
+        """
+        进程池：启动全部推理进程并等待各进程完成模型加载与预热，在模型预加载线程中调用
+        就绪检查任务只会在进程初始化完成后执行，收到全部进程的 pid 即说明全部就绪
+        """
+        if self.kind != "process":
+            return
+        deadline = time.time() + timeout
+        seen = set()
+        try:
+            while len(seen) < self.max_workers:
+                if time.time() > deadline:
+                    print(f"[inference] 推理进程预热超时，已就绪 {len(seen)}/{self.max_workers}")
+                    return
+                executor = self._get_executor()
+                futures = [executor.submit(_inference_process_pid) for _ in range(self.max_workers)]
+                seen.update(future.result(timeout=max(1.0, deadline - time.time())) for future in futures)
+        except Exception as e:
+            print(f"[inference] 推理进程预热失败: {e}")
+            return
+        self.ready = True
+
+    @property
+    def queue_depth(self) -> int:
+        """正在排队（尚未被工作线程/进程取走）的任务数"""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, func, *args):
+        """提交任务并等待结果，队列已满时抛出 503"""
+        if self.in_flight >= self.max_workers + self.queue_size:
+            self.rejected += 1
             raise HTTPException(
-                status_code=400,
-                detail=f"图片大小超过限制，最大允许 {max_size / 1024 / 1024:.2f}MB"
+                status_code=503,
+                detail="推理队列已满，请稍后重试",
+                headers={"Retry-After": str(self.retry_after)}
             )
-        
-        # 验证是否为有效图片
+
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
         try:
-            img = Image.open(BytesIO(img_data))
-            img.verify()
+            wait_time, result, stages = await loop.run_in_executor(
+                self._get_executor(), _timed_call, func, args, time.time()
+            )
+            observe_stage("queue_wait", wait_time)
+            for stage, seconds in stages:
+                observe_stage(stage, seconds)
+            self.total_wait += wait_time
+            self.max_wait = max(self.max_wait, wait_time)
+            self.completed += 1
+            return result
         except Exception:
-            raise HTTPException(status_code=400, detail="无效的图片格式")
-        
-        return img_data
-    except HTTPException:
-        raise
-    except Exception as e:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict:
+        finished = self.completed
+        return {
+            "kind": self.kind,
+            "ready": self.ready,
+            "max_workers": self.max_workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / finished * 1000, 3) if finished else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3)
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+inference_executor = InferenceExecutor(
+    INFERENCE_EXECUTOR,
+    INFERENCE_WORKERS,
+    INFERENCE_QUEUE_SIZE,
+    INFERENCE_RETRY_AFTER
+)
+
+# ==================== 动态批处理 ====================
+
+def classify_batch(items: List[Tuple[str, ImagePayload, Optional[Union[int, str]], bool]]) -> List:
+    """对一批 (模式, 图片, 字符集, 是否返回置信度) 执行一次批量推理，并按输入顺序返回识别结果"""
+    charset_ranges = [
+        CLASSIFICATION_CHARSETS[mode] if charset_range is None else charset_range
+        for mode, _, charset_range, _ in items
+    ]
+    # 浮点与量化模型的条目分别推理；批内有条目请求置信度时整组计算，再按条目取舍
+    variants = [model_variant("beta", mode) for mode, _, _, _ in items]
+    outputs: List[Optional[Tuple[str, Optional[List[float]]]]] = [None] * len(items)
+    for variant in set(variants):
+        indices = [i for i, v in enumerate(variants) if v == variant]
+        for i, output in zip(indices, _classify(
+            [items[i][1].image for i in indices], [charset_ranges[i] for i in indices], None, variant,
+            any(items[i][3] for i in indices)
+        )):
+            outputs[i] = output
+    return [
+        classification_result(mode, text, confidences if confidence else None)
+        for (mode, _, _, confidence), (text, confidences) in zip(items, outputs)
+    ]
+
+
+class MicroBatcher:
+    """
+    动态微批处理器
+    在事件循环内收集分类识别请求，达到 max_size 张或等待 max_wait_ms 后合并为一次推理，
+    再把结果分发给各个等待中的请求；各模式共用同一模型，可混合在同一批中
+    """
+
+    def __init__(self, max_size: int, max_wait_ms: float):
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+        self.histogram: Dict[int, int] = {}
+
+    async def submit(self, mode: str, img: ImagePayload, charset_range=None, confidence: bool = False):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((mode, img, charset_range, confidence), future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+        self.histogram[len(batch)] = self.histogram.get(len(batch), 0) + 1
+        asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        try:
+            results = await inference_executor.run(classify_batch, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "histogram": {str(size): count for size, count in sorted(self.histogram.items())}
+        }
+
+
+classification_batcher = MicroBatcher(OCR_BATCH_MAX_SIZE, OCR_BATCH_MAX_WAIT_MS) if OCR_BATCHING else None
+
+
+async def run_classification(mode: str, img: ImagePayload, charset_range=None, confidence: bool = False):
+    """执行分类识别：启用批处理时进入批处理器，否则直接提交执行器"""
+    if classification_batcher is not None:
+        return await classification_batcher.submit(mode, img, charset_range, confidence)
+    return await inference_executor.run(recognize_classification, mode, img, charset_range, confidence)
+
+# ==================== 结果缓存 ====================
+
+def make_cache_key(mode: str, images: List[ImagePayload], charset_range=None, confidence: bool = False) -> str:
+    """以识别模式、字符集、是否返回置信度和解码后图片内容计算缓存键"""
+    hasher = hashlib.blake2b(mode.encode(), digest_size=16)
+    if charset_range is not None:
+        hasher.update(repr(charset_range).encode("utf-8"))
+    if confidence:
+        hasher.update(b"\x00confidence")
+    for img in images:
+        hasher.update(len(img.data).to_bytes(8, "little"))
+        hasher.update(img.data)
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    """
+    进程内 LRU 结果缓存
+    - 条目超过 TTL 后失效
+    - 按结果序列化后的字节数限制总大小，超出时淘汰最久未使用的条目
+    - 仅在事件循环线程中访问，无需加锁
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.mode_stats: Dict[str, Dict[str, int]] = {}
+
+    def _record(self, mode: str, hit: bool):
+        counters = self.mode_stats.setdefault(mode, {"hits": 0, "misses": 0})
+        if hit:
+            self.hits += 1
+            counters["hits"] += 1
+        else:
+            self.misses += 1
+            counters["misses"] += 1
+
+    def get(self, mode: str, key: str):
+        """返回 (是否命中, 结果)"""
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.time():
+            self._data.move_to_end(key)
+            self._record(mode, True)
+            return True, entry[2]
+        if entry is not None:
+            self._remove(key)
+        self._record(mode, False)
+        return False, None
+
+    def set(self, mode: str, key: str, value):
+        size = len(key) + len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.time() + self.ttl, size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "items": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "modes": self.mode_stats
+        }
+
+
+class SqliteResultCache(ResultCache):
+    """
+    基于 SQLite 文件的共享结果缓存，供多个 Uvicorn 进程共用
+    - 由 cache_get/cache_set 放到线程池中调用，不阻塞事件循环
+    - 命中时的最近访问时间先记在内存中，攒够 TOUCH_BATCH 条或超过 TOUCH_INTERVAL 秒再批量写入
+    - SQLite 出错（如其它进程长时间持有写锁）时按未命中处理或放弃写入，不影响识别结果
+    命中/未命中计数为当前进程的统计
+    """
+
+    backend = "sqlite"
+    EVICT_EVERY = 64  # 每写入多少次检查一次总大小
+    TOUCH_BATCH = 256  # 积累多少条访问时间后写入一次
+    TOUCH_INTERVAL = 5.0  # 访问时间最长延迟写入秒数
+
+    def __init__(self, path: str, max_bytes: int, ttl: int):
+        super().__init__(max_bytes, ttl)
+        self.path = path
+        self.errors = 0
+        self._writes = 0
+        self._touched: Dict[str, float] = {}  # 尚未写入的最近访问时间
+        self._touched_at = time.time()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_result_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ocr_result_cache_accessed ON ocr_result_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, mode: str, key: str):
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM ocr_result_cache WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+            except sqlite3.Error:
+                self._failed()
+                row = None
+            if row is not None:
+                self._touched[key] = now
+                if len(self._touched) >= self.TOUCH_BATCH or now - self._touched_at >= self.TOUCH_INTERVAL:
+                    try:
+                        self._flush_touched(now)
+                        self._conn.commit()
+                    except sqlite3.Error:
+                        self._failed()
+            self._record(mode, row is not None)
+        if row is None:
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, mode: str, key: str, value):
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(key) + len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ocr_result_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, data, size, now + self.ttl, now)
+                )
+                self._writes += 1
+                if self._writes % self.EVICT_EVERY == 0:
+                    self._flush_touched(now)
+                    self._evict(now)
+                self._conn.commit()
+            except sqlite3.Error:
+                self._failed()
+
+    def _flush_touched(self, now: float):
+        """批量写入积累的最近访问时间，由调用方提交"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE ocr_result_cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+        self._touched_at = now
+
+    def _failed(self):
+        """回滚未提交的修改；访问时间只用于淘汰排序，直接丢弃"""
+        self.errors += 1
+        self._touched.clear()
+        self._touched_at = time.time()
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, now: float):
+        """删除过期条目，并按最近访问时间淘汰超出容量的条目"""
+        self._conn.execute("DELETE FROM ocr_result_cache WHERE expires_at <= ?", (now,))
+        cursor = self._conn.execute("""
+            DELETE FROM ocr_result_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC) AS total
+                    FROM ocr_result_cache
+                ) WHERE total > ?
+            )
+        """, (self.max_bytes,))
+        self.evictions += max(cursor.rowcount, 0)
+
+    def stats(self) -> Dict:
+        result = super().stats()
+        with self._lock:
+            try:
+                items, total = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_result_cache"
+                ).fetchone()
+            except sqlite3.Error:
+                items = total = None
+        result.update({"items": items, "bytes": total, "path": self.path, "errors": self.errors})
+        return result
+
+
+def create_result_cache() -> Optional[ResultCache]:
+    """按配置创建结果缓存，未启用时返回 None"""
+    if not OCR_CACHE or OCR_CACHE_MAX_BYTES == 0:
+        return None
+    if OCR_CACHE_BACKEND == "sqlite":
+        return SqliteResultCache(OCR_CACHE_PATH, OCR_CACHE_MAX_BYTES, OCR_CACHE_TTL)
+    if OCR_CACHE_BACKEND != "memory":
+        raise ValueError(f"不支持的缓存后端: {OCR_CACHE_BACKEND}")
+    return ResultCache(OCR_CACHE_MAX_BYTES, OCR_CACHE_TTL)
+
+
+result_cache = create_result_cache()
+
+
+async def cache_get(mode: str, key: str):
+    """查询结果缓存，返回 (是否命中, 结果)；SQLite 后端放到线程池执行，不阻塞事件循环"""
+    if isinstance(result_cache, SqliteResultCache):
+        return await run_in_threadpool(result_cache.get, mode, key)
+    return result_cache.get(mode, key)
+
+
+async def cache_set(mode: str, key: str, value):
+    """写入结果缓存；SQLite 后端放到线程池执行"""
+    if isinstance(result_cache, SqliteResultCache):
+        await run_in_threadpool(result_cache.set, mode, key, value)
+    else:
+        result_cache.set(mode, key, value)
+
+# ==================== 请求合并 ====================
+
+class SingleFlight:
+    """
+    进程内请求合并：相同键的并发调用只执行一次，其余调用等待同一结果（或同一异常）
+    执行放在独立任务中，先到的请求被取消（如客户端断开）不影响仍在等待的请求
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.mode_coalesced: Dict[str, int] = {}
+
+    async def run(self, mode: str, key: str, factory):
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            self.mode_coalesced[mode] = self.mode_coalesced.get(mode, 0) + 1
+            metrics.inc("stupidocr_coalesced_requests_total", (("mode", mode),))
+        else:
+            self.executed += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future):
+        self._calls.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # 等待者全部取消时避免 "exception was never retrieved" 警告
+
+    def stats(self) -> Dict:
+        total = self.executed + self.coalesced
+        return {
+            "enabled": True,
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+            "modes": dict(self.mode_coalesced)
+        }
+
+
+single_flight = SingleFlight() if OCR_SINGLE_FLIGHT else None
+
+
+async def run_ocr(mode: str, *images: ImagePayload, charset_range=None, confidence: bool = False):
+    """
+    执行一次识别：先查结果缓存，未命中时合并到进行中的相同识别，没有再提交推理
+    - 分类模式（image/number/compute/alphabet）经由批处理器或执行器，charset_range 可覆盖模式默认字符集，
+      confidence 为真时返回 {"result": 结果, "confidence": 逐字符置信度}
+    - 其它模式（detection/slider_gap/slider_shadow）直接提交执行器，忽略 charset_range 与 confidence
+    """
+    if mode not in CLASSIFICATION_CHARSETS:
+        charset_range = None
+        confidence = False
+    key = None
+    if result_cache is not None or single_flight is not None:
+        key = make_cache_key(mode, images, charset_range, confidence)
+    if result_cache is not None:
+        hit, value = await cache_get(mode, key)
+        if hit:
+            return value
+
+    if single_flight is None:
+        return await execute_ocr(mode, images, charset_range, confidence, key)
+    return await single_flight.run(
+        mode, key, lambda: execute_ocr(mode, images, charset_range, confidence, key)
+    )
+
+
+async def execute_ocr(mode: str, images, charset_range, confidence: bool, key: Optional[str]):
+    """提交推理并写入结果缓存（缓存开启时）"""
+    try:
+        if mode in CLASSIFICATION_CHARSETS:
+            result = await run_classification(mode, images[0], charset_range, confidence)
+        else:
+            result = await inference_executor.run(OCR_TASKS[mode], *images)
+    except (OSError, SyntaxError) as e:
+        # PIL 在推理阶段才解码像素，截断或损坏的图片在此处报错
         raise HTTPException(status_code=400, detail=f"图片解码失败: {str(e)}")
+    except ValueError as e:
+        # 图片可以解码但不符合识别要求，如滑块大于背景
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if result_cache is not None:
+        await cache_set(mode, key, result)
+    return result
+
+# ==================== 限流 ====================
+
+# 滑动窗口：(窗口长度秒数, 名称)，顺序与 hit() 的 limits 参数一致
+RATE_LIMIT_WINDOWS = ((60, "minute"), (3600, "hour"))
+
+
+def slide_window(state: List[int], index: int) -> Tuple[int, int]:
+    """
+    将窗口状态 [窗口序号, 本窗口计数, 上一窗口计数] 推进到窗口 index，返回 (本窗口计数, 上一窗口计数)
+    超过一个窗口未访问时两者均清零
+    """
+    if state[0] == index:
+        return state[1], state[2]
+    if state[0] == index - 1:
+        return 0, state[1]
+    return 0, 0
+
+
+def admit_sliding_window(states: List[List[int]], limits, cost: int, now: float) -> Optional[int]:
+    """
+    滑动窗口计数：估算值 = 上一窗口计数 × 上一窗口仍落在滑动窗口内的比例 + 本窗口计数
+    相比固定窗口，避免了窗口交界处两倍突发；每个窗口只需保存两个计数
+    全部窗口通过时原地更新 states 并返回 None，否则不修改 states，返回被拒绝的窗口序号
+    """
+    advanced = []
+    for i, (length, _) in enumerate(RATE_LIMIT_WINDOWS):
+        index, offset = divmod(now, length)
+        index = int(index)
+        current, previous = slide_window(states[i], index)
+        limit = limits[i]
+        if limit is not None and previous * (1 - offset / length) + current + cost > limit:
+            return i
+        advanced.append([index, current + cost, previous])
+    states[:] = advanced
+    return None
+
+
+class RateLimiter:
+    """
+    进程内滑动窗口限流，每个 Token 一把锁，不同 Token 之间互不阻塞
+    多个工作进程之间不共享计数，仅适用于单进程部署
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self._states: Dict[str, Tuple[threading.Lock, List[List[int]]]] = {}
+
+    def hit(self, token_value: str, limits, cost: int = 1) -> Optional[int]:
+        """计入一次请求，返回 None 表示放行，否则返回被拒绝的窗口序号（0 分钟，1 小时）"""
+        entry = self._states.get(token_value)
+        if entry is None:
+            entry = self._states.setdefault(
+                token_value, (threading.Lock(), [[0, 0, 0] for _ in RATE_LIMIT_WINDOWS])
+            )
+        lock, states = entry
+        with lock:
+            return admit_sliding_window(states, limits, cost, time.time())
+
+    def prune(self, valid_tokens):
+        """丢弃已不存在的 Token 的状态"""
+        self._states = {k: v for k, v in self._states.items() if k in valid_tokens}
+
+
+class SqliteRateLimiter(RateLimiter):
+    """
+    基于 SQLite（WAL）文件的滑动窗口限流，同一主机上的所有工作进程共享计数
+    每次检查为一个 BEGIN IMMEDIATE 短事务，由 SQLite 文件锁保证跨进程原子性；每个线程使用独立连接，不经过 Python 全局锁
+    计数只用于限流，无需落盘持久化，因此关闭同步（synchronous=OFF）
+    """
+
+    backend = "sqlite"
+    PRUNE_INTERVAL = 600  # 秒
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = time.time()
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limit_windows (
+                token TEXT PRIMARY KEY,
+                minute_window INTEGER NOT NULL,
+                minute_count INTEGER NOT NULL,
+                minute_previous INTEGER NOT NULL,
+                hour_window INTEGER NOT NULL,
+                hour_count INTEGER NOT NULL,
+                hour_previous INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, token_value: str, limits, cost: int = 1) -> Optional[int]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT minute_window, minute_count, minute_previous, hour_window, hour_count, hour_previous "
+                "FROM rate_limit_windows WHERE token = ?",
+                (token_value,)
+            ).fetchone()
+            states = [list(row[0:3]), list(row[3:6])] if row else [[0, 0, 0], [0, 0, 0]]
+            rejected = admit_sliding_window(states, limits, cost, time.time())
+            if rejected is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limit_windows VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (token_value, *states[0], *states[1])
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return rejected
+
+    def prune(self, valid_tokens):
+        """
+        其它进程可能仍在使用本进程尚未刷新到的新 Token，因此不按 Token 列表删除，
+        只定期删除超过一小时未访问（两个窗口均已失效）的记录
+        """
+        now = time.time()
+        if now - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        conn = self._connection()
+        conn.execute("DELETE FROM rate_limit_windows WHERE hour_window < ?", (int(now // 3600) - 1,))
 
 
-def extract_text_from_probability(result: Dict) -> str:
-    """从概率结果中提取文本"""
-    return "".join(result['charsets'][i.index(max(i))] for i in result['probability'])
+def create_rate_limiter() -> RateLimiter:
+    """按配置创建限流器"""
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SqliteRateLimiter(RATE_LIMIT_PATH)
+    if RATE_LIMIT_BACKEND != "memory":
+        raise ValueError(f"不支持的限流后端: {RATE_LIMIT_BACKEND}")
+    return RateLimiter()
+
+
+rate_limiter = create_rate_limiter()
 
 # ==================== Token 管理 ====================
 
-token_cache: List[Dict] = []
-token_value_cache = set()
-token_value_map: Dict[str, Dict] = {}
-token_cache_lock = threading.Lock()
-rate_limit_state: Dict[str, Dict] = {}
-rate_limit_lock = threading.Lock()
+class TokenSnapshot:
+    """
+    Token 缓存的不可变快照：配置变化时整体构建新快照并替换全局引用，读取方无需加锁
+    快照内的 Token 字典除 usage_count 由同步流程原地更新外视为只读，对外返回时复制
+    """
+
+    __slots__ = ("tokens", "by_value", "by_id")
+
+    def __init__(self, tokens: List[Dict]):
+        self.tokens = tuple(tokens)
+        self.by_value: Dict[str, Dict] = {t['token']: t for t in tokens if t.get('token')}
+        self.by_id: Dict[str, Dict] = {t['id']: t for t in tokens}
+
+
+token_snapshot = TokenSnapshot([])
+token_cache_version = 0  # 上次同步到的 token_state.version
+token_refresh_lock = threading.Lock()  # 仅串行化刷新，读取不加锁
+# 尚未落库的调用次数增量：usage_increment_queue 为待写入，usage_flushing 为正在写入
 usage_increment_queue: Dict[str, int] = {}
+usage_flushing: Dict[str, int] = {}
 usage_queue_lock = threading.Lock()
 USAGE_FLUSH_INTERVAL = 5  # 秒
 usage_flush_thread: Optional[threading.Thread] = None
 
 
-def get_db_connection() -> sqlite3.Connection:
-    """获取 SQLite 连接"""
-    conn = sqlite3.connect(TOKEN_DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+class SqlitePool:
+    """
+    SQLite 长连接池：连接以 WAL 模式打开后反复复用，空闲连接最多保留 size 个
+    connection() 上下文正常退出时提交、异常时回滚，然后归还连接；fork 后需重新创建
+    """
 
+    def __init__(self, path: str, size: int = 4):
+        self.path = path
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=size)
 
-def load_tokens_from_db() -> List[Dict]:
-    """从 SQLite 读取所有 Token"""
-    conn = get_db_connection()
-    cursor = conn.execute("""
-        SELECT id, token, name, created_at, updated_at, minute_limit, hour_limit, usage_count
-        FROM tokens
-        ORDER BY id ASC
-    """)
-    rows = cursor.fetchall()
-    conn.close()
-    return [
-        {
-            'id': str(row['id']),
-            'token': row['token'],
-            'name': row['name'] or f"Token {row['id']}",
-            'created_at': row['created_at'] or "",
-            'updated_at': row['updated_at'] or row['created_at'] or "",
-            'minute_limit': row['minute_limit'],
-            'hour_limit': row['hour_limit'],
-            'usage_count': row['usage_count'] or 0
-        }
-        for row in rows
-    ]
+    def connect(self) -> sqlite3.Connection:
+        """新建一个不归还到池中的连接"""
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self.connect()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+
+token_db = SqlitePool(TOKEN_DB_PATH)
+
+
+TOKEN_COLUMNS = "id, token, name, created_at, updated_at, minute_limit, hour_limit, usage_count"
+
+
+def row_to_token(row) -> Dict:
+    """将数据库行转换为缓存中的 Token 记录"""
+    return {
+        'id': str(row['id']),
+        'token': row['token'],
+        'name': row['name'] or f"Token {row['id']}",
+        'created_at': row['created_at'] or "",
+        'updated_at': row['updated_at'] or row['created_at'] or "",
+        'minute_limit': row['minute_limit'],
+        'hour_limit': row['hour_limit'],
+        'usage_count': row['usage_count'] or 0
+    }
+
+
+def bump_token_version(conn: sqlite3.Connection) -> int:
+    """
+    在当前写事务内递增 Token 表的全局版本号并返回新版本
+    本次修改的行（revision 列）与删除记录都标记为该版本，各进程据此只加载变更部分
+    """
+    conn.execute("UPDATE token_state SET version = version + 1")
+    return conn.execute("SELECT version FROM token_state").fetchone()[0]
 
 
-def refresh_token_cache():
-    """刷新 Token 缓存"""
-    global token_cache, token_value_cache, token_value_map, rate_limit_state
-    tokens = load_tokens_from_db()
-    with token_cache_lock:
-        token_cache = tokens
-        token_value_cache = {t['token'] for t in tokens if t.get('token')}
-        token_value_map = {t['token']: t for t in tokens if t.get('token')}
-        # 清理已删除 token 的限流状态
-        rate_limit_state = {k: v for k, v in rate_limit_state.items() if k in token_value_cache}
+def refresh_token_cache(full: bool = False):
+    """
+    同步 Token 缓存：全局版本号未变化时直接返回，否则只加载上次同步之后修改或删除的行；
+    full=True 时重新加载全表
+    仅调用次数变化（其它进程落库）的行原地更新，配置变化或删除时才构建新快照并原子替换
+    """
+    global token_snapshot, token_cache_version
+    with token_refresh_lock:
+        with token_db.connection() as conn:
+            conn.execute("BEGIN")  # 版本号与变更行在同一读事务中读取，保证一致
+            version = conn.execute("SELECT version FROM token_state").fetchone()[0]
+            if not full and version == token_cache_version:
+                return
+            if full:
+                rows = conn.execute(f"SELECT {TOKEN_COLUMNS} FROM tokens ORDER BY id ASC").fetchall()
+                deleted = []
+            else:
+                rows = conn.execute(
+                    f"SELECT {TOKEN_COLUMNS} FROM tokens WHERE revision > ?", (token_cache_version,)
+                ).fetchall()
+                deleted = conn.execute(
+                    "SELECT id FROM token_tombstones WHERE revision > ?", (token_cache_version,)
+                ).fetchall()
+
+        snapshot = token_snapshot
+        if full:
+            snapshot = TokenSnapshot([row_to_token(row) for row in rows])
+        else:
+            changed = {}
+            for row in rows:
+                token = row_to_token(row)
+                current = snapshot.by_id.get(token['id'])
+                if current is not None and all(
+                    current.get(k) == v for k, v in token.items() if k != 'usage_count'
+                ):
+                    current['usage_count'] = token['usage_count']
+                else:
+                    changed[token['id']] = token
+            removed = {str(row['id']) for row in deleted} & snapshot.by_id.keys()
+            if changed or removed:
+                merged = {k: v for k, v in snapshot.by_id.items() if k not in removed}
+                merged.update(changed)
+                snapshot = TokenSnapshot(sorted(merged.values(), key=lambda t: int(t['id'])))
+        token_cache_version = version
+        if snapshot is token_snapshot:
+            return
+        token_snapshot = snapshot
+    # 清理已删除 token 的限流状态
+    rate_limiter.prune(snapshot.by_value)
 
 
 def init_db():
@@ -213,7 +2189,7 @@ def init_db():
     if db_dir and not os.path.exists(db_dir):
         os.makedirs(db_dir, exist_ok=True)
     
-    conn = get_db_connection()
+    conn = token_db.connect()
     conn.execute("""
         CREATE TABLE IF NOT EXISTS tokens (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -223,23 +2199,77 @@ def init_db():
             updated_at TEXT,
             minute_limit INTEGER,
             hour_limit INTEGER,
-            usage_count INTEGER DEFAULT 0
+            usage_count INTEGER DEFAULT 0,
+            revision INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # 旧版本数据库补充 revision 列
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(tokens)")}
+    if 'revision' not in columns:
+        conn.execute("ALTER TABLE tokens ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tokens_revision ON tokens (revision)")
+    # 管理界面按名称前缀搜索与按列排序
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tokens_name ON tokens (name COLLATE NOCASE)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tokens_created_at ON tokens (created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tokens_usage_count ON tokens (usage_count)")
+    try:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tokens_token ON tokens (token)")
+    except sqlite3.IntegrityError:
+        # 旧数据中存在重复的 token 值时退化为普通索引，仍可加速按 token 更新
+        print("[token] tokens 表存在重复的 token 值，无法建立唯一索引，请在管理页清理重复项")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tokens_token_lookup ON tokens (token)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS token_state (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO token_state (id, version) VALUES (0, 0)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS token_tombstones (
+            id INTEGER NOT NULL,
+            revision INTEGER NOT NULL
         )
     """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_token_tombstones_revision ON token_tombstones (revision)")
+    # 用量汇总：每个 (Token, 时间桶, 接口) 一行，耗时为总和（毫秒）
+    for table, column in (("usage_minute", "minute"), ("usage_hour", "hour")):
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                token_id INTEGER NOT NULL,
+                {column} INTEGER NOT NULL,
+                endpoint TEXT NOT NULL,
+                requests INTEGER NOT NULL,
+                errors INTEGER NOT NULL,
+                latency_ms REAL NOT NULL,
+                latency_max_ms REAL NOT NULL,
+                PRIMARY KEY (token_id, {column}, endpoint)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
     conn.commit()
     conn.close()
     
-    refresh_token_cache()
+    refresh_token_cache(full=True)
     try:
         os.chmod(TOKEN_DB_PATH, 0o600)
     except Exception:
         pass
 
 
+def with_pending_usage(token: Dict) -> Dict:
+    """复制 Token 记录，调用次数加上当前进程尚未落库的增量"""
+    result = token.copy()
+    value = token.get('token')
+    result['usage_count'] = (
+        (token.get('usage_count') or 0) + usage_increment_queue.get(value, 0) + usage_flushing.get(value, 0)
+    )
+    return result
+
+
 def load_tokens() -> List[Dict]:
     """返回缓存中的 Token 列表"""
-    with token_cache_lock:
-        return [t.copy() for t in token_cache]
+    return [with_pending_usage(t) for t in token_snapshot.tokens]
 
 
 def generate_token() -> str:
@@ -266,88 +2296,373 @@ def verify_session(session_id: Optional[str]) -> bool:
 
 def get_token_by_id(token_id: str) -> Optional[Dict]:
     """从缓存获取指定 Token"""
-    token_id = str(token_id)
-    with token_cache_lock:
-        for token in token_cache:
-            if token.get('id') == token_id:
-                return token.copy()
-    return None
+    token = token_snapshot.by_id.get(str(token_id))
+    return with_pending_usage(token) if token else None
+
+
+# 管理界面 Token 列表可排序的列
+TOKEN_SORT_COLUMNS = {
+    "id": "id",
+    "name": "name COLLATE NOCASE",
+    "created_at": "created_at",
+    "usage_count": "usage_count",
+}
 
 
-def enforce_rate_limit(token_value: str, minute_limit: Optional[int], hour_limit: Optional[int]):
+def query_tokens(
+    search: str = "", sort: str = "id", descending: bool = True, page: int = 1, page_size: int = 50
+) -> Tuple[int, List[Dict]]:
+    """
+    在 SQLite 中分页查询 Token，返回 (符合条件的总数, 当前页)
+    - search 按名称前缀（不区分大小写）或 Token 值前缀匹配，均为索引范围查询
+    - 调用次数为数据库中已落库的值加上当前进程尚未落库的增量；按调用次数排序时使用同一个值，
+      有未落库增量时以 json_each 在查询中合并（无法再利用 usage_count 索引），保证显示顺序与分页一致
+    """
+    where, params = "", []
+    search = search.strip()
+    if search:
+        end = search + "\U0010ffff"
+        where = "WHERE (name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE) OR (token >= ? AND token < ?)"
+        params = [search, end, search, end]
+    direction = "DESC" if descending else "ASC"
+
+    pending: Dict[str, int] = {}
+    with usage_queue_lock:
+        for source in (usage_increment_queue, usage_flushing):
+            for value, inc in source.items():
+                pending[value] = pending.get(value, 0) + inc
+
+    source, order, source_params = "tokens", TOKEN_SORT_COLUMNS[sort], []
+    if sort == "usage_count" and pending:
+        source = (
+            "tokens LEFT JOIN (SELECT key AS pending_token, value AS pending_inc FROM json_each(?)) "
+            "ON pending_token = token"
+        )
+        order = "COALESCE(usage_count, 0) + COALESCE(pending_inc, 0)"
+        source_params = [json.dumps(pending)]
+    with token_db.connection() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM tokens {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {TOKEN_COLUMNS} FROM {source} {where} "
+            f"ORDER BY {order} {direction}, id {direction} LIMIT ? OFFSET ?",
+            source_params + params + [page_size, (page - 1) * page_size]
+        ).fetchall()
+
+    tokens = []
+    for row in rows:
+        token = row_to_token(row)
+        token['usage_count'] = (token.get('usage_count') or 0) + pending.get(token['token'], 0)
+        tokens.append(token)
+    return total, tokens
+
+
+# 用量时间序列的查询粒度：(汇总表, 时间列, 每桶秒数, 最多桶数)
+USAGE_RESOLUTIONS = {
+    "minute": ("usage_minute", "minute", 60, USAGE_MINUTE_RETENTION_HOURS * 60),
+    "hour": ("usage_hour", "hour", 3600, USAGE_HOUR_RETENTION_DAYS * 24),
+}
+
+
+def query_token_usage(token_id: str, resolution: str = "minute", span: int = 60, now: Optional[float] = None) -> Dict:
+    """
+    查询 Token 最近 span 个时间桶的用量，返回逐桶序列（无请求的桶补 0）与按接口的汇总
+    分钟粒度不含进行中的当前分钟；数据来自汇总表，最多比实际请求晚一分钟加一个落库周期
+    """
+    table, column, step, _ = USAGE_RESOLUTIONS[resolution]
+    now = time.time() if now is None else now
+    last = int(now // step) - (1 if resolution == "minute" else 0)
+    first = last - span + 1
+    with token_db.connection() as conn:
+        buckets = {
+            row[0]: row[1:] for row in conn.execute(
+                f"""
+                SELECT {column}, SUM(requests), SUM(errors), SUM(latency_ms) FROM {table}
+                WHERE token_id = ? AND {column} BETWEEN ? AND ? GROUP BY {column}
+                """,
+                (token_id, first, last)
+            )
+        }
+        endpoints = conn.execute(
+            f"""
+            SELECT endpoint, SUM(requests), SUM(errors), SUM(latency_ms), MAX(latency_max_ms) FROM {table}
+            WHERE token_id = ? AND {column} BETWEEN ? AND ? GROUP BY endpoint ORDER BY SUM(requests) DESC
+            """,
+            (token_id, first, last)
+        ).fetchall()
+
+    series = []
+    for bucket in range(first, last + 1):
+        requests, errors, latency = buckets.get(bucket, (0, 0, 0.0))
+        series.append({
+            "time": bucket * step,
+            "requests": requests,
+            "errors": errors,
+            "latency_ms_avg": round(latency / requests, 2) if requests else None
+        })
+    return {
+        "token_id": str(token_id),
+        "resolution": resolution,
+        "step": step,
+        "series": series,
+        "endpoints": [
+            {
+                "endpoint": endpoint,
+                "requests": requests,
+                "errors": errors,
+                "error_rate": round(errors / requests, 4),
+                "latency_ms_avg": round(latency / requests, 2),
+                "latency_ms_max": round(latency_max, 2)
+            }
+            for endpoint, requests, errors, latency, latency_max in endpoints
+        ]
+    }
+
+
+def enforce_rate_limit(token_value: str, minute_limit: Optional[int], hour_limit: Optional[int], cost: int = 1):
     """
     针对 Token 进行分钟与小时级限流
     - minute_limit: 每分钟最大请求数，None 表示不限
     - hour_limit: 每小时最大请求数，None 表示不限
+    - cost: 本次请求计入的次数，批量识别按条目数一次性扣除
     """
-    now = time.time()
-    minute_bucket = int(now // 60)
-    hour_bucket = int(now // 3600)
-    
-    with rate_limit_lock:
-        state = rate_limit_state.get(token_value, {
-            'minute_bucket': minute_bucket,
-            'minute_count': 0,
-            'hour_bucket': hour_bucket,
-            'hour_count': 0
-        })
-        
-        if state['minute_bucket'] != minute_bucket:
-            state['minute_bucket'] = minute_bucket
-            state['minute_count'] = 0
-        if state['hour_bucket'] != hour_bucket:
-            state['hour_bucket'] = hour_bucket
-            state['hour_count'] = 0
-        
-        if minute_limit is not None and state['minute_count'] >= minute_limit:
-            raise HTTPException(status_code=429, detail=f"已超过每分钟 {minute_limit} 次的限流")
-        if hour_limit is not None and state['hour_count'] >= hour_limit:
-            raise HTTPException(status_code=429, detail=f"已超过每小时 {hour_limit} 次的限流")
-        
-        state['minute_count'] += 1
-        state['hour_count'] += 1
-        rate_limit_state[token_value] = state
-
-
-def schedule_usage_increment(token_value: str):
-    """记录 Token 调用次数，先更新内存，再批量异步落库"""
-    with token_cache_lock:
-        token_data = token_value_map.get(token_value)
-        if token_data:
-            token_data['usage_count'] = (token_data.get('usage_count') or 0) + 1
-            for cached in token_cache:
-                if cached.get('token') == token_value:
-                    cached['usage_count'] = token_data['usage_count']
-                    break
-    
+    if minute_limit is None and hour_limit is None:
+        return
+    rejected = rate_limiter.hit(token_value, (minute_limit, hour_limit), cost)
+    if rejected is not None:
+        metrics.inc("stupidocr_rate_limit_rejections_total", (("window", RATE_LIMIT_WINDOWS[rejected][1]),))
+    if rejected == 0:
+        raise HTTPException(status_code=429, detail=f"已超过每分钟 {minute_limit} 次的限流")
+    if rejected == 1:
+        raise HTTPException(status_code=429, detail=f"已超过每小时 {hour_limit} 次的限流")
+
+
+def schedule_usage_increment(token_value: str, count: int = 1):
+    """记录 Token 调用次数，先累加到内存增量，再批量异步落库"""
+    with usage_queue_lock:
+        usage_increment_queue[token_value] = usage_increment_queue.get(token_value, 0) + count
+
+
+def flush_usage_increments(pending_updates: Dict[str, int]):
+    """
+    将调用次数增量写入 SQLite
+    若落库前的版本号正是本进程上次同步的版本（期间无其它写入），直接按增量原地更新缓存，不再回读数据库
+    """
+    global token_cache_version
+    with token_db.connection() as conn:
+        revision = bump_token_version(conn)
+        conn.executemany(
+            """
+            UPDATE tokens
+            SET usage_count = COALESCE(usage_count, 0) + ?,
+                revision = ?
+            WHERE token = ?
+            """,
+            [(inc, revision, token_value) for token_value, inc in pending_updates.items()]
+        )
+
+    with token_refresh_lock:
+        if revision == token_cache_version + 1:
+            by_value = token_snapshot.by_value
+            for token_value, inc in pending_updates.items():
+                token = by_value.get(token_value)
+                if token is not None:
+                    token['usage_count'] = (token.get('usage_count') or 0) + inc
+            token_cache_version = revision
+            return
+    try:
+        refresh_token_cache()
+    except sqlite3.Error as e:
+        # 增量已经提交，不能再次落库；数据库版本已变化，下个周期会重新同步
+        print(f"[usage] 落库后同步 Token 缓存失败: {e}")
+
+
+def requeue_usage_increments(pending_updates: Dict[str, int]):
+    """落库失败时将增量放回待写入队列，下个周期重试，并清空正在写入的记录"""
+    global usage_flushing
     with usage_queue_lock:
-        usage_increment_queue[token_value] = usage_increment_queue.get(token_value, 0) + 1
+        for token_value, inc in pending_updates.items():
+            usage_increment_queue[token_value] = usage_increment_queue.get(token_value, 0) + inc
+        usage_flushing = {}
+
+
+class UsageSeries:
+    """
+    按 (Token, 接口) 统计每分钟的请求数、错误数与耗时，内存大小固定：
+    - 预分配 max_keys 行 x minutes 列的扁平数组，每个 (Token, 接口) 占一行，列按分钟循环复用（环形缓冲）
+    - 每个落库周期取出已结束、尚未落库的分钟，每个进程每分钟只落库一次，由 SQLite 累加各进程的数据
+    - 行已满时新的组合不再记录并计入 dropped；本分钟没有请求的行在取出后回收
+    落库线程停顿超过 minutes 分钟时，未落库的分钟会被新数据覆盖
+    """
+
+    def __init__(self, max_keys: int, minutes: int):
+        size = max_keys * minutes
+        self.max_keys = max_keys
+        self.minutes = minutes
+        self.requests = array('q', bytes(8 * size))
+        self.errors = array('q', bytes(8 * size))
+        self.latency = array('d', bytes(8 * size))  # 耗时总和（毫秒）
+        self.latency_max = array('d', bytes(8 * size))
+        self.stamps = array('q', [-1]) * size  # 各格子当前对应的分钟序号
+        self.last_minute = array('q', [-1]) * max_keys  # 各行最后一次记录的分钟
+        self.rows: Dict[Tuple[int, str], int] = {}
+        self.free = list(range(max_keys - 1, -1, -1))
+        self.flushed_through = int(time.time() // 60) - 1  # 已取出到的分钟（含）
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def record(self, token_id: int, endpoint: str, seconds: float, error: bool, now: Optional[float] = None):
+        minute = int((time.time() if now is None else now) // 60)
+        key = (token_id, endpoint)
+        with self.lock:
+            row = self.rows.get(key)
+            if row is None:
+                if not self.free:
+                    self.dropped += 1
+                    return
+                row = self.rows[key] = self.free.pop()
+            i = row * self.minutes + minute % self.minutes
+            if self.stamps[i] != minute:
+                self.stamps[i] = minute
+                self.requests[i] = self.errors[i] = 0
+                self.latency[i] = self.latency_max[i] = 0.0
+            ms = seconds * 1000
+            self.requests[i] += 1
+            self.errors[i] += error
+            self.latency[i] += ms
+            if ms > self.latency_max[i]:
+                self.latency_max[i] = ms
+            self.last_minute[row] = minute
+
+    def collect(self, now_minute: int) -> List[Tuple]:
+        """
+        取出 now_minute 之前已结束、尚未取出的分钟，
+        返回 [(token_id, 分钟, 接口, 请求数, 错误数, 耗时总和, 最大耗时)]
+        """
+        result = []
+        with self.lock:
+            first = max(self.flushed_through + 1, now_minute - self.minutes + 1)
+            for key, row in list(self.rows.items()):
+                base = row * self.minutes
+                for minute in range(first, now_minute):
+                    i = base + minute % self.minutes
+                    if self.stamps[i] == minute and self.requests[i]:
+                        result.append((key[0], minute, key[1], self.requests[i], self.errors[i],
+                                       self.latency[i], self.latency_max[i]))
+                if self.last_minute[row] < now_minute:
+                    # 数据已全部取出，回收该行
+                    for i in range(base, base + self.minutes):
+                        self.stamps[i] = -1
+                    del self.rows[key]
+                    self.free.append(row)
+            self.flushed_through = max(self.flushed_through, now_minute - 1)
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": True,
+            "keys": len(self.rows),
+            "max_keys": self.max_keys,
+            "minutes": self.minutes,
+            "dropped": self.dropped,
+            "memory_bytes": sum(a.itemsize * len(a) for a in (
+                self.requests, self.errors, self.latency, self.latency_max, self.stamps, self.last_minute
+            ))
+        }
+
+
+usage_series = UsageSeries(USAGE_SERIES_MAX_KEYS, USAGE_SERIES_MINUTES) if USAGE_SERIES else None
+usage_pruned_hour = 0  # 上次清理过期汇总数据时的小时序号
+
+
+def record_token_usage(token_value: str, endpoint: str, seconds: float, error: bool):
+    """记录一次请求到用量时间序列；未知 Token 不记录，保证内存中的组合数有界"""
+    token = token_snapshot.by_value.get(token_value)
+    if token is not None:
+        usage_series.record(int(token['id']), endpoint, seconds, error)
+
+
+def flush_usage_series(now: Optional[float] = None):
+    """将已结束的分钟累加写入分钟与小时汇总表，并每小时清理一次超过保留时长的数据"""
+    global usage_pruned_hour
+    now = time.time() if now is None else now
+    minutes = usage_series.collect(int(now // 60))
+    hour = int(now // 3600)
+    prune = hour != usage_pruned_hour
+    if not minutes and not prune:
+        return
+
+    hours: Dict[Tuple[int, int, str], List] = {}
+    for token_id, minute, endpoint, requests, errors, latency, latency_max in minutes:
+        entry = hours.setdefault((token_id, minute // 60, endpoint), [0, 0, 0.0, 0.0])
+        entry[0] += requests
+        entry[1] += errors
+        entry[2] += latency
+        entry[3] = max(entry[3], latency_max)
+
+    with token_db.connection() as conn:
+        for table, column, rows in (
+            ("usage_minute", "minute", minutes),
+            ("usage_hour", "hour", [key + tuple(value) for key, value in hours.items()]),
+        ):
+            conn.executemany(
+                f"""
+                INSERT INTO {table} (token_id, {column}, endpoint, requests, errors, latency_ms, latency_max_ms)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (token_id, {column}, endpoint) DO UPDATE SET
+                    requests = requests + excluded.requests,
+                    errors = errors + excluded.errors,
+                    latency_ms = latency_ms + excluded.latency_ms,
+                    latency_max_ms = MAX(latency_max_ms, excluded.latency_max_ms)
+                """,
+                rows
+            )
+        if prune:
+            conn.execute("DELETE FROM usage_minute WHERE minute < ?",
+                         (int(now // 60) - USAGE_MINUTE_RETENTION_HOURS * 60,))
+            conn.execute("DELETE FROM usage_hour WHERE hour < ?", (hour - USAGE_HOUR_RETENTION_DAYS * 24,))
+    usage_pruned_hour = hour
 
 
 def usage_flush_worker():
-    """周期性将调用次数增量写入 SQLite"""
+    """
+    周期性将调用次数增量与用量时间序列写入 SQLite，并检查其它进程的修改
+    通过专用长连接的 PRAGMA data_version 判断数据库是否被其它连接修改过，未修改时不做任何查询，
+    因此管理端的修改最多延迟 USAGE_FLUSH_INTERVAL 秒同步到所有进程
+    每一步出错（如数据库被锁）时只记录日志，下个周期重试，线程不会退出；调用次数增量放回队列，不会丢失
+    """
+    global usage_flushing
+    watch_conn = token_db.connect()
+    try:
+        data_version = watch_conn.execute("PRAGMA data_version").fetchone()[0]
+    except sqlite3.Error:
+        data_version = None  # 第一个周期强制同步一次
     while True:
         time.sleep(USAGE_FLUSH_INTERVAL)
         with usage_queue_lock:
             pending_updates = usage_increment_queue.copy()
             usage_increment_queue.clear()
+            usage_flushing = pending_updates
         
-        if not pending_updates:
-            continue
+        if pending_updates:
+            try:
+                flush_usage_increments(pending_updates)
+                usage_flushing = {}
+            except sqlite3.Error as e:
+                print(f"[usage] 调用次数落库失败，下个周期重试: {e}")
+                requeue_usage_increments(pending_updates)
+        if usage_series is not None:
+            try:
+                flush_usage_series()
+            except sqlite3.Error as e:
+                print(f"[usage] 用量时间序列落库失败: {e}")
         
-        conn = get_db_connection()
-        for token_value, inc in pending_updates.items():
-            conn.execute(
-                """
-                UPDATE tokens
-                SET usage_count = COALESCE(usage_count, 0) + ?
-                WHERE token = ?
-                """,
-                (inc, token_value)
-            )
-        conn.commit()
-        conn.close()
-        refresh_token_cache()
+        try:
+            current = watch_conn.execute("PRAGMA data_version").fetchone()[0]
+            if current != data_version:
+                refresh_token_cache()
+                data_version = current
+        except sqlite3.Error as e:
+            print(f"[usage] 同步其它进程的 Token 修改失败，下个周期重试: {e}")
 
 
 def start_usage_flush_worker():
@@ -362,17 +2677,16 @@ def start_usage_flush_worker():
 def add_token_record(token_value: str, name: str, minute_limit: Optional[int] = None, hour_limit: Optional[int] = None) -> Dict:
     """新增 Token 记录"""
     now = datetime.now().isoformat()
-    conn = get_db_connection()
-    cursor = conn.execute(
-        """
-        INSERT INTO tokens (token, name, created_at, updated_at, minute_limit, hour_limit)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (token_value, name, now, now, minute_limit, hour_limit)
-    )
-    conn.commit()
+    with token_db.connection() as conn:
+        revision = bump_token_version(conn)
+        cursor = conn.execute(
+            """
+            INSERT INTO tokens (token, name, created_at, updated_at, minute_limit, hour_limit, revision)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (token_value, name, now, now, minute_limit, hour_limit, revision)
+        )
     new_id = str(cursor.lastrowid)
-    conn.close()
     refresh_token_cache()
     return get_token_by_id(new_id) or {
         'id': new_id,
@@ -393,21 +2707,21 @@ def update_token_record(
 ) -> Optional[Dict]:
     """更新 Token 记录"""
     now = datetime.now().isoformat()
-    conn = get_db_connection()
-    cursor = conn.execute(
-        """
-        UPDATE tokens
-        SET token = ?,
-            name = ?,
-            minute_limit = ?,
-            hour_limit = ?,
-            updated_at = ?
-        WHERE id = ?
-        """,
-        (token_value, name, minute_limit, hour_limit, now, token_id)
-    )
-    conn.commit()
-    conn.close()
+    with token_db.connection() as conn:
+        revision = bump_token_version(conn)
+        cursor = conn.execute(
+            """
+            UPDATE tokens
+            SET token = ?,
+                name = ?,
+                minute_limit = ?,
+                hour_limit = ?,
+                updated_at = ?,
+                revision = ?
+            WHERE id = ?
+            """,
+            (token_value, name, minute_limit, hour_limit, now, revision, token_id)
+        )
     if cursor.rowcount == 0:
         return None
     refresh_token_cache()
@@ -416,10 +2730,13 @@ def update_token_record(
 
 def delete_token_record(token_id: str) -> bool:
     """删除 Token 记录"""
-    conn = get_db_connection()
-    cursor = conn.execute("DELETE FROM tokens WHERE id = ?", (token_id,))
-    conn.commit()
-    conn.close()
+    with token_db.connection() as conn:
+        revision = bump_token_version(conn)
+        cursor = conn.execute("DELETE FROM tokens WHERE id = ?", (token_id,))
+        if cursor.rowcount > 0:
+            conn.execute("INSERT INTO token_tombstones (id, revision) VALUES (?, ?)", (token_id, revision))
+            conn.execute("DELETE FROM usage_minute WHERE token_id = ?", (token_id,))
+            conn.execute("DELETE FROM usage_hour WHERE token_id = ?", (token_id,))
     if cursor.rowcount > 0:
         refresh_token_cache()
         return True
@@ -435,43 +2752,58 @@ def reset_token_usage_count(token_id: str) -> bool:
     with usage_queue_lock:
         usage_increment_queue.pop(token_data.get('token'), None)
     
-    conn = get_db_connection()
-    cursor = conn.execute("UPDATE tokens SET usage_count = 0 WHERE id = ?", (token_id,))
-    conn.commit()
-    conn.close()
+    with token_db.connection() as conn:
+        revision = bump_token_version(conn)
+        cursor = conn.execute("UPDATE tokens SET usage_count = 0, revision = ? WHERE id = ?", (revision, token_id))
     if cursor.rowcount > 0:
         refresh_token_cache()
         return True
     return False
 
 
-async def verify_token(x_token: Optional[str] = Header(None, alias="X-Token")):
-    """验证 token 的依赖函数"""
+def lookup_token(x_token: Optional[str]) -> Dict:
+    """校验 Token 并返回其配置，不计入限流与调用次数"""
     if not x_token:
         raise HTTPException(status_code=403, detail="缺少 Token，请在请求头中添加 X-Token")
     
-    with token_cache_lock:
-        cached_tokens = list(token_cache)
-        cached_token_values = set(token_value_cache)
-        token_config = token_value_map.get(x_token)
-    
-    if not cached_tokens:
+    snapshot = token_snapshot
+    if not snapshot.tokens:
         raise HTTPException(status_code=403, detail="Token 未配置，请先访问管理界面配置 Token")
     
-    if x_token not in cached_token_values or not token_config:
+    token_config = snapshot.by_value.get(x_token)
+    if token_config is None:
         raise HTTPException(status_code=403, detail="Token 验证失败")
+    return token_config
+
+
+def charge_token(x_token: Optional[str], cost: int = 1) -> str:
+    """校验 Token，并按 cost 次计入限流与调用次数"""
+    token_config = lookup_token(x_token)
     
     enforce_rate_limit(
         x_token,
         token_config.get('minute_limit'),
-        token_config.get('hour_limit')
+        token_config.get('hour_limit'),
+        cost
     )
     
-    schedule_usage_increment(x_token)
+    schedule_usage_increment(x_token, cost)
     
     return x_token
 
 
+async def charge_token_async(x_token: Optional[str], cost: int = 1) -> str:
+    """charge_token 的异步版本：限流计数在 SQLite 中时放到线程池执行，不阻塞事件循环"""
+    if isinstance(rate_limiter, SqliteRateLimiter):
+        return await run_in_threadpool(charge_token, x_token, cost)
+    return charge_token(x_token, cost)
+
+
+async def verify_token(x_token: Optional[str] = Header(None, alias="X-Token")):
+    """验证 token 的依赖函数"""
+    return await charge_token_async(x_token)
+
+
 # 初始化数据库与缓存
 init_db()
 start_usage_flush_worker()
@@ -484,28 +2816,82 @@ class ModelImageIn(BaseModel):
     
     @validator('img_base64')
     def validate_base64(cls, v):
+        # base64 解码与图片解析统一在 decode_image 中完成，此处只做廉价检查
         if not v or len(v) == 0:
             raise ValueError("图片数据不能为空")
-        try:
-            base64.b64decode(v, validate=True)
-        except Exception:
-            raise ValueError("无效的 base64 编码")
         return v
 
 
+class ModelClassificationIn(ModelImageIn):
+    """分类识别（数字/算术/字母）输入模型"""
+    confidence: bool = Field(False, description="附带逐字符置信度：响应额外返回 confidence 列表（0-1），与识别文本逐字符对应")
+
+
+class ModelTextImageIn(ModelClassificationIn):
+    """通用识别输入模型，可限定识别字符集"""
+    charset_range: Optional[Union[StrictInt, str]] = Field(
+        None,
+        description="限定识别字符集：0-7 为预设（同 ddddocr set_ranges），字符串为自定义字符集，留空不限定"
+    )
+
+    @validator('charset_range')
+    def validate_charset_range(cls, v):
+        return validate_charset_range(v)
+
+
 class ModelSliderImageIn(BaseModel):
     """滑块图片输入模型"""
     gapimg_base64: str = Field(..., description="Base64编码的缺口图片数据")
     fullimg_base64: str = Field(..., description="Base64编码的完整图片数据")
+    fast: bool = Field(False, description="快速模式：金字塔粗匹配后局部精匹配，结果附带置信度 confidence")
     
     @validator('gapimg_base64', 'fullimg_base64')
     def validate_base64(cls, v):
+        # base64 解码与图片解析统一在 decode_image 中完成，此处只做廉价检查
         if not v or len(v) == 0:
             raise ValueError("图片数据不能为空")
-        try:
-            base64.b64decode(v, validate=True)
-        except Exception:
-            raise ValueError("无效的 base64 编码")
+        return v
+
+
+class BatchItemIn(BaseModel):
+    """批量识别条目"""
+    mode: str = Field(..., description="识别模式：image/number/compute/alphabet/detection/slider_gap/slider_shadow")
+    img_base64: Optional[str] = Field(None, description="Base64编码的图片数据（滑块以外的模式）")
+    gapimg_base64: Optional[str] = Field(None, description="Base64编码的缺口/阴影图片数据（滑块模式）")
+    fullimg_base64: Optional[str] = Field(None, description="Base64编码的完整图片数据（滑块模式）")
+    fast: bool = Field(False, description="滑块模式使用快速匹配，结果附带置信度 confidence")
+    confidence: bool = Field(False, description="分类模式（image/number/compute/alphabet）附带逐字符置信度")
+    charset_range: Optional[Union[StrictInt, str]] = Field(
+        None,
+        description="覆盖分类模式（image/number/compute/alphabet）的默认字符集，取值同通用识别接口"
+    )
+
+    @validator('charset_range')
+    def validate_charset_range(cls, v):
+        return validate_charset_range(v)
+
+    @validator('mode')
+    def validate_mode(cls, v):
+        if v not in OCR_MODES:
+            raise ValueError(f"不支持的识别模式，可选值: {', '.join(OCR_MODES)}")
+        return v
+
+
+class WebSocketItemIn(BatchItemIn):
+    """WebSocket 识别消息，字段同批量识别条目"""
+    id: Optional[Union[StrictInt, str]] = Field(None, description="消息编号，随结果原样返回，用于匹配乱序返回的结果")
+
+
+class ModelBatchIn(BaseModel):
+    """批量识别输入模型"""
+    items: List[BatchItemIn] = Field(..., description="识别条目列表，结果按相同顺序返回")
+
+    @validator('items')
+    def validate_items(cls, v):
+        if not v:
+            raise ValueError("识别条目不能为空")
+        if len(v) > BATCH_API_MAX_ITEMS:
+            raise ValueError(f"单次最多 {BATCH_API_MAX_ITEMS} 个识别条目")
         return v
 
 
@@ -555,86 +2941,599 @@ class TokenUpdateModel(BaseModel):
             return None
         return v_int
 
+# ==================== 二进制上传 ====================
+
+MULTIPART_OVERHEAD = 64 * 1024  # multipart 分隔符与表单头允许的额外字节数
+RAW_IMAGE_CONTENT_TYPES = ("application/octet-stream", "image/")
+
+
+def _upload_too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"图片大小超过限制，最大允许 {max_size / 1024 / 1024:.2f}MB"
+    )
+
+
+async def _limited_stream(request: Request, limit: int, max_size: int):
+    """逐块读取请求体，累计超过 limit 时立即中止，不缓冲剩余数据"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise _upload_too_large(max_size)
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise _upload_too_large(max_size)
+        yield chunk
+
+
+async def read_upload_images(request: Request, fields: List[str], max_size: int = MAX_IMAGE_SIZE) -> List[ImagePayload]:
+    """
+    读取二进制上传的图片
+    - multipart/form-data：按 fields 指定的字段名读取文件
+    - application/octet-stream 或 image/*：请求体即图片，仅适用于单图片接口
+    读取过程中即执行大小限制，超出时返回 413
+    """
+    content_type = request.headers.get("content-type", "")
+    images = []
+    if content_type.startswith("multipart/form-data"):
+        limit = max_size * len(fields) + MULTIPART_OVERHEAD
+        parser = MultiPartParser(
+            request.headers,
+            _limited_stream(request, limit, max_size),
+            max_files=len(fields),
+            max_fields=len(fields)
+        )
+        try:
+            form = await parser.parse()
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=f"表单解析失败: {e.message}")
+        try:
+            for field in fields:
+                upload = form.get(field)
+                if not isinstance(upload, UploadFile):
+                    raise HTTPException(status_code=400, detail=f"缺少文件字段: {field}")
+                data = await upload.read(max_size + 1)
+                if len(data) > max_size:
+                    raise _upload_too_large(max_size)
+                images.append(data)
+        finally:
+            await form.close()
+    elif not content_type or content_type.startswith(RAW_IMAGE_CONTENT_TYPES):
+        if len(fields) != 1:
+            raise HTTPException(
+                status_code=415,
+                detail=f"该接口需使用 multipart/form-data 上传 {', '.join(fields)} 字段"
+            )
+        body = bytearray()
+        async for chunk in _limited_stream(request, max_size, max_size):
+            body += chunk
+        images.append(bytes(body))
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="不支持的 Content-Type，请使用 application/octet-stream 或 multipart/form-data"
+        )
+
+    for data in images:
+        if not data:
+            raise HTTPException(status_code=400, detail="图片数据不能为空")
+    return [open_image(data) for data in images]
+
+
+def parse_charset_query(value: Optional[str]):
+    """
+    解析上传接口查询参数中的字符集：单个数字 0-7 为预设编号，其它字符串为自定义字符集，
+    校验规则同 JSON 字段 charset_range，不合法时返回 400
+    """
+    if value is None:
+        return None
+    if len(value) == 1 and value.isdigit() and int(value) <= CHARSET_PRESET_OTHERS:
+        return int(value)
+    try:
+        return validate_charset_range(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # ==================== OCR API 路由 ====================
 
+def classification_response(result, confidence: bool) -> Dict:
+    """分类识别接口的响应体：请求置信度时 run_ocr 已返回 {"result": 结果, "confidence": [...]}"""
+    return result if confidence else {"result": result}
+
+
 @app.post("/api/ocr/image", summary="通用", tags=["验证码识别"])
-async def ocr_image(data: ModelImageIn, token: str = Depends(verify_token)):
-    """通用验证码识别"""
-    img = validate_image_size(data.img_base64)
-    result = ocr.classification(img)
-    return {"result": result}
+async def ocr_image(data: ModelTextImageIn, token: str = Depends(verify_token)):
+    """通用验证码识别，可通过 charset_range 限定字符集"""
+    img = decode_image(data.img_base64)
+    result = await run_ocr("image", img, charset_range=data.charset_range, confidence=data.confidence)
+    return classification_response(result, data.confidence)
 
 
 @app.post("/api/ocr/number", summary="数字", tags=["验证码识别"])
-async def ocr_image_number(data: ModelImageIn, token: str = Depends(verify_token)):
+async def ocr_image_number(data: ModelClassificationIn, token: str = Depends(verify_token)):
     """数字验证码识别"""
-    img = validate_image_size(data.img_base64)
-    result = number_ocr.classification(img, probability=True)
-    string = extract_text_from_probability(result)
-    return {"result": string}
+    img = decode_image(data.img_base64)
+    result = await run_ocr("number", img, confidence=data.confidence)
+    return classification_response(result, data.confidence)
 
 
 @app.post("/api/ocr/compute", summary="算术", tags=["验证码识别"])
-async def ocr_image_compute(data: ModelImageIn, token: str = Depends(verify_token)):
+async def ocr_image_compute(data: ModelClassificationIn, token: str = Depends(verify_token)):
     """算术验证码识别"""
-    img = validate_image_size(data.img_base64)
-    result = compute_ocr.classification(img, probability=True)
-    string = extract_text_from_probability(result)
-    string = string.split("=")[0].replace("x", "*").replace("÷", "/")
-    
-    try:
-        result = safe_eval_arithmetic(string)
-        result = int(result) if result.is_integer() else result
-    except ValueError as e:
-        result = f"Error: {str(e)}"
-    except Exception:
-        result = "Error: 计算失败"
-    
-    return {"result": result}
+    img = decode_image(data.img_base64)
+    result = await run_ocr("compute", img, confidence=data.confidence)
+    return classification_response(result, data.confidence)
 
 
 @app.post("/api/ocr/alphabet", summary="字母", tags=["验证码识别"])
-async def ocr_image_alphabet(data: ModelImageIn, token: str = Depends(verify_token)):
+async def ocr_image_alphabet(data: ModelClassificationIn, token: str = Depends(verify_token)):
     """字母验证码识别"""
-    img = validate_image_size(data.img_base64)
-    result = alphabet_ocr.classification(img, probability=True)
-    string = extract_text_from_probability(result)
-    return {"result": string}
+    img = decode_image(data.img_base64)
+    result = await run_ocr("alphabet", img, confidence=data.confidence)
+    return classification_response(result, data.confidence)
 
 
 @app.post("/api/ocr/detection", summary="文字点选", tags=["验证码识别"])
 async def ocr_image_det(data: ModelImageIn, token: str = Depends(verify_token)):
     """文字点选验证码识别"""
-    img = validate_image_size(data.img_base64)
-    img_pil = Image.open(BytesIO(img))
-    res = det.detection(img)
-    result = {
-        ocr.classification(img_pil.crop(box)): [
-            box[0] + (box[2] - box[0]) // 2,
-            box[1] + (box[3] - box[1]) // 2
-        ]
-        for box in res
-    }
+    img = decode_image(data.img_base64)
+    result = await run_ocr("detection", img)
     return {"result": result}
 
 
 @app.post("/api/ocr/slider/gap", summary="缺口滑块识别", tags=["验证码识别"])
 async def ocr_image_slider_gap(data: ModelSliderImageIn, token: str = Depends(verify_token)):
     """缺口滑块验证码识别"""
-    gapimg = validate_image_size(data.gapimg_base64)
-    fullimg = validate_image_size(data.fullimg_base64)
-    result = det.slide_match(gapimg, fullimg)
+    gapimg = decode_image(data.gapimg_base64)
+    fullimg = decode_image(data.fullimg_base64)
+    result = await run_ocr(slider_task("slider_gap", data.fast), gapimg, fullimg)
     return {"result": result}
 
 
 @app.post("/api/ocr/slider/shadow", summary="阴影滑块识别", tags=["验证码识别"])
 async def ocr_image_slider_shadow(data: ModelSliderImageIn, token: str = Depends(verify_token)):
     """阴影滑块验证码识别"""
-    shadowimg = validate_image_size(data.gapimg_base64)
-    fullimg = validate_image_size(data.fullimg_base64)
-    result = shadow_slide.slide_comparison(shadowimg, fullimg)
+    shadowimg = decode_image(data.gapimg_base64)
+    fullimg = decode_image(data.fullimg_base64)
+    result = await run_ocr(slider_task("slider_shadow", data.fast), shadowimg, fullimg)
+    return {"result": result}
+
+async def recognize_item(item: BatchItemIn, slots: Optional[asyncio.Semaphore] = None) -> Dict:
+    """
+    解码并识别单个条目（批量识别与 WebSocket 消息共用），返回 {"result": ...}，错误以 HTTPException 抛出
+    slots 不为空时推理期间占用一个槽位
+    """
+    if item.mode in SLIDER_MODES:
+        if not item.gapimg_base64 or not item.fullimg_base64:
+            raise HTTPException(status_code=400, detail="滑块模式需要 gapimg_base64 和 fullimg_base64")
+        images = [decode_image(item.gapimg_base64), decode_image(item.fullimg_base64)]
+    else:
+        if not item.img_base64:
+            raise HTTPException(status_code=400, detail="图片数据不能为空")
+        images = [decode_image(item.img_base64)]
+    mode = slider_task(item.mode, item.fast) if item.mode in SLIDER_MODES else item.mode
+    confidence = item.confidence and item.mode in CLASSIFICATION_CHARSETS
+    if slots is None:
+        result = await run_ocr(mode, *images, charset_range=item.charset_range, confidence=confidence)
+    else:
+        async with slots:
+            result = await run_ocr(mode, *images, charset_range=item.charset_range, confidence=confidence)
+    return classification_response(result, confidence)
+
+
+def item_error(e: Exception) -> Dict:
+    """条目或消息失败时的结果"""
+    if isinstance(e, HTTPException):
+        return {"success": False, "status_code": e.status_code, "error": e.detail}
+    return {"success": False, "status_code": 500, "error": f"识别失败: {str(e)}"}
+
+
+async def run_batch_item(item: BatchItemIn, slots: asyncio.Semaphore) -> Dict:
+    """执行单个批量识别条目，错误以条目结果返回而不中断整批"""
+    try:
+        return {"success": True, **await recognize_item(item, slots)}
+    except Exception as e:
+        return item_error(e)
+
+
+@app.post("/api/ocr/batch", summary="批量识别", tags=["验证码识别"])
+async def ocr_batch(data: ModelBatchIn, x_token: Optional[str] = Header(None, alias="X-Token")):
+    """
+    批量识别，多个条目可混合不同模式
+    - 限流与调用次数按条目数一次性扣除
+    - 条目并行提交推理，单批同时占用的推理槽位不超过执行器并发数，避免挤满公共队列
+    """
+    await charge_token_async(x_token, len(data.items))
+    slots = asyncio.Semaphore(inference_executor.max_workers)
+    results = await asyncio.gather(*(run_batch_item(item, slots) for item in data.items))
+    return {"results": results}
+
+# ==================== WebSocket 识别通道 ====================
+# 高频客户端保持一条连接：建立连接时校验一次 Token，之后每条消息为一个带 id 的识别条目（字段同批量识别），
+# 消息可连续发送无需等待，结果完成即返回，顺序可能与发送顺序不同；限流与调用次数仍按消息逐条计算
+
+async def run_websocket_message(token: str, raw: Union[str, bytes]) -> Dict:
+    """处理一条 WebSocket 识别消息，返回带 id 的结果，错误同样以结果返回而不断开连接"""
+    start = time.perf_counter()
+    message_id, mode = None, "unknown"
+    try:
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="消息不是合法的 JSON")
+        if not isinstance(payload, dict):
+            raise HTTPException(status_code=400, detail="消息应为 JSON 对象")
+        message_id = payload.get("id")
+        try:
+            item = WebSocketItemIn(**payload)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors()))
+        mode = item.mode
+        await charge_token_async(token)
+        response = {"id": message_id, "success": True, **await recognize_item(item)}
+    except Exception as e:
+        response = {"id": message_id, **item_error(e)}
+    metrics.inc(
+        "stupidocr_websocket_messages_total",
+        (("mode", mode), ("status", str(response.get("status_code", 200))))
+    )
+    elapsed = time.perf_counter() - start
+    metrics.observe("stupidocr_websocket_message_duration_seconds", (("mode", mode),), elapsed)
+    if usage_series is not None:
+        record_token_usage(token, f"/api/ocr/ws:{mode}", elapsed, not response["success"])
+    return response
+
+
+async def authenticate_websocket(websocket: WebSocket) -> Optional[str]:
+    """
+    读取第一条消息 {"token": "..."} 完成认证，成功时回复 {"authenticated": true} 并返回 Token；
+    超时、格式错误或 Token 无效时以关闭码 1008 断开并返回 None
+    """
+    try:
+        message = await asyncio.wait_for(websocket.receive(), OCR_WS_AUTH_TIMEOUT)
+    except asyncio.TimeoutError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="认证超时")
+        return None
+    if message["type"] == "websocket.disconnect":
+        return None
+    try:
+        payload = json.loads(message.get("text") or message.get("bytes") or "")
+    except ValueError:
+        payload = None
+    x_token = payload.get("token") if isinstance(payload, dict) else None
+    if not isinstance(x_token, str) or not x_token:
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION, reason='缺少 Token，请在请求头 X-Token 或第一条消息 {"token": ...} 中提供'
+        )
+        return None
+    try:
+        lookup_token(x_token)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+        return None
+    await websocket.send_json({"authenticated": True})
+    return x_token
+
+
+@app.websocket("/api/ocr/ws")
+async def ocr_websocket(websocket: WebSocket, x_token: Optional[str] = Header(None, alias="X-Token")):
+    """
+    WebSocket 识别通道，Token 通过请求头 X-Token 传入；浏览器无法自定义 WebSocket 请求头，
+    可在连接后发送的第一条消息 {"token": "..."} 中认证（不放在 URL 中，避免写入访问日志）
+    单个连接同时处理的消息数不超过 OCR_WS_MAX_IN_FLIGHT，连接断开时取消尚未完成的消息
+    """
+    if x_token is not None:
+        try:
+            lookup_token(x_token)
+        except HTTPException as e:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+            return
+        await websocket.accept()
+    else:
+        await websocket.accept()
+        x_token = await authenticate_websocket(websocket)
+        if x_token is None:
+            return
+
+    in_flight = asyncio.Semaphore(OCR_WS_MAX_IN_FLIGHT)
+    send_lock = asyncio.Lock()
+    tasks = set()
+
+    async def handle(raw):
+        try:
+            response = await run_websocket_message(x_token, raw)
+            async with send_lock:
+                await websocket.send_json(response)
+        except Exception:
+            pass  # 客户端已断开，丢弃结果
+        finally:
+            in_flight.release()
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            await in_flight.acquire()
+            task = asyncio.ensure_future(handle(message.get("text") or message.get("bytes") or ""))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# 二进制上传接口：请求体为图片二进制，或 multipart/form-data 文件（单图字段 img，滑块字段 gapimg、fullimg）
+
+@app.post("/api/ocr/upload/image", summary="通用（二进制上传）", tags=["验证码识别"])
+async def ocr_upload_image(
+    request: Request, confidence: bool = False, charset_range: Optional[str] = None,
+    token: str = Depends(verify_token)
+):
+    """通用验证码识别，可通过查询参数 charset_range 限定字符集"""
+    charset_range = parse_charset_query(charset_range)
+    img, = await read_upload_images(request, ["img"])
+    result = await run_ocr("image", img, charset_range=charset_range, confidence=confidence)
+    return classification_response(result, confidence)
+
+
+@app.post("/api/ocr/upload/number", summary="数字（二进制上传）", tags=["验证码识别"])
+async def ocr_upload_number(request: Request, confidence: bool = False, token: str = Depends(verify_token)):
+    """数字验证码识别"""
+    img, = await read_upload_images(request, ["img"])
+    result = await run_ocr("number", img, confidence=confidence)
+    return classification_response(result, confidence)
+
+
+@app.post("/api/ocr/upload/compute", summary="算术（二进制上传）", tags=["验证码识别"])
+async def ocr_upload_compute(request: Request, confidence: bool = False, token: str = Depends(verify_token)):
+    """算术验证码识别"""
+    img, = await read_upload_images(request, ["img"])
+    result = await run_ocr("compute", img, confidence=confidence)
+    return classification_response(result, confidence)
+
+
+@app.post("/api/ocr/upload/alphabet", summary="字母（二进制上传）", tags=["验证码识别"])
+async def ocr_upload_alphabet(request: Request, confidence: bool = False, token: str = Depends(verify_token)):
+    """字母验证码识别"""
+    img, = await read_upload_images(request, ["img"])
+    result = await run_ocr("alphabet", img, confidence=confidence)
+    return classification_response(result, confidence)
+
+
+@app.post("/api/ocr/upload/detection", summary="文字点选（二进制上传）", tags=["验证码识别"])
+async def ocr_upload_det(request: Request, token: str = Depends(verify_token)):
+    """文字点选验证码识别"""
+    img, = await read_upload_images(request, ["img"])
+    result = await run_ocr("detection", img)
+    return {"result": result}
+
+
+@app.post("/api/ocr/upload/slider/gap", summary="缺口滑块识别（二进制上传）", tags=["验证码识别"])
+async def ocr_upload_slider_gap(request: Request, fast: bool = False, token: str = Depends(verify_token)):
+    """缺口滑块验证码识别"""
+    gapimg, fullimg = await read_upload_images(request, ["gapimg", "fullimg"])
+    result = await run_ocr(slider_task("slider_gap", fast), gapimg, fullimg)
+    return {"result": result}
+
+
+@app.post("/api/ocr/upload/slider/shadow", summary="阴影滑块识别（二进制上传）", tags=["验证码识别"])
+async def ocr_upload_slider_shadow(request: Request, fast: bool = False, token: str = Depends(verify_token)):
+    """阴影滑块验证码识别"""
+    shadowimg, fullimg = await read_upload_images(request, ["gapimg", "fullimg"])
+    result = await run_ocr(slider_task("slider_shadow", fast), shadowimg, fullimg)
     return {"result": result}
 
+# ==================== 运行状态路由 ====================
+
+@app.get("/api/stats", summary="运行状态", tags=["运行状态"])
+async def get_runtime_stats():
+    """获取推理队列、批处理、结果缓存、模型加载、ONNX Runtime 线程布局等运行状态"""
+    return {
+        "inference": inference_executor.stats(),
+        "batching": {
+            "enabled": OCR_BATCHING,
+            "onnx": ONNX_AVAILABLE,
+            "max_size": OCR_BATCH_MAX_SIZE,
+            "max_wait_ms": OCR_BATCH_MAX_WAIT_MS,
+            "classification": classification_batcher.stats() if classification_batcher is not None else {},
+            "detection_crops": ONNX_AVAILABLE  # 文字点选的检测框裁剪是否合并为一次批量推理
+        },
+        "cache": result_cache.stats() if result_cache is not None else {"enabled": False},
+        "single_flight": single_flight.stats() if single_flight is not None else {"enabled": False},
+        "usage_series": usage_series.stats() if usage_series is not None else {"enabled": False},
+        "models": model_registry.status(),
+        "onnxruntime": cpu_layout.status(),
+        "quantization": {
+            "int8_modes": sorted(OCR_INT8_MODES),
+            "dir": OCR_INT8_DIR,
+            "fallbacks": sorted(quantization_fallbacks)
+        },
+        "process": process_memory()
+    }
+
+
+def collect_process_metrics() -> Tuple[Dict, Dict]:
+    """当前进程的指标，返回 (计数器与直方图, 仪表盘)，键为 (名称, 标签)"""
+    values = metrics.collect()
+    stats = inference_executor.stats()
+    values[("stupidocr_inference_rejections_total", ())] = stats["rejected"]
+    values[("stupidocr_inference_completed_total", ())] = stats["completed"]
+    if result_cache is not None:
+        for mode, counters in list(result_cache.mode_stats.items()):
+            values[("stupidocr_cache_requests_total", (("mode", mode), ("result", "hit")))] = counters["hits"]
+            values[("stupidocr_cache_requests_total", (("mode", mode), ("result", "miss")))] = counters["misses"]
+    gauges = {
+        ("stupidocr_inference_queue_depth", ()): stats["queue_depth"],
+        ("stupidocr_inference_in_flight", ()): stats["in_flight"],
+    }
+    for name, seconds in list(model_registry.load_times.items()):
+        gauges[("stupidocr_model_load_seconds", (("model", name),))] = seconds
+    return values, gauges
+
+
+def export_process_metrics():
+    """将当前进程的指标快照原子写入 METRICS_DIR/<pid>.json，供其它工作进程抓取时合并"""
+    values, gauges = collect_process_metrics()
+    data = {
+        "values": [[name, labels, value] for (name, labels), value in values.items()],
+        "gauges": [[name, labels, value] for (name, labels), value in gauges.items()],
+    }
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def metrics_export_worker():
+    """多进程部署时周期性导出指标快照"""
+    while True:
+        time.sleep(METRICS_EXPORT_INTERVAL)
+        try:
+            export_process_metrics()
+        except OSError:
+            pass
+
+
+def clear_metrics_dir():
+    """启动前清理上次运行遗留的指标快照"""
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def gather_metrics() -> Tuple[Dict, Dict]:
+    """
+    汇总所有工作进程的指标：本进程取实时值，其它进程取最近一次导出的快照
+    已退出进程的计数器与直方图保留（保证单调递增），仪表盘只保留存活进程，并按 pid 区分
+    """
+    values, own_gauges = collect_process_metrics()
+    if UVICORN_WORKERS <= 1:
+        return values, own_gauges
+
+    own_pid = os.getpid()
+    gauges = {(name, labels + (("pid", str(own_pid)),)): v for (name, labels), v in own_gauges.items()}
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        try:
+            pid = int(os.path.basename(path)[:-5])
+            if pid == own_pid:
+                continue
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        merge_metric_values(
+            values, (((name, tuple(map(tuple, labels))), v) for name, labels, v in data["values"])
+        )
+        if _pid_alive(pid):
+            for name, labels, v in data["gauges"]:
+                gauges[(name, tuple(map(tuple, labels)) + (("pid", str(pid)),))] = v
+    return values, gauges
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def render_metrics(values: Dict, gauges: Dict) -> str:
+    """按 Prometheus 文本格式输出"""
+    by_name: Dict[str, List] = {}
+    for (name, labels), value in list(values.items()) + list(gauges.items()):
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name]):
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(METRIC_BUCKETS + ("+Inf",), value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+@app.get("/metrics", summary="监控指标", tags=["运行状态"])
+async def get_metrics():
+    """Prometheus 格式的监控指标，多进程部署时汇总全部工作进程"""
+    values, gauges = await run_in_threadpool(gather_metrics)
+    return PlainTextResponse(render_metrics(values, gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready", summary="就绪检查", tags=["运行状态"])
+async def readiness():
+    """
+    预加载模型全部完成加载与预热（进程池执行器还需全部推理进程预热完成）后返回 200，否则返回 503，
+    供负载均衡判断是否转发流量
+    """
+    ready = inference_executor.ready and all(
+        name in model_registry.warm for name in OCR_PRELOAD_MODELS if name in MODEL_FACTORIES
+    )
+    return JSONResponse(
+        {"ready": ready, "models": model_registry.status(), "inference_ready": inference_executor.ready},
+        status_code=200 if ready else 503
+    )
+
+
+@app.on_event("startup")
+async def preload_models():
+    """
+    在后台线程中加载并预热模型，不阻塞服务启动；已预热的模型（如 preload 模式下主进程加载的）直接跳过
+    INFERENCE_EXECUTOR=process 时随后启动推理进程并等待各进程预热完成
+    """
+    def preload():
+        model_registry.preload(OCR_PRELOAD_MODELS, OCR_WARMUP)
+        inference_executor.warm_up()
+
+    threading.Thread(
+        target=preload,
+        name="ocr-model-preload",
+        daemon=True
+    ).start()
+
+
+@app.on_event("startup")
+async def start_metrics_export():
+    """多进程部署时启动指标快照导出线程"""
+    if UVICORN_WORKERS > 1:
+        threading.Thread(target=metrics_export_worker, name="metrics-export", daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def shutdown_inference_executor():
+    """关闭推理执行器"""
+    inference_executor.shutdown()
+    if UVICORN_WORKERS > 1:
+        try:
+            export_process_metrics()
+        except OSError:
+            pass
+
 # ==================== 管理界面路由 ====================
 
 @app.get("/admin/login", response_class=HTMLResponse)
@@ -774,73 +3673,91 @@ async def admin_login_page():
     return HTMLResponse(content=html_content)
 
 
-@app.get("/admin", response_class=HTMLResponse)
-async def admin_page(request: Request):
-    """Token 管理界面"""
-    session_id = request.cookies.get("admin_session")
-    if not verify_session(session_id):
-        return RedirectResponse(url="/admin/login", status_code=status.HTTP_302_FOUND)
-    
-    tokens = load_tokens()
-    token_count = len(tokens)
-    status_class = "configured" if token_count > 0 else "not-configured"
-    status_text = f"已配置 {token_count} 个 Token" if token_count > 0 else "未配置"
-    
-    # 生成 token 列表 HTML
-    token_list_html = ""
+# 管理界面 Token 列表每页条数与上限
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 500
+ADMIN_TEMPLATE_FIELDS = ("status_class", "status_text", "token_count", "token_list_html", "page_size")
+
+
+@lru_cache(maxsize=1)
+def load_admin_template() -> Optional[List[str]]:
+    """
+    读取并解析管理界面模板，只在首次访问时读取文件（修改模板后需重启服务）
+    返回按占位符切分的片段，奇数下标为占位符名；模板不存在时返回 None
+    """
+    template_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "admin_template.html")
+    try:
+        with open(template_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    return re.split(r"\{(" + "|".join(ADMIN_TEMPLATE_FIELDS) + r")\}", content)
+
+
+def render_token_rows(tokens: List[Dict]) -> str:
+    """生成 Token 列表的表格行"""
+    if not tokens:
+        return '<tr><td colspan="7" style="text-align: center; color: #999;">暂无 Token</td></tr>'
+
     def format_limit(value: Optional[int]) -> str:
         return "不限" if value is None else f"{value} 次"
-    
-    if tokens:
-        for token in tokens:
-            token_id = token.get('id', '')
-            token_name = token.get('name', '未命名 Token')
-            token_value = token.get('token', '')
-            token_display = token_value[:20] + '...' if len(token_value) > 20 else token_value
-            created_at = token.get('created_at', '')
-            minute_limit = format_limit(token.get('minute_limit'))
-            hour_limit = format_limit(token.get('hour_limit'))
-            usage_count = token.get('usage_count', 0)
-            token_list_html += f"""
+
+    rows = []
+    for token in tokens:
+        token_id = html.escape(token.get('id', ''))
+        token_value = token.get('token', '')
+        token_display = token_value[:20] + '...' if len(token_value) > 20 else token_value
+        created_at = token.get('created_at', '')
+        rows.append(f"""
             <tr>
-                <td>{token_name}</td>
+                <td>{html.escape(token.get('name', '未命名 Token'))}</td>
                 <td>
                     <div style="display:flex;align-items:center;gap:8px;">
-                        <code style="font-size: 11px;">{token_display}</code>
+                        <code style="font-size: 11px;">{html.escape(token_display)}</code>
                         <button class="btn-copy" onclick="copyToken('{token_id}')">复制</button>
                     </div>
                 </td>
-                <td>{minute_limit}</td>
-                <td>{hour_limit}</td>
-                <td>{usage_count}</td>
+                <td>{format_limit(token.get('minute_limit'))}</td>
+                <td>{format_limit(token.get('hour_limit'))}</td>
+                <td>{token.get('usage_count', 0)}</td>
                 <td>{created_at[:10] if created_at else '-'}</td>
                 <td>
                     <button class="btn-edit" onclick="editToken('{token_id}')">编辑</button>
                     <button class="btn-delete" onclick="deleteToken('{token_id}')">删除</button>
                     <button class="btn-reset" onclick="resetUsage('{token_id}')">清零次数</button>
+                    <button class="btn-usage" onclick="showUsage('{token_id}')">用量</button>
                 </td>
             </tr>
-            """
-    else:
-        token_list_html = '<tr><td colspan="7" style="text-align: center; color: #999;">暂无 Token</td></tr>'
+            """)
+    return "".join(rows)
+
+
+@app.get("/admin", response_class=HTMLResponse)
+async def admin_page(request: Request):
+    """Token 管理界面，服务端只渲染第一页，翻页与搜索通过 /api/admin/tokens 完成"""
+    session_id = request.cookies.get("admin_session")
+    if not verify_session(session_id):
+        return RedirectResponse(url="/admin/login", status_code=status.HTTP_302_FOUND)
     
-    # 读取模板文件
-    template_path = os.path.join(os.path.dirname(__file__), "admin_template.html")
-    try:
-        with open(template_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        html_content = html_content.replace('{status_class}', status_class)
-        html_content = html_content.replace('{status_text}', status_text)
-        html_content = html_content.replace('{token_count}', str(token_count))
-        html_content = html_content.replace('{token_list_html}', token_list_html)
-    except FileNotFoundError:
-        html_content = f"""
+    template = load_admin_template()
+    if template is None:
+        return HTMLResponse(content="""
         <!DOCTYPE html>
         <html><head><title>Token 管理</title></head>
         <body><h1>Token 管理</h1><p>模板文件未找到，请确保 admin_template.html 存在</p></body></html>
-        """
+        """)
     
-    return HTMLResponse(content=html_content)
+    token_count, tokens = await run_in_threadpool(query_tokens, page_size=ADMIN_PAGE_SIZE)
+    values = {
+        "status_class": "configured" if token_count > 0 else "not-configured",
+        "status_text": f"已配置 {token_count} 个 Token" if token_count > 0 else "未配置",
+        "token_count": str(token_count),
+        "token_list_html": render_token_rows(tokens),
+        "page_size": str(ADMIN_PAGE_SIZE),
+    }
+    return HTMLResponse(content="".join(
+        values[part] if i % 2 else part for i, part in enumerate(template)
+    ))
 
 # ==================== 管理 API 路由 ====================
 
@@ -870,13 +3787,15 @@ async def create_token(config: TokenConfigModel, request: Request):
     else:
         token_value = generate_token()
     
-    token_name = config.name or f'Token {len(load_tokens()) + 1}'
+    token_name = config.name or f'Token {len(token_snapshot.tokens) + 1}'
     minute_limit = config.minute_limit
     hour_limit = config.hour_limit
     
     try:
-        new_token = add_token_record(token_value, token_name, minute_limit, hour_limit)
+        new_token = await run_in_threadpool(add_token_record, token_value, token_name, minute_limit, hour_limit)
         return {"success": True, "token": new_token, "message": "Token 已创建"}
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=400, detail="Token 已存在")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"保存 Token 失败: {str(e)}")
 
@@ -905,13 +3824,17 @@ async def update_token(config: TokenUpdateModel, request: Request):
     new_minute_limit = payload.get('minute_limit') if 'minute_limit' in payload else existing_token.get('minute_limit')
     new_hour_limit = payload.get('hour_limit') if 'hour_limit' in payload else existing_token.get('hour_limit')
     
-    updated_token = update_token_record(
-        config.token_id,
-        new_token_value,
-        new_name,
-        new_minute_limit,
-        new_hour_limit
-    )
+    try:
+        updated_token = await run_in_threadpool(
+            update_token_record,
+            config.token_id,
+            new_token_value,
+            new_name,
+            new_minute_limit,
+            new_hour_limit
+        )
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=400, detail="Token 已存在")
     
     if not updated_token:
         raise HTTPException(status_code=500, detail="更新 Token 失败")
@@ -929,7 +3852,7 @@ async def delete_token(token_id: str, request: Request):
     if not get_token_by_id(token_id):
         raise HTTPException(status_code=404, detail="Token 不存在")
     
-    if delete_token_record(token_id):
+    if await run_in_threadpool(delete_token_record, token_id):
         return {"success": True, "message": "Token 已删除"}
     else:
         raise HTTPException(status_code=500, detail="删除 Token 失败")
@@ -945,28 +3868,40 @@ async def reset_token_usage(token_id: str, request: Request):
     if not get_token_by_id(token_id):
         raise HTTPException(status_code=404, detail="Token 不存在")
     
-    if reset_token_usage_count(token_id):
+    if await run_in_threadpool(reset_token_usage_count, token_id):
         return {"success": True, "message": "使用次数已清零"}
     raise HTTPException(status_code=500, detail="清零失败")
 
 
 @app.get("/api/admin/tokens")
-async def get_tokens(request: Request):
-    """获取所有 Token（不返回完整 token 值）"""
+async def get_tokens(
+    request: Request,
+    page: int = 1,
+    page_size: int = ADMIN_PAGE_SIZE,
+    q: str = "",
+    sort: str = "id",
+    order: str = "desc"
+):
+    """
+    分页获取 Token（不返回完整 token 值）
+    - q：按名称前缀（不区分大小写）或 Token 值前缀搜索
+    - sort：排序列 id/name/created_at/usage_count，order：asc/desc
+    """
     session_id = request.cookies.get("admin_session")
     if not verify_session(session_id):
         raise HTTPException(status_code=401, detail="未授权")
+    if sort not in TOKEN_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"不支持的排序列，可选值: {', '.join(TOKEN_SORT_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order 只能为 asc 或 desc")
+    page = max(1, page)
+    page_size = min(max(1, page_size), ADMIN_MAX_PAGE_SIZE)
     
-    tokens = load_tokens()
-    safe_tokens = []
+    total, tokens = await run_in_threadpool(query_tokens, q, sort, order == "desc", page, page_size)
     for token in tokens:
-        safe_token = token.copy()
-        safe_token['usage_count'] = safe_token.get('usage_count', 0)
-        if 'token' in safe_token:
-            safe_token['token'] = safe_token['token'][:20] + '...'
-        safe_tokens.append(safe_token)
+        token['token'] = token['token'][:20] + '...'
     
-    return {"success": True, "tokens": safe_tokens}
+    return {"success": True, "tokens": tokens, "total": total, "page": page, "page_size": page_size}
 
 
 @app.get("/api/admin/token/{token_id}")
@@ -983,30 +3918,126 @@ async def get_token(token_id: str, request: Request):
     return {"success": True, "token": token}
 
 
+@app.get("/api/admin/token/{token_id}/usage")
+async def get_token_usage(token_id: str, request: Request, resolution: str = "minute", span: int = 60):
+    """
+    获取 Token 的用量时间序列（每分钟/每小时请求数、错误数、平均耗时）与按接口的汇总
+    - resolution：minute / hour
+    - span：最近的时间桶数，不超过汇总数据的保留时长
+    """
+    session_id = request.cookies.get("admin_session")
+    if not verify_session(session_id):
+        raise HTTPException(status_code=401, detail="未授权")
+    if resolution not in USAGE_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution 只能为 {' 或 '.join(USAGE_RESOLUTIONS)}")
+    if not get_token_by_id(token_id):
+        raise HTTPException(status_code=404, detail="Token 不存在")
+    span = min(max(1, span), USAGE_RESOLUTIONS[resolution][3])
+    
+    usage = await run_in_threadpool(query_token_usage, token_id, resolution, span)
+    return {"success": True, **usage}
+
+
 @app.get("/api/admin/token/status")
 async def get_token_status():
     """获取 Token 状态（不返回实际 token）"""
-    tokens = load_tokens()
+    token_count = len(token_snapshot.tokens)
     return {
-        "configured": len(tokens) > 0,
-        "token_count": len(tokens)
+        "configured": token_count > 0,
+        "token_count": token_count
     }
 
 # ==================== 启动 ====================
 
+def prepare_forked_worker(index: int):
+    """fork 出的工作进程初始化：恢复信号处理，按编号绑定 CPU，重建不能跨进程共享的线程与连接"""
+    global result_cache, rate_limiter, token_db, metrics
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    cpu_layout.assign(index)
+    metrics = MetricsRegistry()  # 不继承主进程预热期间记录的指标
+    token_db = SqlitePool(TOKEN_DB_PATH)
+    start_usage_flush_worker()
+    if isinstance(result_cache, SqliteResultCache):
+        result_cache = create_result_cache()
+    if isinstance(rate_limiter, SqliteRateLimiter):
+        rate_limiter = create_rate_limiter()
+
+
+def serve_preforked(host: str, port: int, workers: int):
+    """
+    预加载模式：模型已在当前进程加载完毕，绑定端口后 fork 出工作进程，
+    各工作进程通过写时复制共享模型内存；工作进程异常退出时自动重启
+    会话在 fork 前创建，线程数对所有工作进程相同，CPU 绑定在 fork 后按工作进程编号设置
+    """
+    cpu_layout.assign(0, pin=False)
+    model_registry.preload(OCR_PRELOAD_MODELS, OCR_WARMUP)
+    print(f"[preload] 主进程 {os.getpid()} 模型加载完成，内存: {process_memory()}")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    config = uvicorn.Config(app, host=host, port=port, access_log=True)
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            prepare_forked_worker(index)
+            print(f"[preload] 工作进程 {index} 已启动，内存: {process_memory()}")
+            try:
+                uvicorn.Server(config).run(sockets=[sock])
+            finally:
+                os._exit(0)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            print(f"[preload] 工作进程 {index} (pid {pid}) 已退出，正在重启")
+            spawn(index)
+    sock.close()
+
+
 if __name__ == '__main__':
     print(f'''
     StupidOCR v{APP_VERSION}
-    软件主页：http://127.0.0.1:6688
-    管理界面：http://127.0.0.1:6688/admin
+    软件主页：http://127.0.0.1:{SERVER_PORT}
+    管理界面：http://127.0.0.1:{SERVER_PORT}/admin
     ''')
     
-    workers = int(os.environ.get("UVICORN_WORKERS", 1))
-    uvicorn.run(
-        "StupidOCR:app",
-        host="0.0.0.0",
-        port=6688,
-        access_log=True,
-        workers=workers,
-        reload=False
-    )
+    if UVICORN_WORKERS > 1:
+        clear_metrics_dir()
+    if SERVING_MODE == "preload":
+        serve_preforked("0.0.0.0", SERVER_PORT, UVICORN_WORKERS)
+    else:
+        uvicorn.run(
+            "StupidOCR:app",
+            host="0.0.0.0",
+            port=SERVER_PORT,
+            access_log=True,
+            workers=UVICORN_WORKERS,
+            reload=False
+        )
@@ -0,0 +1,144 @@
+"""
+管理界面 Token 列表基准
+Token 数量从 1000 到 5 万时，对比管理页面与 /api/admin/tokens 的耗时与响应大小：
+- legacy：旧实现（每次读取模板文件，对全部 Token 逐个字符串拼接表格；接口复制并返回全部 Token），
+  耗时包含编码为响应字节
+- paged：当前实现（模板只解析一次，SQL 分页查询第一页；接口分页、按名称前缀搜索、按使用次数排序）
+另输出搜索与排序查询的 SQLite 查询计划，确认使用了索引
+
+用法：python benchmarks/bench_admin_tokens.py [--counts 1000,10000,50000] [--rounds 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ["TOKEN_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_tokens.db")
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import StupidOCR  # noqa: E402
+
+
+def legacy_admin_html() -> bytes:
+    tokens = StupidOCR.load_tokens()
+    token_list_html = ""
+    for token in tokens:
+        token_value = token.get('token', '')
+        token_display = token_value[:20] + '...' if len(token_value) > 20 else token_value
+        created_at = token.get('created_at', '')
+        token_list_html += f"""
+            <tr>
+                <td>{token.get('name', '未命名 Token')}</td>
+                <td><code style="font-size: 11px;">{token_display}</code></td>
+                <td>{token.get('minute_limit')}</td>
+                <td>{token.get('hour_limit')}</td>
+                <td>{token.get('usage_count', 0)}</td>
+                <td>{created_at[:10] if created_at else '-'}</td>
+            </tr>
+            """
+    template_path = os.path.join(os.path.dirname(BENCH_DIR), "admin_template.html")
+    with open(template_path, 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    html_content = html_content.replace('{status_class}', "configured")
+    html_content = html_content.replace('{status_text}', f"已配置 {len(tokens)} 个 Token")
+    html_content = html_content.replace('{token_count}', str(len(tokens)))
+    return html_content.replace('{token_list_html}', token_list_html).encode("utf-8")
+
+
+def legacy_token_list() -> bytes:
+    safe_tokens = []
+    for token in StupidOCR.load_tokens():
+        safe_token = token.copy()
+        safe_token['token'] = safe_token['token'][:20] + '...'
+        safe_tokens.append(safe_token)
+    return json.dumps({"success": True, "tokens": safe_tokens}, ensure_ascii=False).encode("utf-8")
+
+
+def fill_tokens(count: int):
+    """补足 count 个 Token，名称形如 client-00042"""
+    now = datetime.now().isoformat()
+    with StupidOCR.token_db.connection() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+        revision = StupidOCR.bump_token_version(conn)
+        conn.executemany(
+            "INSERT INTO tokens (token, name, created_at, updated_at, usage_count, revision) VALUES (?, ?, ?, ?, ?, ?)",
+            ((StupidOCR.generate_token(), f"client-{i:05d}", now, now, i * 7 % 1000, revision)
+             for i in range(existing, count))
+        )
+    StupidOCR.refresh_token_cache()
+
+
+def timed(func, rounds: int):
+    values, size = [], 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        size = len(func())
+        values.append(time.perf_counter() - start)
+    return float(np.median(values)) * 1000, size
+
+
+async def measure(client, path: str, rounds: int):
+    values, size = [], 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = await client.get(path)
+        values.append(time.perf_counter() - start)
+        response.raise_for_status()
+        size = len(response.content)
+    return float(np.median(values)) * 1000, size
+
+
+async def bench(args):
+    transport = httpx.ASGITransport(app=StupidOCR.app)
+    session = StupidOCR.create_session()
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", cookies={"admin_session": session}
+    ) as client:
+        print(f"{'tokens':>7}  {'case':<28}{'legacy ms':>11}{'paged ms':>10}{'legacy KB':>11}{'paged KB':>10}")
+        for count in args.counts:
+            fill_tokens(count)
+            cases = (
+                ("admin page", legacy_admin_html, "/admin"),
+                ("token list", legacy_token_list, "/api/admin/tokens"),
+                ("search name prefix", None, "/api/admin/tokens?q=client-0001"),
+                ("sort by usage, page 100", None, "/api/admin/tokens?sort=usage_count&page=100"),
+            )
+            for name, legacy, path in cases:
+                legacy_ms, legacy_size = timed(legacy, args.rounds) if legacy else (float("nan"), 0)
+                paged_ms, paged_size = await measure(client, path, args.rounds)
+                print(f"{count:>7}  {name:<28}{legacy_ms:>11.2f}{paged_ms:>10.2f}"
+                      f"{legacy_size / 1024:>11.1f}{paged_size / 1024:>10.1f}", flush=True)
+
+    with StupidOCR.token_db.connection() as conn:
+        for name, where, order in (
+            ("search", "WHERE (name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE) OR (token >= ? AND token < ?)",
+             "id DESC"),
+            ("sort", "", "usage_count DESC, id DESC"),
+        ):
+            params = ["client-0001", "client-0001\U0010ffff"] * 2 if where else []
+            plan = conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM tokens {where} ORDER BY {order} LIMIT 50", params
+            ).fetchall()
+            print(f"\n{name} 查询计划：" + "；".join(row[-1] for row in plan))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", default="1000,10000,50000", help="Token 数量列表，逗号分隔")
+    parser.add_argument("--rounds", type=int, default=20, help="每项重复次数，默认 20")
+    args = parser.parse_args()
+    args.counts = [int(x) for x in args.counts.split(",") if x]
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+分类识别解码基准
+在同一批模型输出上比较三种解码方式的耗时，并在合成语料上比较端到端耗时与准确率：
+- legacy：旧实现（ddddocr classification(probability=True) 把整张概率矩阵转为 Python 列表，
+  再逐帧 max/index 取字符，不做 CTC 合并；通用模式为 ddddocr 默认的逐帧 Python 循环）
+- vectorized：当前实现（NumPy 数组上按字符子集取列、argmax 后 CTC 合并）
+- confidence：当前实现并计算逐字符置信度（子集内 softmax）
+解码耗时只计模型输出之后的部分；端到端耗时包含预处理与推理
+
+用法：python benchmarks/bench_decode.py [--samples 50] [--rounds 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import ddddocr
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault("TOKEN_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_tokens.db"))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import StupidOCR  # noqa: E402
+from bench_endpoints import score  # noqa: E402
+from captcha_corpus import GENERATORS  # noqa: E402
+
+MODES = ("image", "number", "compute", "alphabet")
+
+
+def legacy_model(mode: str):
+    """旧实现中每个模式各自持有的 ddddocr 实例"""
+    ocr = ddddocr.DdddOcr(show_ad=False, beta=True)
+    if StupidOCR.CLASSIFICATION_CHARSETS[mode] is not None:
+        ocr.set_ranges(StupidOCR.CLASSIFICATION_CHARSETS[mode])
+    return ocr
+
+
+def legacy_decode(ocr, outputs: np.ndarray) -> str:
+    """按 ddddocr 1.5 classification 与旧版 extract_text_from_probability 的逻辑解码 (T, 1, C) 输出"""
+    charset = ocr._DdddOcr__charset
+    charset_range = ocr._DdddOcr__charset_range
+    if not charset_range:
+        result, last_item = [], 0
+        for item in np.squeeze(np.argmax(outputs, axis=2)):
+            if item == last_item:
+                continue
+            last_item = item
+            if item != 0:
+                result.append(charset[item])
+        return "".join(result)
+    outputs = np.exp(outputs) / np.sum(np.exp(outputs))
+    outputs_sum = np.sum(outputs, axis=2)
+    probability = np.empty_like(outputs)
+    for i in range(outputs.shape[0]):
+        probability[i] = outputs[i] / outputs_sum[i]
+    probability = np.squeeze(probability).tolist()
+    indices = [charset.index(item) if item in charset else -1 for item in charset_range]
+    rows = [[row[i] if i != -1 else -1 for i in indices] for row in probability]
+    return "".join(charset_range[row.index(max(row))] for row in rows)
+
+
+def legacy_recognize(ocr, mode: str, img: StupidOCR.ImagePayload):
+    if StupidOCR.CLASSIFICATION_CHARSETS[mode] is None:
+        text = ocr.classification(img.data)
+    else:
+        text = "".join(
+            result["charsets"][row.index(max(row))]
+            for result in [ocr.classification(img.data, probability=True)] for row in result["probability"]
+        )
+    return StupidOCR.finish_classification(mode, text)
+
+
+def timed(func, rounds: int):
+    """重复 rounds 次调用 func，返回每次耗时中位数（微秒）"""
+    values = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        values.append(time.perf_counter() - start)
+    return float(np.median(values)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=50, help="每个模式的样本数，默认 50")
+    parser.add_argument("--rounds", type=int, default=3, help="重复轮数，默认 3")
+    args = parser.parse_args()
+
+    session = StupidOCR.model_registry.get("beta")._DdddOcr__ort_session
+    print(f"{'':<10}{'decode us':^30}{'end-to-end ms':^20}{'accuracy':^16}")
+    print(f"{'mode':<10}{'legacy':>10}{'vector':>10}{'conf':>10}{'legacy':>10}{'current':>10}"
+          f"{'legacy':>8}{'current':>8}")
+    for index, mode in enumerate(MODES):
+        rng = random.Random(index)
+        samples = [GENERATORS[mode][1](rng) for _ in range(args.samples)]
+        ocr = legacy_model(mode)
+        mask = StupidOCR.get_charset_mask(StupidOCR.CLASSIFICATION_CHARSETS[mode])
+
+        decode = {"legacy": [], "vector": [], "conf": []}
+        latency = {"legacy": [], "current": []}
+        correct = {"legacy": 0.0, "current": 0.0}
+        for payload, expected in samples:
+            img = StupidOCR.decode_image(payload["img_base64"])
+            image = StupidOCR._classification_input(img.image)
+            outputs = session.run(None, {"input1": image[None, None, :, :]})[0]
+            decode["legacy"].append(timed(lambda: legacy_decode(ocr, outputs), args.rounds))
+            decode["vector"].append(timed(lambda: StupidOCR.decode_logits(outputs[:, 0, :], mask), args.rounds))
+            decode["conf"].append(timed(lambda: StupidOCR.decode_logits(outputs[:, 0, :], mask, True), args.rounds))
+            for name, func in (
+                ("legacy", lambda: legacy_recognize(ocr, mode, StupidOCR.decode_image(payload["img_base64"]))),
+                ("current", lambda: StupidOCR.recognize_classification(
+                    mode, StupidOCR.decode_image(payload["img_base64"]))),
+            ):
+                result = func()
+                correct[name] += score(mode, result, expected)
+                latency[name].append(timed(func, args.rounds) / 1000)
+        print(f"{mode:<10}" + "".join(f"{np.median(v):>10.1f}" for v in decode.values())
+              + "".join(f"{np.median(v):>10.2f}" for v in latency.values())
+              + "".join(f"{v / len(samples):>8.3f}" for v in correct.values()), flush=True)
+
+
+if __name__ == "__main__":
+    main()
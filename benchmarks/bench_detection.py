@@ -0,0 +1,83 @@
+"""
+点选验证码识别基准
+对 8 个字符的合成点选验证码，比较端到端识别耗时与准确率：
+- legacy：旧实现（目标检测后逐个裁剪按原宽高比缩放，各自执行一次分类推理）
+- batched：当前实现（全部裁剪缩放为同一尺寸，一次批量推理）
+
+用法：python benchmarks/bench_detection.py [--images 30] [--chars 8] [--rounds 3]
+批量推理需要安装 onnx，未安装时 batched 退化为逐个推理
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault("TOKEN_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_tokens.db"))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import StupidOCR  # noqa: E402
+from bench_endpoints import score  # noqa: E402
+from captcha_corpus import make_detection  # noqa: E402
+
+
+def legacy_detection(img: StupidOCR.ImagePayload):
+    img_pil = img.image
+    res = StupidOCR.get_det_model().detection(img.data)
+    return {
+        StupidOCR.classify_images([img_pil.crop(box)], [None])[0]: [
+            box[0] + (box[2] - box[0]) // 2,
+            box[1] + (box[3] - box[1]) // 2
+        ]
+        for box in res
+    }
+
+
+def measure(func, samples, rounds: int):
+    latencies, total_score, boxes = [], 0.0, 0
+    for _ in range(rounds):
+        for payload, expected in samples:
+            img = StupidOCR.decode_image(payload["img_base64"])
+            start = time.perf_counter()
+            result = func(img)
+            latencies.append(time.perf_counter() - start)
+            total_score += score("detection", result, expected)
+            boxes += len(result)
+    count = len(samples) * rounds
+    values = np.array(latencies) * 1000
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "mean": float(values.mean()),
+        "accuracy": total_score / count,
+        "keys": boxes / count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=30, help="样本数，默认 30")
+    parser.add_argument("--chars", type=int, default=8, help="每张图片的字符数，默认 8")
+    parser.add_argument("--rounds", type=int, default=3, help="重复轮数，默认 3")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    samples = [make_detection(rng, args.chars) for _ in range(args.images)]
+    StupidOCR.model_registry.preload(["beta", "det"])
+    StupidOCR._get_batch_session()
+    print(f"images={args.images} chars={args.chars} batch_session={'yes' if StupidOCR._get_batch_session() else 'no'}")
+    print(f"{'impl':<9}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}{'accuracy':>10}{'keys/img':>10}")
+    for name, func in (("legacy", legacy_detection), ("batched", StupidOCR.recognize_detection)):
+        measure(func, samples[:3], 1)
+        r = measure(func, samples, args.rounds)
+        print(f"{name:<9}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['mean']:>9.1f}{r['accuracy']:>10.3f}{r['keys']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
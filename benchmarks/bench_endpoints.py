@@ -0,0 +1,240 @@
+"""
+接口吞吐与延迟基准
+使用 captcha_corpus 生成的确定性语料，按固定并发压测各识别接口，输出 p50/p95/p99 延迟、每秒请求数、
+识别准确率与内存占用，并可与保存的基线对比，性能退化超过阈值时以非 0 状态码退出
+
+两种驱动方式：
+- inprocess：通过 ASGI 直接调用应用，不经过网络，反映单进程处理能力
+- socket：以子进程启动服务（可指定工作进程数），通过本地 TCP 连接压测，内存为整个进程树的 RSS 之和
+
+用法：
+  python benchmarks/bench_endpoints.py --transport inprocess --concurrency 1,8
+  python benchmarks/bench_endpoints.py --transport socket --workers 1,4 --save-baseline baseline.json
+  python benchmarks/bench_endpoints.py --transport socket --workers 1,4 --baseline baseline.json --threshold 0.2
+识别结果缓存在压测期间关闭，保证每次请求都执行推理
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+os.environ["TOKEN_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_tokens.db")
+os.environ["OCR_CACHE"] = "0"
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import StupidOCR  # noqa: E402
+from bench_worker_memory import process_tree, read_memory  # noqa: E402
+from captcha_corpus import GENERATORS, build_corpus  # noqa: E402
+
+
+def score(mode: str, result, expected) -> float:
+    """
+    单次识别结果的得分：文本精确匹配（通用模式忽略大小写），滑块缺口横坐标允许 5 像素偏差；
+    点选按识别正确（文字一致且中心偏差不超过 12 像素）的字符比例计分
+    """
+    if mode == "image":
+        return float(str(result).lower() == expected)
+    if mode in ("number", "alphabet", "compute"):
+        return float(result == expected)
+    if mode == "detection":
+        found = sum(
+            1 for char, (x, y) in expected.items()
+            if char in result and abs(result[char][0] - x) <= 12 and abs(result[char][1] - y) <= 12
+        )
+        return found / len(expected)
+    return float(abs(result["target"][0] - expected) <= 5)
+
+
+async def drive(client: httpx.AsyncClient, mode: str, samples, token: str, concurrency: int, total: int):
+    """以固定并发发送 total 个请求，返回 (各请求耗时秒数, 总耗时, 得分之和)"""
+    path = GENERATORS[mode][0]
+    latencies = []
+    correct = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, correct
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            payload, expected = samples[index % len(samples)]
+            start = time.perf_counter()
+            response = await client.post(path, json=payload, headers={"X-Token": token})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} 返回 {response.status_code}: {response.text[:200]}")
+            correct += score(mode, response.json()["result"], expected)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start, correct
+
+
+def summarize(latencies, elapsed: float, correct: float) -> dict:
+    values = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "accuracy": round(correct / len(latencies), 3),
+    }
+
+
+async def run_levels(client, corpus, token, args, transport: str, workers: int, rss_of):
+    rows = []
+    for concurrency in args.concurrency:
+        for mode, samples in corpus.items():
+            await drive(client, mode, samples, token, concurrency, args.warmup)
+            latencies, elapsed, correct = await drive(client, mode, samples, token, concurrency, args.requests)
+            row = {"transport": transport, "workers": workers, "concurrency": concurrency, "mode": mode}
+            row.update(summarize(latencies, elapsed, correct))
+            row["rss_mb"] = round(rss_of(), 1)
+            print_row(row)
+            rows.append(row)
+    return rows
+
+
+async def bench_inprocess(corpus, token, args):
+    StupidOCR.model_registry.preload(StupidOCR.OCR_PRELOAD_MODELS, StupidOCR.OCR_WARMUP)
+    transport = httpx.ASGITransport(app=StupidOCR.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        return await run_levels(
+            client, corpus, token, args, "inprocess", 1,
+            lambda: StupidOCR.process_memory()["rss_mb"]
+        )
+
+
+async def bench_socket(corpus, token, args, workers: int):
+    env = dict(
+        os.environ,
+        UVICORN_WORKERS=str(workers),
+        SERVING_MODE=args.serving_mode,
+        PORT=str(args.port),
+        INFERENCE_QUEUE_SIZE=str(max(64, max(args.concurrency) * 2)),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "StupidOCR.py")],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+            deadline = time.time() + 180
+            while True:
+                try:
+                    if (await client.get("/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.time() > deadline or proc.poll() is not None:
+                    raise RuntimeError("服务启动失败或超时")
+                await asyncio.sleep(0.5)
+            await asyncio.sleep(2)  # 等待全部工作进程就绪
+
+            def rss_mb():
+                return sum(read_memory(pid)[0] for pid in process_tree(proc.pid)) / 1024
+
+            return await run_levels(client, corpus, token, args, "socket", workers, rss_mb)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def print_row(row: dict):
+    print(f"{row['transport']:<10}{row['workers']:>4}{row['concurrency']:>6}  {row['mode']:<14}"
+          f"{row['rps']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+          f"{row['accuracy']:>7.2f}{row['rss_mb']:>9.1f}", flush=True)
+
+
+def row_key(row: dict) -> str:
+    return f"{row['transport']}/w{row['workers']}/c{row['concurrency']}/{row['mode']}"
+
+
+def compare_baseline(rows, baseline_path: str, threshold: float):
+    """返回退化项描述列表：p95 延迟升高或吞吐下降超过阈值"""
+    with open(baseline_path) as f:
+        baseline = {row_key(row): row for row in json.load(f)["results"]}
+    regressions = []
+    for row in rows:
+        base = baseline.get(row_key(row))
+        if base is None:
+            continue
+        if row["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{row_key(row)} p95 {base['p95_ms']} -> {row['p95_ms']} ms")
+        if row["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{row_key(row)} rps {base['rps']} -> {row['rps']}")
+    return regressions
+
+
+def int_list(value: str):
+    return [int(x) for x in value.split(",") if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", default="inprocess", help="inprocess、socket，可逗号分隔同时运行")
+    parser.add_argument("--workers", type=int_list, default=[1], help="socket 模式的工作进程数列表，默认 1")
+    parser.add_argument("--serving-mode", default="uvicorn", help="socket 模式的 SERVING_MODE，默认 uvicorn")
+    parser.add_argument("--concurrency", type=int_list, default=[1, 8], help="并发数列表，默认 1,8")
+    parser.add_argument("--requests", type=int, default=200, help="每个接口每个并发级别的请求数，默认 200")
+    parser.add_argument("--warmup", type=int, default=10, help="每轮正式测量前的预热请求数，默认 10")
+    parser.add_argument("--samples", type=int, default=20, help="每个模式的语料样本数，默认 20")
+    parser.add_argument("--seed", type=int, default=0, help="语料随机种子，默认 0")
+    parser.add_argument("--modes", default=",".join(GENERATORS), help="参与测试的模式，逗号分隔")
+    parser.add_argument("--port", type=int, default=16690, help="socket 模式端口，默认 16690")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    parser.add_argument("--save-baseline", help="将结果保存为基线文件")
+    parser.add_argument("--baseline", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的退化比例，默认 0.2")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.samples, args.seed, [m for m in args.modes.split(",") if m])
+    token = StupidOCR.add_token_record(StupidOCR.generate_token(), "benchmark")["token"]
+
+    print(f"{'transport':<10}{'w':>4}{'conc':>6}  {'mode':<14}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+          f"{'acc':>7}{'RSS MB':>9}")
+    rows = []
+    for transport in args.transport.split(","):
+        if transport == "inprocess":
+            rows += asyncio.run(bench_inprocess(corpus, token, args))
+        elif transport == "socket":
+            for workers in args.workers:
+                rows += asyncio.run(bench_socket(corpus, token, args, workers))
+        else:
+            parser.error(f"不支持的 transport: {transport}")
+
+    result = {"seed": args.seed, "samples": args.samples, "requests": args.requests, "results": rows}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        regressions = compare_baseline(rows, args.baseline, args.threshold)
+        if regressions:
+            print(f"\n性能退化超过 {args.threshold:.0%}：")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n与基线相比无超过 {args.threshold:.0%} 的退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+图片接收流程微基准
+对比旧流程（校验器解码 + validate_image_size 再解码并 verify + ddddocr/裁剪重新打开）
+与新流程（decode_image 单次解码 + 共用 PIL 对象）处理约 5MB 图片时的 CPU 时间与内存分配
+
+用法：python benchmarks/bench_image_pipeline.py [--size-mb 4.9] [--rounds 20]
+"""
+
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+os.environ.setdefault("TOKEN_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_tokens.db"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import StupidOCR  # noqa: E402
+
+
+def make_payload(size_mb: float) -> str:
+    """生成接近指定大小的 PNG（随机噪声几乎不可压缩），返回 base64 字符串"""
+    side = int((size_mb * 1024 * 1024 / 3) ** 0.5)
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(side, side, 3), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, "PNG", compress_level=1)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _noop():
+    pass
+
+
+def legacy_pipeline(img_base64: str, step=_noop):
+    """旧流程：base64 解码三次，图片打开三次"""
+    base64.b64decode(img_base64, validate=True)  # ModelImageIn.validate_base64
+    step()
+    img_data = base64.b64decode(img_base64)  # validate_image_size
+    step()
+    if len(img_data) > StupidOCR.MAX_IMAGE_SIZE:
+        raise ValueError("too large")
+    Image.open(BytesIO(img_data)).verify()
+    step()
+    np.asarray(Image.open(BytesIO(img_data)))  # ddddocr 内部再次打开
+    step()
+    np.asarray(Image.open(BytesIO(img_data)))  # /detection 裁剪时第四次打开
+    step()
+
+
+def single_decode_pipeline(img_base64: str, step=_noop):
+    """新流程：按长度预检后解码一次，图片只解析一次"""
+    payload = StupidOCR.decode_image(img_base64)
+    step()
+    np.asarray(payload.image)
+    step()
+
+
+def measure(func, img_base64: str, rounds: int):
+    """返回 (平均 CPU 时间, 平均耗时, 单次请求累计分配字节数)"""
+    func(img_base64)  # 预热
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(rounds):
+        func(img_base64)
+    cpu = (time.process_time() - cpu_start) / rounds
+    wall = (time.perf_counter() - wall_start) / rounds
+
+    # 每个阶段结束时累加该阶段的分配峰值，近似单次请求的总分配量
+    allocated = [0]
+
+    def step():
+        current, peak = tracemalloc.get_traced_memory()
+        allocated[0] += peak - current_base[0]
+        current_base[0] = current
+        tracemalloc.reset_peak()
+
+    tracemalloc.start()
+    current_base = [tracemalloc.get_traced_memory()[0]]
+    func(img_base64, step)
+    tracemalloc.stop()
+    return cpu, wall, allocated[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=4.9, help="图片大小（MB），默认 4.9")
+    parser.add_argument("--rounds", type=int, default=20, help="每种流程的执行次数，默认 20")
+    args = parser.parse_args()
+
+    img_base64 = make_payload(args.size_mb)
+    print(f"payload: {len(img_base64) / 1024 / 1024:.2f}MB base64, rounds={args.rounds}")
+    print(f"{'pipeline':<16}{'cpu ms':>10}{'wall ms':>10}{'alloc MB':>16}")
+    results = {}
+    for name, func in (("legacy", legacy_pipeline), ("single-decode", single_decode_pipeline)):
+        cpu, wall, peak = measure(func, img_base64, args.rounds)
+        results[name] = (cpu, wall, peak)
+        print(f"{name:<16}{cpu * 1000:>10.2f}{wall * 1000:>10.2f}{peak / 1024 / 1024:>16.2f}")
+
+    legacy, new = results["legacy"], results["single-decode"]
+    print(f"saved per request: {(legacy[0] - new[0]) * 1000:.2f}ms CPU, "
+          f"{(legacy[2] - new[2]) / 1024 / 1024:.2f}MB allocation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+分类识别预处理基准
+对常见的几类输入图片，比较关闭预处理（与 ddddocr 一致：彩色全分辨率解码后缩放再转灰度）与
+开启 OCR_PREPROCESS 各步骤时的预处理耗时（含图片解码）、
+端到端识别耗时与准确率，输出每个请求节省的时间：
+- small_png：120x40 的普通验证码
+- large_png：放大 8 倍的 960x320 截图
+- rgba_canvas：2 倍分辨率的 RGBA 画布（如油猴脚本从 canvas 导出的图片）
+- large_jpeg：放大 8 倍的 960x320 JPEG
+- oversized：声明尺寸 8000x8000 的 PNG，开启尺寸检查时只解析图片头即被拒绝
+
+用法：python benchmarks/bench_preprocess.py [--samples 30] [--rounds 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+from fastapi import HTTPException
+from PIL import Image
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault("TOKEN_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_tokens.db"))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import StupidOCR  # noqa: E402
+from captcha_corpus import TEXT_CHARS, render_text  # noqa: E402
+
+ALL_STEPS = {"draft", "grayscale", "reduce"}
+
+
+def _save(image: Image.Image, fmt: str, **kwargs) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def build_samples(count: int, seed: int):
+    """返回 {类别: [(图片字节, 期望文本), ...]}"""
+    rng = random.Random(seed)
+    samples = {"small_png": [], "large_png": [], "rgba_canvas": [], "large_jpeg": []}
+    for _ in range(count):
+        text = "".join(rng.choice(TEXT_CHARS) for _ in range(4))
+        image = render_text(rng, text)
+        large = image.resize((image.width * 8, image.height * 8), Image.LANCZOS)
+        canvas = image.resize((image.width * 2, image.height * 2), Image.LANCZOS).convert("RGBA")
+        samples["small_png"].append((_save(image, "PNG"), text))
+        samples["large_png"].append((_save(large, "PNG"), text))
+        samples["rgba_canvas"].append((_save(canvas, "PNG"), text))
+        samples["large_jpeg"].append((_save(large, "JPEG", quality=90), text))
+    samples["oversized"] = [(_save(Image.new("L", (8000, 8000), 255), "PNG"), "")]
+    return samples
+
+
+def preprocess(data: bytes):
+    try:
+        img = StupidOCR.open_image(data)
+    except HTTPException:
+        return None
+    return StupidOCR._classification_input(img.image)
+
+
+def recognize(data: bytes) -> str:
+    try:
+        img = StupidOCR.open_image(data)
+    except HTTPException:
+        return ""
+    return StupidOCR.recognize_classification("image", img)
+
+
+def measure(samples, rounds: int):
+    """返回 (预处理耗时中位数, 端到端识别耗时中位数, 准确率)，耗时单位为毫秒"""
+    prep, latencies, correct = [], [], 0
+    for _ in range(rounds):
+        for data, expected in samples:
+            start = time.perf_counter()
+            preprocess(data)
+            prep.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            result = recognize(data)
+            latencies.append(time.perf_counter() - start)
+            correct += str(result).lower() == expected
+    return float(np.median(prep)) * 1000, float(np.median(latencies)) * 1000, correct / len(latencies)
+
+
+def configure(enabled: bool):
+    StupidOCR.OCR_PREPROCESS = set(ALL_STEPS) if enabled else set()
+    StupidOCR.OCR_MAX_PIXELS = 4096 * 4096 if enabled else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=30, help="每类样本数，默认 30")
+    parser.add_argument("--rounds", type=int, default=3, help="重复轮数，默认 3")
+    args = parser.parse_args()
+
+    samples = build_samples(args.samples, 0)
+    StupidOCR.model_registry.preload(["beta"])
+    print(f"{'':<13}{'preprocess ms':^27}{'end-to-end ms':^27}{'accuracy':^16}")
+    print(f"{'input':<13}" + f"{'off':>9}{'on':>9}{'saved':>9}" * 2 + f"{'off':>8}{'on':>8}")
+    for name, items in samples.items():
+        rounds = 1 if name == "oversized" else args.rounds
+        results = {}
+        for enabled in (False, True):
+            configure(enabled)
+            measure(items[:2], 1)
+            results[enabled] = measure(items, rounds)
+        (off_prep, off_ms, off_acc), (on_prep, on_ms, on_acc) = results[False], results[True]
+        print(f"{name:<13}{off_prep:>9.2f}{on_prep:>9.2f}{off_prep - on_prep:>9.2f}"
+              f"{off_ms:>9.2f}{on_ms:>9.2f}{off_ms - on_ms:>9.2f}{off_acc:>8.3f}{on_acc:>8.3f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+限流器并发基准
+多个进程 × 多个线程同时对同一批 Token 调用限流检查，统计每秒检查次数，
+并验证多进程下的限流准确性：所有进程共同消耗同一个 Token 的分钟配额，统计实际放行次数
+
+对比：
+- legacy：旧实现（固定窗口 + 进程内全局锁）
+- memory：进程内滑动窗口（每个 Token 一把锁），多进程之间不共享
+- sqlite：SQLite WAL 共享滑动窗口，多进程共享计数
+
+用法：python benchmarks/bench_rate_limiter.py [--processes 4] [--threads 4] [--seconds 3] [--tokens 100]
+仅支持 Linux（使用 fork 启动进程）
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("TOKEN_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_tokens.db"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import StupidOCR  # noqa: E402
+
+
+class LegacyRateLimiter:
+    """旧实现：分钟/小时固定窗口，所有 Token 共用一把全局锁"""
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def hit(self, token_value, limits, cost=1):
+        now = time.time()
+        minute_bucket, hour_bucket = int(now // 60), int(now // 3600)
+        with self._lock:
+            state = self._state.get(token_value, [minute_bucket, 0, hour_bucket, 0])
+            if state[0] != minute_bucket:
+                state[0], state[1] = minute_bucket, 0
+            if state[2] != hour_bucket:
+                state[2], state[3] = hour_bucket, 0
+            if limits[0] is not None and state[1] + cost > limits[0]:
+                return 0
+            if limits[1] is not None and state[3] + cost > limits[1]:
+                return 1
+            state[1] += cost
+            state[3] += cost
+            self._state[token_value] = state
+            return None
+
+
+def create_limiter(backend: str, path: str):
+    if backend == "legacy":
+        return LegacyRateLimiter()
+    if backend == "sqlite":
+        return StupidOCR.SqliteRateLimiter(path)
+    return StupidOCR.RateLimiter()
+
+
+def worker(backend, path, threads, seconds, tokens, limits, start_at, results):
+    """单个进程：threads 个线程在 seconds 秒内循环检查，返回 (检查次数, 放行次数)"""
+    limiter = create_limiter(backend, path)
+    counts = [[0, 0] for _ in range(threads)]
+
+    def loop(slot):
+        i = slot
+        while time.time() < start_at:
+            time.sleep(0.001)
+        deadline = start_at + seconds
+        while time.time() < deadline:
+            if limiter.hit(tokens[i % len(tokens)], limits) is None:
+                counts[slot][1] += 1
+            counts[slot][0] += 1
+            i += threads
+
+    pool = [threading.Thread(target=loop, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put((sum(c[0] for c in counts), sum(c[1] for c in counts)))
+
+
+def run(backend, processes, threads, seconds, tokens, limits):
+    path = os.path.join(tempfile.mkdtemp(), "bench_rate_limit.db")
+    create_limiter(backend, path)  # 预先建表
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    start_at = time.time() + 0.5
+    procs = [
+        ctx.Process(target=worker, args=(backend, path, threads, seconds, tokens, limits, start_at, results))
+        for _ in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    totals = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return sum(t[0] for t in totals), sum(t[1] for t in totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4, help="进程数，默认 4")
+    parser.add_argument("--threads", type=int, default=4, help="每个进程的线程数，默认 4")
+    parser.add_argument("--seconds", type=float, default=3.0, help="每轮持续秒数，默认 3")
+    parser.add_argument("--tokens", type=int, default=100, help="吞吐测试的 Token 数，默认 100")
+    parser.add_argument("--limit", type=int, default=1000, help="准确性测试的每分钟配额，默认 1000")
+    args = parser.parse_args()
+
+    tokens = [f"token-{i}" for i in range(args.tokens)]
+    print(f"processes={args.processes} threads={args.threads} seconds={args.seconds}")
+    print(f"{'backend':<10}{'checks/s':>12}{'admitted':>10}{'expected':>10}")
+    for backend in ("legacy", "memory", "sqlite"):
+        checks, _ = run(backend, args.processes, args.threads, args.seconds, tokens, (10 ** 9, None))
+        _, admitted = run(backend, args.processes, args.threads, 1.0, ["shared"], (args.limit, None))
+        print(f"{backend:<10}{checks / args.seconds:>12.0f}{admitted:>10}{args.limit:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+请求合并基准
+模拟客户端在几毫秒内重复提交同一张验证码（如油猴脚本的 MutationObserver 与定时器同时触发、
+多个爬虫并发访问同一登录页）：每轮同时发出 --duplicates 个相同请求，共 --bursts 轮，
+在识别结果缓存关闭的情况下对比关闭/开启请求合并时的实际推理次数、每轮耗时与单个请求的 p50/p95 延迟
+
+用法：python benchmarks/bench_single_flight.py [--bursts 50] [--duplicates 4] [--mode number]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ["TOKEN_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_tokens.db")
+os.environ["OCR_CACHE"] = "0"
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import StupidOCR  # noqa: E402
+from captcha_corpus import GENERATORS  # noqa: E402
+
+
+async def run(client, token: str, samples, args):
+    """返回 (各请求耗时, 各轮耗时, 推理次数)"""
+    path = GENERATORS[args.mode][0]
+    completed = StupidOCR.inference_executor.stats()["completed"]
+    latencies, bursts = [], []
+
+    async def request(payload):
+        start = time.perf_counter()
+        response = await client.post(path, json=payload, headers={"X-Token": token})
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+    for i in range(args.bursts):
+        payload = samples[i % len(samples)][0]
+        start = time.perf_counter()
+        await asyncio.gather(*(request(payload) for _ in range(args.duplicates)))
+        bursts.append(time.perf_counter() - start)
+    return latencies, bursts, StupidOCR.inference_executor.stats()["completed"] - completed
+
+
+async def bench(args, token: str):
+    rng = random.Random(0)
+    samples = [GENERATORS[args.mode][1](rng) for _ in range(args.bursts)]
+    StupidOCR.model_registry.preload(StupidOCR.OCR_PRELOAD_MODELS, StupidOCR.OCR_WARMUP)
+    transport = httpx.ASGITransport(app=StupidOCR.app)
+    print(f"mode={args.mode} bursts={args.bursts} duplicates={args.duplicates}")
+    print(f"{'single_flight':<15}{'inferences':>11}{'burst ms':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for enabled in (False, True):
+            StupidOCR.single_flight = StupidOCR.SingleFlight() if enabled else None
+            latencies, bursts, inferences = await run(client, token, samples, args)
+            values = np.array(latencies) * 1000
+            print(f"{'on' if enabled else 'off':<15}{inferences:>11}{np.mean(bursts) * 1000:>10.2f}"
+                  f"{np.percentile(values, 50):>9.2f}{np.percentile(values, 95):>9.2f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bursts", type=int, default=50, help="轮数，每轮使用不同图片，默认 50")
+    parser.add_argument("--duplicates", type=int, default=4, help="每轮同时提交的相同请求数，默认 4")
+    parser.add_argument("--mode", default="number", help="识别模式，默认 number")
+    args = parser.parse_args()
+
+    token = StupidOCR.add_token_record(StupidOCR.generate_token(), "benchmark")["token"]
+    asyncio.run(bench(args, token))
+
+
+if __name__ == "__main__":
+    main()
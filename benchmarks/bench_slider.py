@@ -0,0 +1,99 @@
+"""
+滑块匹配基准
+在合成滑块语料上比较 ddddocr 原实现（legacy）与快速模式（fast）的耗时与准确率：
+- small：280x160 背景、50 像素滑块，与 bench_endpoints 的滑块语料相同
+- large：1280x720 背景、120 像素滑块，滑块图与背景等高（可启用行带限定）
+缺口横坐标偏差不超过 5 像素计为正确；fast 另输出平均置信度，阴影模式输出与 legacy 坐标完全一致的比例
+
+用法：python benchmarks/bench_slider.py [--samples 30] [--rounds 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault("TOKEN_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_tokens.db"))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import StupidOCR  # noqa: E402
+from bench_endpoints import score  # noqa: E402
+from captcha_corpus import _encode, make_slider_pair  # noqa: E402
+
+SCENARIOS = {
+    "small": {"piece": 50, "size": (280, 160), "strip": False},
+    "large": {"piece": 120, "size": (1280, 720), "strip": True},
+}
+IMPLEMENTATIONS = (
+    ("gap", "legacy", StupidOCR.match_slider_gap),
+    ("gap", "fast", StupidOCR.match_slider_gap_fast),
+    ("shadow", "legacy", StupidOCR.match_slider_shadow),
+    ("shadow", "fast", StupidOCR.match_slider_shadow_fast),
+)
+
+
+def build_samples(scenario: dict, count: int, seed: int):
+    """返回 {"gap": [(滑块, 带缺口背景, x)], "shadow": [(带缺口背景, 原图, x)]}，图片为 base64 字符串"""
+    rng = random.Random(seed)
+    samples = {"gap": [], "shadow": []}
+    for _ in range(count):
+        full, gapped, target, (x, _) = make_slider_pair(rng, **scenario)
+        samples["gap"].append((_encode(target), _encode(gapped), x))
+        samples["shadow"].append((_encode(gapped), _encode(full), x))
+    return samples
+
+
+def measure(func, samples, rounds: int):
+    latencies, correct, confidences, results = [], 0, [], []
+    for _ in range(rounds):
+        for first, second, expected in samples:
+            # 每次重新构造图片对象，避免 PIL 已解码的像素被复用
+            images = (StupidOCR.decode_image(first), StupidOCR.decode_image(second))
+            start = time.perf_counter()
+            result = func(*images)
+            latencies.append(time.perf_counter() - start)
+            correct += score("slider", result, expected)
+            confidences.append(result.get("confidence", float("nan")))
+            results.append(result["target"][:2])
+    values = np.array(latencies) * 1000
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "accuracy": correct / len(latencies),
+        "confidence": float(np.mean(confidences)),
+        "targets": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=30, help="每个场景的样本数，默认 30")
+    parser.add_argument("--rounds", type=int, default=3, help="重复轮数，默认 3")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="参与测试的场景，逗号分隔")
+    args = parser.parse_args()
+
+    StupidOCR.model_registry.preload(["slide"])
+    print(f"{'scenario':<10}{'mode':<8}{'impl':<8}{'p50 ms':>9}{'p95 ms':>9}{'accuracy':>10}{'conf':>8}{'same':>7}")
+    for index, name in enumerate(s for s in args.scenarios.split(",") if s):
+        samples = build_samples(SCENARIOS[name], args.samples, index)
+        legacy_targets = {}
+        for mode, impl, func in IMPLEMENTATIONS:
+            measure(func, samples[mode][:2], 1)
+            r = measure(func, samples[mode], args.rounds)
+            if impl == "legacy":
+                legacy_targets[mode] = r["targets"]
+                same = 1.0
+            else:
+                same = float(np.mean([a == b for a, b in zip(r["targets"], legacy_targets[mode])]))
+            print(f"{name:<10}{mode:<8}{impl:<8}{r['p50']:>9.2f}{r['p95']:>9.2f}{r['accuracy']:>10.3f}"
+                  f"{r['confidence']:>8.3f}{same:>7.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
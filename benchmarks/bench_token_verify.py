@@ -0,0 +1,99 @@
+"""
+Token 校验热路径基准
+在不同 Token 数量下测量单次 charge_token（校验 + 限流 + 调用次数累加）的耗时，
+对比旧实现（全局锁内复制整个 Token 列表与集合，再线性扫描更新调用次数）
+
+用法：python benchmarks/bench_token_verify.py [--sizes 10,1000,100000] [--calls 20000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("TOKEN_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_tokens.db"))
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import StupidOCR  # noqa: E402
+
+
+def make_tokens(count: int):
+    return [
+        {
+            'id': str(i),
+            'token': f"token-{i:08d}",
+            'name': f"Token {i}",
+            'created_at': "",
+            'updated_at': "",
+            'minute_limit': None,
+            'hour_limit': None,
+            'usage_count': 0
+        }
+        for i in range(count)
+    ]
+
+
+class LegacyTokenCache:
+    """旧实现：列表 + 集合 + 字典三份缓存共用一把锁"""
+
+    def __init__(self, tokens):
+        self.lock = threading.Lock()
+        self.tokens = [t.copy() for t in tokens]
+        self.values = {t['token'] for t in self.tokens}
+        self.by_value = {t['token']: t for t in self.tokens}
+        self.queue = {}
+        self.queue_lock = threading.Lock()
+
+    def charge(self, x_token: str):
+        with self.lock:
+            cached_tokens = list(self.tokens)
+            cached_token_values = set(self.values)
+            token_config = self.by_value.get(x_token)
+        if not cached_tokens or x_token not in cached_token_values or not token_config:
+            raise ValueError("Token 验证失败")
+        StupidOCR.enforce_rate_limit(x_token, token_config.get('minute_limit'), token_config.get('hour_limit'))
+        with self.lock:
+            token_data = self.by_value.get(x_token)
+            token_data['usage_count'] = (token_data.get('usage_count') or 0) + 1
+            for cached in self.tokens:
+                if cached.get('token') == x_token:
+                    cached['usage_count'] = token_data['usage_count']
+                    break
+        with self.queue_lock:
+            self.queue[x_token] = self.queue.get(x_token, 0) + 1
+        return x_token
+
+
+def per_call_us(func, values, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        func(values[i % len(values)])
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000", help="Token 数量列表，逗号分隔")
+    parser.add_argument("--calls", type=int, default=20000, help="每组测量的调用次数，默认 20000")
+    args = parser.parse_args()
+
+    print(f"{'tokens':>8}{'legacy us':>12}{'snapshot us':>14}")
+    for size in (int(x) for x in args.sizes.split(",")):
+        tokens = make_tokens(size)
+        # 取分布在整个列表中的 Token，旧实现的线性扫描平均走一半
+        values = [t['token'] for t in tokens[::max(1, size // 100)]]
+        legacy = LegacyTokenCache(tokens)
+        legacy_calls = max(100, min(args.calls, args.calls * 100 // size))
+        legacy_us = per_call_us(legacy.charge, values, legacy_calls)
+
+        StupidOCR.token_snapshot = StupidOCR.TokenSnapshot(tokens)
+        snapshot_us = per_call_us(StupidOCR.charge_token, values, args.calls)
+        StupidOCR.usage_increment_queue.clear()
+        print(f"{size:>8}{legacy_us:>12.2f}{snapshot_us:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+调用次数落库基准
+模拟 N 个活跃 Token 各有一次调用次数增量时，后台线程一次落库的耗时：
+- legacy：旧实现（每次新建连接，token 列无索引，逐条 UPDATE）
+- pooled：当前实现（连接池 + WAL + token 唯一索引 + executemany 单事务）
+
+用法：python benchmarks/bench_usage_flush.py [--tokens 10000] [--rounds 3]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ["TOKEN_DB_PATH"] = os.path.join(WORK_DIR, "bench_tokens.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import StupidOCR  # noqa: E402
+
+
+def token_rows(count: int):
+    return [(f"token-{i:08d}", f"Token {i}") for i in range(count)]
+
+
+def create_legacy_db(path: str, count: int):
+    """按旧表结构建库（无 token 索引）"""
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            token TEXT NOT NULL,
+            name TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            minute_limit INTEGER,
+            hour_limit INTEGER,
+            usage_count INTEGER DEFAULT 0
+        )
+    """)
+    conn.executemany("INSERT INTO tokens (token, name) VALUES (?, ?)", token_rows(count))
+    conn.commit()
+    conn.close()
+
+
+def legacy_flush(path: str, pending):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for token_value, inc in pending.items():
+        conn.execute(
+            "UPDATE tokens SET usage_count = COALESCE(usage_count, 0) + ? WHERE token = ?",
+            (inc, token_value)
+        )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=10000, help="活跃 Token 数，默认 10000")
+    parser.add_argument("--rounds", type=int, default=3, help="每种实现重复次数，取最好成绩，默认 3")
+    args = parser.parse_args()
+
+    pending = {token_value: 1 for token_value, _ in token_rows(args.tokens)}
+
+    legacy_path = os.path.join(WORK_DIR, "legacy_tokens.db")
+    create_legacy_db(legacy_path, args.tokens)
+    legacy = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        legacy_flush(legacy_path, pending)
+        legacy.append(time.perf_counter() - start)
+
+    with StupidOCR.token_db.connection() as conn:
+        conn.executemany("INSERT INTO tokens (token, name) VALUES (?, ?)", token_rows(args.tokens))
+    StupidOCR.refresh_token_cache(full=True)
+    pooled = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        StupidOCR.flush_usage_increments(pending)
+        pooled.append(time.perf_counter() - start)
+
+    print(f"tokens={args.tokens}")
+    print(f"{'impl':<8}{'best ms':>10}")
+    print(f"{'legacy':<8}{min(legacy) * 1000:>10.1f}")
+    print(f"{'pooled':<8}{min(pooled) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Token 用量时间序列基准
+模拟 --tokens 个 Token 在 --endpoints 个接口上持续请求 --minutes 分钟（时间为模拟时钟，每分钟 --rate 次请求），
+每分钟落库一次，输出：
+- 单次记录耗时（微秒），即中间件在每个请求上的额外开销
+- 内存占用：预分配数组大小不随请求量增长，并列出进程 RSS
+- 每次落库耗时与写入行数，SQLite 分钟表/小时表行数与数据库文件大小
+- 对照：逐请求写一行明细日志时的行数与单次写入耗时
+另查询一个 Token 最近 60 分钟与 24 小时的序列，输出查询耗时
+
+用法：python benchmarks/bench_usage_series.py [--tokens 200] [--endpoints 4] [--minutes 120] [--rate 5000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_DIR = tempfile.mkdtemp()
+os.environ["TOKEN_DB_PATH"] = os.path.join(DB_DIR, "bench_tokens.db")
+os.environ["USAGE_SERIES"] = "1"
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import StupidOCR  # noqa: E402
+
+ENDPOINTS = ["/api/ocr/image", "/api/ocr/number", "/api/ocr/compute", "/api/ocr/alphabet",
+             "/api/ocr/detection", "/api/ocr/slider/gap", "/api/ocr/slider/shadow", "/api/ocr/batch"]
+
+
+def db_size_mb() -> float:
+    return sum(
+        os.path.getsize(os.path.join(DB_DIR, name)) for name in os.listdir(DB_DIR)
+        if name.startswith("bench_tokens.db")
+    ) / 1024 / 1024
+
+
+def legacy_log_insert(conn, rows):
+    """对照：每个请求一行明细"""
+    conn.executemany("INSERT INTO request_log VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=200, help="Token 数量，默认 200")
+    parser.add_argument("--endpoints", type=int, default=4, help="每个 Token 使用的接口数，默认 4")
+    parser.add_argument("--minutes", type=int, default=120, help="模拟的分钟数，默认 120")
+    parser.add_argument("--rate", type=int, default=5000, help="每分钟请求数（全部 Token 合计），默认 5000")
+    args = parser.parse_args()
+
+    token_ids = [
+        int(StupidOCR.add_token_record(StupidOCR.generate_token(), f"bench-{i}")["id"])
+        for i in range(args.tokens)
+    ]
+    series = StupidOCR.usage_series
+    endpoints = ENDPOINTS[:args.endpoints]
+    rng = random.Random(0)
+    start_minute = int(time.time() // 60) - args.minutes - 1
+    series.flushed_through = start_minute - 1
+
+    legacy = sqlite3.connect(os.path.join(DB_DIR, "legacy_log.db"))
+    legacy.execute("CREATE TABLE request_log (token_id INTEGER, ts REAL, endpoint TEXT, error INTEGER, latency REAL)")
+
+    print(f"tokens={args.tokens} endpoints={args.endpoints} minutes={args.minutes} rate={args.rate}/min")
+    print(f"预分配内存 {series.stats()['memory_bytes'] / 1024 / 1024:.2f} MB "
+          f"({series.max_keys} 行 x {series.minutes} 分钟)")
+    print(f"{'minute':>7}{'requests':>10}{'record us':>11}{'flush ms':>10}{'rows':>7}"
+          f"{'legacy ms':>11}{'keys':>6}{'RSS MB':>9}")
+    record_times, flush_times, legacy_times, requests = [], [], [], 0
+    for offset in range(args.minutes):
+        base = (start_minute + offset) * 60
+        events = [
+            (rng.choice(token_ids), rng.choice(endpoints), rng.uniform(0.005, 0.2), rng.random() < 0.02,
+             base + rng.random() * 60)
+            for _ in range(args.rate)
+        ]
+        start = time.perf_counter()
+        for token_id, endpoint, seconds, error, now in events:
+            series.record(token_id, endpoint, seconds, error, now)
+        record_times.append((time.perf_counter() - start) / len(events) * 1e6)
+        requests += len(events)
+
+        start = time.perf_counter()
+        legacy_log_insert(legacy, [(t, now, e, err, s) for t, e, s, err, now in events])
+        legacy_times.append((time.perf_counter() - start) * 1000)
+
+        keys = series.stats()["keys"]
+        with StupidOCR.token_db.connection() as conn:
+            before = conn.execute("SELECT COUNT(*) FROM usage_minute").fetchone()[0]
+        start = time.perf_counter()
+        StupidOCR.flush_usage_series(base + 60)
+        flush_times.append((time.perf_counter() - start) * 1000)
+        with StupidOCR.token_db.connection() as conn:
+            written = conn.execute("SELECT COUNT(*) FROM usage_minute").fetchone()[0] - before
+        if offset % max(1, args.minutes // 8) == 0 or offset == args.minutes - 1:
+            print(f"{offset + 1:>7}{requests:>10}{record_times[-1]:>11.2f}{flush_times[-1]:>10.2f}"
+                  f"{written:>7}{legacy_times[-1]:>11.2f}{keys:>6}"
+                  f"{StupidOCR.process_memory()['rss_mb']:>9.1f}", flush=True)
+
+    with StupidOCR.token_db.connection() as conn:
+        minute_rows = conn.execute("SELECT COUNT(*) FROM usage_minute").fetchone()[0]
+        hour_rows = conn.execute("SELECT COUNT(*) FROM usage_hour").fetchone()[0]
+    legacy_rows = legacy.execute("SELECT COUNT(*) FROM request_log").fetchone()[0]
+    legacy.close()
+    print(f"\n单次记录耗时中位数 {np.median(record_times):.2f} us，每分钟落库耗时中位数 {np.median(flush_times):.2f} ms")
+    print(f"用量表：分钟 {minute_rows} 行，小时 {hour_rows} 行，数据库 {db_size_mb():.2f} MB")
+    print(f"逐请求明细：{legacy_rows} 行，每分钟写入耗时中位数 {np.median(legacy_times):.2f} ms，"
+          f"数据库 {os.path.getsize(os.path.join(DB_DIR, 'legacy_log.db')) / 1024 / 1024:.2f} MB")
+
+    end = (start_minute + args.minutes) * 60 + 1
+    for resolution, span in (("minute", 60), ("hour", 24)):
+        start = time.perf_counter()
+        result = StupidOCR.query_token_usage(str(token_ids[0]), resolution, span, now=end)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"查询 {resolution} x {span}：{elapsed:.2f} ms，"
+              f"{sum(item['requests'] for item in result['series'])} 次请求，{len(result['endpoints'])} 个接口")
+
+
+if __name__ == "__main__":
+    main()
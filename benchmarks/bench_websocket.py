@@ -0,0 +1,145 @@
+"""
+WebSocket 识别通道基准
+以子进程启动服务，模拟高频客户端连续发送小图识别请求，对比：
+- http：每个客户端一条 keep-alive 连接，逐个 POST /api/ocr/<模式>（每次都经过中间件与 Token 依赖）
+- ws：每个客户端一条 WebSocket 连接，逐条发送并等待结果
+- ws-pipelined：每个客户端一条 WebSocket 连接，最多 --depth 条消息同时在途，结果乱序返回
+输出每秒请求数与单个请求从发送到收到结果的 p50/p95/p99 延迟；识别结果缓存关闭
+
+用法：python benchmarks/bench_websocket.py [--clients 4] [--requests 400] [--depth 8] [--mode number]
+需要安装 websockets
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import websockets
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+os.environ["TOKEN_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_tokens.db")
+os.environ["OCR_CACHE"] = "0"
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import StupidOCR  # noqa: E402
+from captcha_corpus import GENERATORS, build_corpus  # noqa: E402
+
+
+async def run_http(base_url: str, token: str, samples, args):
+    latencies = []
+
+    async def client(index: int):
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+            for i in range(index, args.requests, args.clients):
+                start = time.perf_counter()
+                response = await http.post(
+                    GENERATORS[args.mode][0], json=samples[i % len(samples)][0], headers={"X-Token": token}
+                )
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_websocket(ws_url: str, token: str, samples, args, depth: int):
+    latencies = []
+
+    async def client(index: int):
+        async with websockets.connect(ws_url, max_size=None) as ws:
+            await ws.send(json.dumps({"token": token}))
+            if not json.loads(await ws.recv()).get("authenticated"):
+                raise RuntimeError("WebSocket 认证失败")
+            sent, window = {}, asyncio.Semaphore(depth)
+
+            async def receiver(count: int):
+                for _ in range(count):
+                    message = json.loads(await ws.recv())
+                    latencies.append(time.perf_counter() - sent.pop(message["id"]))
+                    if not message["success"]:
+                        raise RuntimeError(f"识别失败: {message}")
+                    window.release()
+
+            indices = list(range(index, args.requests, args.clients))
+            receiving = asyncio.ensure_future(receiver(len(indices)))
+            for i in indices:
+                await window.acquire()
+                sent[i] = time.perf_counter()
+                await ws.send(json.dumps(dict(samples[i % len(samples)][0], id=i, mode=args.mode)))
+            await receiving
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    return latencies, time.perf_counter() - start
+
+
+async def bench(args, token: str):
+    samples = build_corpus(args.samples, 0, [args.mode])[args.mode]
+    base_url = f"http://127.0.0.1:{args.port}"
+    ws_url = f"ws://127.0.0.1:{args.port}/api/ocr/ws"
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        deadline = time.time() + 180
+        while True:
+            try:
+                if (await http.get("/ready")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError("服务启动超时")
+            await asyncio.sleep(0.5)
+
+    runs = (
+        ("http", lambda: run_http(base_url, token, samples, args)),
+        ("ws", lambda: run_websocket(ws_url, token, samples, args, 1)),
+        ("ws-pipelined", lambda: run_websocket(ws_url, token, samples, args, args.depth)),
+    )
+    print(f"mode={args.mode} clients={args.clients} requests={args.requests} depth={args.depth}")
+    print(f"{'transport':<14}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, run in runs:
+        await run()  # 预热
+        latencies, elapsed = await run()
+        values = np.array(latencies) * 1000
+        print(f"{name:<14}{len(values) / elapsed:>9.1f}" + "".join(
+            f"{np.percentile(values, q):>9.2f}" for q in (50, 95, 99)
+        ), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=4, help="并发客户端数，默认 4")
+    parser.add_argument("--requests", type=int, default=400, help="每种方式的请求总数，默认 400")
+    parser.add_argument("--depth", type=int, default=8, help="ws-pipelined 每个连接同时在途的消息数，默认 8")
+    parser.add_argument("--mode", default="number", help="识别模式，默认 number")
+    parser.add_argument("--samples", type=int, default=20, help="语料样本数，默认 20")
+    parser.add_argument("--port", type=int, default=16691, help="服务端口，默认 16691")
+    args = parser.parse_args()
+
+    token = StupidOCR.add_token_record(StupidOCR.generate_token(), "benchmark")["token"]
+    env = dict(os.environ, PORT=str(args.port), INFERENCE_QUEUE_SIZE=str(max(64, args.clients * args.depth * 2)))
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "StupidOCR.py")],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(bench(args, token))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+if __name__ == "__main__":
+    main()
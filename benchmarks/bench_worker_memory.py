@@ -0,0 +1,118 @@
+"""
+多进程内存对比
+分别以 uvicorn 默认多进程模式与 preload 预加载模式启动服务，
+统计整个进程树的 RSS 与 PSS（按共享分摊后的实际占用），以及启动耗时
+
+用法：python benchmarks/bench_worker_memory.py [--workers 4] [--port 16688]
+仅支持 Linux（读取 /proc）
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_memory(pid: int):
+    """返回进程的 (rss_kb, pss_kb)"""
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def process_tree(root: int):
+    """返回 root 及其全部子孙进程的 pid"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    result, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        result.append(pid)
+        stack.extend(children.get(pid, []))
+    return result
+
+
+def wait_ready(port: int, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/stats", timeout=1):
+                return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def measure(mode: str, workers: int, port: int, settle: float):
+    env = dict(
+        os.environ,
+        SERVING_MODE=mode,
+        UVICORN_WORKERS=str(workers),
+        PORT=str(port),
+        TOKEN_DB_PATH=os.path.join(tempfile.mkdtemp(), "bench_tokens.db"),
+    )
+    start = time.time()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "StupidOCR.py")],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_ready(port, 120):
+            raise RuntimeError(f"{mode} 模式启动超时")
+        startup = time.time() - start
+        time.sleep(settle)  # 等待全部工作进程完成启动
+        pids = process_tree(proc.pid)
+        usage = [read_memory(pid) for pid in pids]
+        return {
+            "mode": mode,
+            "processes": len(pids),
+            "startup_s": startup,
+            "rss_mb": sum(u[0] for u in usage) / 1024,
+            "pss_mb": sum(u[1] for u in usage) / 1024,
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="工作进程数，默认 4")
+    parser.add_argument("--port", type=int, default=16688, help="测试端口，默认 16688")
+    parser.add_argument("--settle", type=float, default=5.0, help="服务就绪后等待的秒数，默认 5")
+    args = parser.parse_args()
+
+    print(f"workers={args.workers}")
+    print(f"{'mode':<10}{'procs':>7}{'startup s':>11}{'RSS MB':>10}{'PSS MB':>10}{'PSS/worker':>12}")
+    for mode in ("uvicorn", "preload"):
+        r = measure(mode, args.workers, args.port, args.settle)
+        print(f"{r['mode']:<10}{r['processes']:>7}{r['startup_s']:>11.2f}{r['rss_mb']:>10.1f}"
+              f"{r['pss_mb']:>10.1f}{r['pss_mb'] / args.workers:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+确定性的合成验证码语料
+使用 PIL 按固定随机种子生成各识别模式的样本，同一种子在同一 Pillow 版本下生成的图片逐字节一致，
+供基准测试与回归对比使用
+
+每个生成函数返回 (请求体, 期望结果)，请求体可直接作为对应 JSON 接口的参数
+"""
+
+import base64
+import random
+import string
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+TEXT_CHARS = string.ascii_lowercase + string.digits
+ALPHABET_CHARS = string.ascii_letters
+
+
+def _encode(image: Image.Image) -> str:
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _noise_background(rng: random.Random, size, lines: int = 4) -> Image.Image:
+    image = Image.new("RGB", size, tuple(rng.randint(200, 255) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(lines):
+        draw.line(
+            [(rng.randint(0, size[0]), rng.randint(0, size[1])) for _ in range(2)],
+            fill=tuple(rng.randint(100, 200) for _ in range(3)),
+            width=1
+        )
+    for _ in range(size[0] * size[1] // 40):
+        draw.point((rng.randint(0, size[0] - 1), rng.randint(0, size[1] - 1)),
+                   fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    return image
+
+
+def render_text(rng: random.Random, text: str, size=(120, 40)) -> Image.Image:
+    """在带噪点与干扰线的背景上逐字绘制文本，字符有轻微的位置抖动"""
+    image = _noise_background(rng, size)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    step = (size[0] - 10) // max(1, len(text))
+    for i, char in enumerate(text):
+        draw.text(
+            (6 + i * step + rng.randint(-2, 2), rng.randint(0, 6)),
+            char,
+            font=font,
+            fill=tuple(rng.randint(0, 90) for _ in range(3))
+        )
+    return image
+
+
+def make_text(rng: random.Random):
+    text = "".join(rng.choice(TEXT_CHARS) for _ in range(4))
+    return {"img_base64": _encode(render_text(rng, text))}, text
+
+
+def make_number(rng: random.Random):
+    text = "".join(rng.choice(string.digits) for _ in range(4))
+    return {"img_base64": _encode(render_text(rng, text))}, text
+
+
+def make_compute(rng: random.Random):
+    a, b = rng.randint(1, 9), rng.randint(1, 9)
+    op = rng.choice("+-x")
+    value = {"+": a + b, "-": a - b, "x": a * b}[op]
+    return {"img_base64": _encode(render_text(rng, f"{a}{op}{b}=", size=(130, 40)))}, value
+
+
+def make_alphabet(rng: random.Random):
+    text = "".join(rng.choice(ALPHABET_CHARS) for _ in range(4))
+    return {"img_base64": _encode(render_text(rng, text))}, text
+
+
+def make_detection(rng: random.Random, count: int = 4):
+    """
+    点选验证码：每行 4 格、每格 100x100，在各格内随机位置绘制一个带描边的字符，
+    期望结果为字符与中心坐标
+    """
+    columns = min(count, 4)
+    rows = (count + 3) // 4
+    image = Image.new("RGB", (columns * 100, rows * 100), tuple(rng.randint(215, 245) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(3 * rows):
+        draw.line(
+            [(rng.randint(0, image.width), rng.randint(0, image.height)) for _ in range(2)],
+            fill=tuple(rng.randint(150, 210) for _ in range(3)),
+            width=1
+        )
+    font = ImageFont.load_default(size=rng.choice((32, 40, 48)))
+    expected = {}
+    for index, char in enumerate(rng.sample(string.ascii_uppercase, count)):
+        x = (index % 4) * 100 + rng.randint(10, 40)
+        y = (index // 4) * 100 + rng.randint(5, 30)
+        draw.text((x, y), char, font=font, fill=(rng.randint(0, 80), 40, 40),
+                  stroke_width=2, stroke_fill=(255, 255, 255))
+        left, top, right, bottom = draw.textbbox((x, y), char, font=font, stroke_width=2)
+        expected[char] = [(left + right) // 2, (top + bottom) // 2]
+    return {"img_base64": _encode(image)}, expected
+
+
+def _slider_background(rng: random.Random, size=(280, 160)) -> Image.Image:
+    """随机色块与模糊组成的背景，保证缺口处有足够纹理；色块数量与大小随图片面积等比增加"""
+    image = Image.new("RGB", size)
+    draw = ImageDraw.Draw(image)
+    factor = max(1.0, (size[0] * size[1] / (280 * 160)) ** 0.5)
+    for _ in range(int(40 * factor)):
+        x, y = rng.randint(0, size[0]), rng.randint(0, size[1])
+        r = rng.randint(int(10 * factor), int(40 * factor))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    return image.filter(ImageFilter.GaussianBlur(2))
+
+
+def make_slider_pair(rng: random.Random, piece: int = 50, size=(280, 160), strip: bool = False):
+    """
+    生成滑块样本，返回 (背景原图, 带缺口的背景, 透明底的滑块, 缺口左上角坐标)
+    strip 为真时滑块图与背景等高，滑块位于缺口所在的行（常见于大尺寸滑块验证码）
+    """
+    full = _slider_background(rng, size)
+    x = rng.randint(piece + 20, full.width - piece - 10)
+    y = rng.randint(10, full.height - piece - 10)
+    box = (x, y, x + piece, y + piece)
+
+    if strip:
+        target = Image.new("RGBA", (piece + 10, full.height), (0, 0, 0, 0))
+        target.paste(full.crop(box), (5, y))
+    else:
+        target = Image.new("RGBA", (piece + 10, piece + 10), (0, 0, 0, 0))
+        target.paste(full.crop(box), (5, 5))
+    gapped = full.copy()
+    gapped.paste(Image.blend(full.crop(box), Image.new("RGB", (piece, piece)), 0.6), box[:2])
+    return full, gapped, target, (x, y)
+
+
+def make_slider_gap(rng: random.Random):
+    _, gapped, target, (x, y) = make_slider_pair(rng)
+    return {"gapimg_base64": _encode(target), "fullimg_base64": _encode(gapped)}, x
+
+
+def make_slider_shadow(rng: random.Random):
+    full, gapped, _, (x, y) = make_slider_pair(rng)
+    return {"gapimg_base64": _encode(gapped), "fullimg_base64": _encode(full)}, x
+
+
+# 模式 -> (JSON 接口路径, 生成函数)
+GENERATORS = {
+    "image": ("/api/ocr/image", make_text),
+    "number": ("/api/ocr/number", make_number),
+    "compute": ("/api/ocr/compute", make_compute),
+    "alphabet": ("/api/ocr/alphabet", make_alphabet),
+    "detection": ("/api/ocr/detection", make_detection),
+    "slider_gap": ("/api/ocr/slider/gap", make_slider_gap),
+    "slider_shadow": ("/api/ocr/slider/shadow", make_slider_shadow),
+}
+
+
+def build_corpus(samples: int = 20, seed: int = 0, modes=None):
+    """返回 {模式: [(请求体, 期望结果), ...]}，每个模式使用独立的随机序列"""
+    corpus = {}
+    for index, mode in enumerate(modes or GENERATORS):
+        rng = random.Random(seed * 1000 + index)
+        corpus[mode] = [GENERATORS[mode][1](rng) for _ in range(samples)]
+    return corpus
@@ -0,0 +1,149 @@
+"""
+INT8 量化模型评估
+在带标注的语料上分别以浮点模型与 INT8 量化模型运行各识别模式，输出准确率、p50/p95 延迟与内存，
+用于按接口选择 OCR_INT8_MODES
+
+- 默认语料为 captcha_corpus 按固定种子生成的合成验证码（通用、数字、算术、字母、点选）
+- --corpus DIR 使用真实图片：DIR/<模式>/<期望结果>_<任意>.png（或 .jpg），仅支持 image/number/alphabet
+- 每个变体在独立子进程中运行，内存为该进程加载模型并完成评估后的 RSS；量化模型先在本进程生成并缓存
+
+用法：python benchmarks/eval_quantized.py [--samples 50] [--rounds 2] [--modes image,number,detection]
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault("TOKEN_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_tokens.db"))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+CLASSIFICATION_MODES = ("image", "number", "compute", "alphabet")
+VARIANTS = ("float", "int8")
+
+
+def load_corpus(args):
+    """返回 {模式: [(图片 base64, 期望结果), ...]}"""
+    if args.corpus:
+        corpus = {}
+        for mode in args.modes:
+            directory = os.path.join(args.corpus, mode)
+            if not os.path.isdir(directory):
+                continue
+            items = []
+            for name in sorted(os.listdir(directory)):
+                with open(os.path.join(directory, name), "rb") as f:
+                    items.append((base64.b64encode(f.read()).decode(), os.path.splitext(name)[0].split("_")[0]))
+            corpus[mode] = items
+        return corpus
+    from captcha_corpus import GENERATORS
+    corpus = {}
+    for index, mode in enumerate(args.modes):
+        rng = random.Random(args.seed * 1000 + index)
+        corpus[mode] = [
+            (payload["img_base64"], expected)
+            for payload, expected in (GENERATORS[mode][1](rng) for _ in range(args.samples))
+        ]
+    return corpus
+
+
+def evaluate(args):
+    """子进程：按环境变量选定的变体评估全部模式，结果以 JSON 输出到标准输出的最后一行"""
+    import StupidOCR
+    from bench_endpoints import score
+
+    base = {"beta"} if set(args.modes) & set(CLASSIFICATION_MODES) else set()
+    if "detection" in args.modes:
+        base |= {"beta", "det"}
+    names = sorted(f"{name}_int8" if args.variant == "int8" else name for name in base)
+    StupidOCR.model_registry.preload(names)
+    loaded_rss = StupidOCR.process_memory()["rss_mb"]
+
+    results = {"models": names, "fallbacks": sorted(StupidOCR.quantization_fallbacks), "modes": {}}
+    for mode, items in load_corpus(args).items():
+        latencies, total = [], 0.0
+        for round_index in range(args.rounds + 1):
+            for img_base64, expected in items:
+                img = StupidOCR.decode_image(img_base64)
+                start = time.perf_counter()
+                if mode == "detection":
+                    result = StupidOCR.recognize_detection(img)
+                else:
+                    result = StupidOCR.recognize_classification(mode, img)
+                elapsed = time.perf_counter() - start
+                if round_index == 0:
+                    continue  # 第一轮为预热
+                latencies.append(elapsed)
+                total += score(mode, result, expected)
+        values = np.array(latencies) * 1000
+        results["modes"][mode] = {
+            "accuracy": total / len(latencies),
+            "p50": float(np.percentile(values, 50)),
+            "p95": float(np.percentile(values, 95)),
+        }
+    results["loaded_rss_mb"] = loaded_rss
+    results["rss_mb"] = StupidOCR.process_memory()["rss_mb"]
+    print(json.dumps(results))
+
+
+def run_variant(variant: str, argv):
+    modes = ",".join(argv.modes)
+    env = dict(os.environ, OCR_INT8_MODES=modes if variant == "int8" else "", OCR_PRELOAD_MODELS="")
+    command = [sys.executable, os.path.abspath(__file__), "--variant", variant, "--modes", modes,
+               "--samples", str(argv.samples), "--rounds", str(argv.rounds), "--seed", str(argv.seed)]
+    if argv.corpus:
+        command += ["--corpus", argv.corpus]
+    output = subprocess.run(command, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=50, help="合成语料每个模式的样本数，默认 50")
+    parser.add_argument("--rounds", type=int, default=2, help="正式测量轮数（另有一轮预热），默认 2")
+    parser.add_argument("--seed", type=int, default=0, help="合成语料随机种子，默认 0")
+    parser.add_argument("--modes", default="image,number,compute,alphabet,detection", help="评估的模式，逗号分隔")
+    parser.add_argument("--corpus", help="带标注的真实图片目录")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.modes = [mode for mode in args.modes.split(",") if mode]
+
+    if args.variant:
+        evaluate(args)
+        return
+
+    # 先在本进程生成量化模型，子进程的内存与延迟不含量化耗时
+    os.environ["OCR_INT8_MODES"] = ",".join(args.modes)
+    import StupidOCR
+    for name in ("beta", "det"):
+        if name == "beta" or "detection" in args.modes:
+            StupidOCR.model_registry.get(f"{name}_int8")
+
+    reports = {variant: run_variant(variant, args) for variant in VARIANTS}
+    for variant, report in reports.items():
+        fallback = f"，退回浮点: {', '.join(report['fallbacks'])}" if report["fallbacks"] else ""
+        print(f"{variant}: 模型 {', '.join(report['models'])}，加载后 RSS {report['loaded_rss_mb']:.1f} MB，"
+              f"评估后 RSS {report['rss_mb']:.1f} MB{fallback}")
+    print(f"\n{'mode':<11}" + "".join(f"{v + ' ' + c:>14}" for v in VARIANTS for c in ("acc", "p50", "p95")))
+    for mode in args.modes:
+        if mode not in reports["float"]["modes"]:
+            continue
+        row = "".join(
+            f"{reports[v]['modes'][mode]['accuracy']:>14.3f}"
+            f"{reports[v]['modes'][mode]['p50']:>14.2f}{reports[v]['modes'][mode]['p95']:>14.2f}"
+            for v in VARIANTS
+        )
+        print(f"{mode:<11}{row}")
+
+
+if __name__ == "__main__":
+    main()